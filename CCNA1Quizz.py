@@ -2,8 +2,6 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import json
 import random
-from ttkbootstrap import Style
-from ttkbootstrap.widgets import Meter
 import time
 
 class QuizApp:
@@ -14,24 +12,32 @@ class QuizApp:
         self.user_answers = []
         self.num_questions = 0
         self.selected_questions = []
+        self.answer_orders = []
         self.answer_vars = []
         self.start_time = None
         self.timer_id = None
 
-        self.style = Style(theme="flatly")  # Choisir un thème moderne
+        self.style = None
         self.root.title("Quiz App")
         self.root.geometry("900x700")
 
-        self.style.configure("TRadiobutton", font=("Arial", 12))
-        self.style.configure("TCheckbutton", font=("Arial", 12))
-
         self.create_menu()
         self.start_menu()
+        # Le thème est appliqué après la première image : le menu s'affiche sans attendre ttkbootstrap
+        self.root.after(1, self.apply_theme)
 
         self.root.bind('<Return>', self.handle_enter)
         self.root.bind('<KP_Enter>', self.handle_enter)
         self.root.bind('r', self.handle_restart)
 
+    def apply_theme(self):
+        if self.style is None:
+            from ttkbootstrap import Style
+            self.style = Style(theme="flatly")  # Choisir un thème moderne
+            self.style.configure("TRadiobutton", font=("Arial", 12))
+            self.style.configure("TCheckbutton", font=("Arial", 12))
+        return self.style
+
     def create_menu(self):
         self.menu_bar = tk.Menu(self.root)
         self.root.config(menu=self.menu_bar)
@@ -79,6 +85,7 @@ class QuizApp:
         self.selected_questions = random.sample(self.data, self.num_questions)
         self.current_question_index = 0
         self.user_answers = []
+        self.answer_orders = []
         self.start_time = time.time()
         self.show_question()
 
@@ -95,9 +102,11 @@ class QuizApp:
         self.question_label = ttk.Label(self.main_frame, text=question['question'], wraplength=600, font=("Helvetica", 16))
         self.question_label.pack(pady=20)
     
-        # Mélange les réponses
-        shuffled_answers = question['answers'].copy()
-        random.shuffle(shuffled_answers)
+        # Mélange les réponses : l'ordre est propre à la session, la question de la banque n'est pas modifiée
+        order = list(range(len(question['answers'])))
+        random.shuffle(order)
+        self.answer_orders.append(order)
+        shuffled_answers = self.shuffled_answers(self.current_question_index)
     
         # Détermine si la question a plusieurs réponses correctes
         self.answer_vars = []
@@ -134,8 +143,9 @@ class QuizApp:
         self.timer_label.pack(side="bottom", pady=5)
         self.update_timer()
 
-        # Stocke les réponses mélangées pour une utilisation ultérieure
-        question['shuffled_answers'] = shuffled_answers
+    def shuffled_answers(self, index):
+        answers = self.selected_questions[index]['answers']
+        return [answers[i] for i in self.answer_orders[index]]
 
     def update_timer(self):
         if self.start_time is not None:
@@ -168,12 +178,13 @@ class QuizApp:
             messagebox.showerror("Erreur", "Sélectionnez au moins une réponse.")
             return
 
-        correct_answer_indices = [i for i, answer in enumerate(question['shuffled_answers']) if answer.get('correct-answer', False)]
+        shuffled_answers = self.shuffled_answers(self.current_question_index)
+        correct_answer_indices = [i for i, answer in enumerate(shuffled_answers) if answer.get('correct-answer', False)]
         is_correct = set(user_answer_indices) == set(correct_answer_indices)
 
         self.user_answers.append({
             'question': question['question'],
-            'user_answers': [question['shuffled_answers'][i]['text'] for i in user_answer_indices],
+            'user_answers': [shuffled_answers[i]['text'] for i in user_answer_indices],
             'is_correct': is_correct
         })
 
@@ -184,8 +195,10 @@ class QuizApp:
             self.show_results()
 
     def clear_widgets(self):
+        # Détruit les widgets de l'écran précédent (sauf le menu) pour ne pas les accumuler
         for widget in self.root.winfo_children():
-            widget.pack_forget()
+            if not isinstance(widget, tk.Menu):
+                widget.destroy()
         if self.timer_id:
             self.root.after_cancel(self.timer_id)
 
@@ -215,6 +228,8 @@ class QuizApp:
         time_label = ttk.Label(header_frame, text=f"Temps total: {minutes:02d}:{seconds:02d}", font=("Helvetica", 18))
         time_label.pack(side="right", padx=20)
 
+        from ttkbootstrap.widgets import Meter  # seulement utile sur l'écran de résultats
+        self.apply_theme()
         meter = Meter(self.main_frame, amountused=score_percentage, metersize=200, padding=20,
                       subtext="Taux de Réussite", textfont=("Helvetica", 16), subtextfont=("Helvetica", 12),
                       textright="%", bootstyle="success")
@@ -244,10 +259,11 @@ class QuizApp:
             question_text = ttk.Label(question_frame, text=answer['question'], wraplength=800, font=("Helvetica", 12))
             question_text.pack(anchor='w', padx=(20, 0), pady=5)
 
-            for i, option in enumerate(self.selected_questions[index]['shuffled_answers'], start=1):
+            user_texts = set(answer['user_answers'])
+            for i, option in enumerate(self.shuffled_answers(index), start=1):
                 text = option['text']
                 is_correct = option.get('correct-answer', False)
-                is_user_answer = text in answer['user_answers']
+                is_user_answer = text in user_texts
 
                 if is_user_answer and is_correct:
                     label = ttk.Label(question_frame, text=f"{i}. ✓ {text}", font=("Helvetica", 12, "bold"), foreground="green")
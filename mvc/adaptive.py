@@ -0,0 +1,204 @@
+import argparse
+import sys
+import time
+from statistics import NormalDist
+
+from analytics import MIN_ATTEMPTS, analyze
+from bank import question_keys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PASS_MARK = 0.70
+CONFIDENCE = 0.95
+MIN_ITEMS = 10
+LOGISTIC_SCALE = 1.702
+GRID = (-4.0, 4.0, 81)
+MIN_A, MAX_A = 0.2, 3.0
+MIN_B, MAX_B = -4.0, 4.0
+
+
+class ItemParameters:
+    # 2PL parameters (a, b) aligned with the positions of model.data. Only items with
+    # enough archived answers are calibrated; the others are never selected.
+    def __init__(self, a, b, calibrated):
+        self.a = a
+        self.b = b
+        self.calibrated = calibrated
+        # float32 copies for item selection: z = a·θ - a·b, weighted by a²
+        self.a32 = a.astype(np.float32)
+        self.ab32 = (a * b).astype(np.float32)
+        self.a2_32 = (a * a).astype(np.float32)
+        self.grid = np.linspace(*GRID)
+        self.cut = self.cut_score(PASS_MARK)
+
+    @classmethod
+    def calibrate(cls, analysis, model, min_attempts=MIN_ATTEMPTS):
+        # Classical-to-IRT conversion (Lord): the point-biserial becomes a biserial r,
+        # then a = r / sqrt(1 - r²) and b = -z_p / r on the normal ogive, rescaled to
+        # the logistic with D = 1.702. It only needs the running sums kept by analytics.
+        size = len(model.data)
+        a = np.ones(size)
+        b = np.zeros(size)
+        calibrated = np.zeros(size, dtype=bool)
+        rows = np.full(size, -1, dtype=np.int64)
+        for position, key in enumerate(question_keys(model.data)):
+            rows[position] = analysis.rows.get(key, -1)
+
+        known = rows >= 0
+        if not known.any():
+            return cls(a, b, calibrated)
+        selected = rows[known]
+        attempts = analysis.attempts[selected]
+        p = np.clip(analysis.difficulty()[selected], 0.01, 0.99)
+        r_pb = np.nan_to_num(analysis.discrimination()[selected])
+        normal = NormalDist()
+        z = np.array([normal.inv_cdf(value) for value in p])
+        density = np.exp(-z * z / 2) / np.sqrt(2 * np.pi)
+        r_bis = np.clip(r_pb * np.sqrt(p * (1 - p)) / density, 0.05, 0.95)
+
+        a[known] = np.clip(LOGISTIC_SCALE * r_bis / np.sqrt(1 - r_bis * r_bis), MIN_A, MAX_A)
+        b[known] = np.clip(-z / r_bis, MIN_B, MAX_B)
+        calibrated[known] = (attempts >= min_attempts) & (r_pb > 0)
+        return cls(a, b, calibrated)
+
+    def probability(self, theta, items=slice(None)):
+        return 1 / (1 + np.exp(-self.a[items] * (theta - self.b[items])))
+
+    def cut_score(self, pass_mark):
+        # Ability at which the expected share of correct answers over the calibrated
+        # bank equals the pass mark
+        if not self.calibrated.any():
+            return 0.0
+        a = self.a[self.calibrated][:, None]
+        b = self.b[self.calibrated][:, None]
+        expected = (1 / (1 + np.exp(-a * (self.grid - b)))).mean(axis=0)
+        return float(np.interp(pass_mark, expected, self.grid))
+
+    def expected_score(self, theta):
+        if not self.calibrated.any():
+            return 0.0
+        return float(self.probability(theta, self.calibrated).mean())
+
+
+class AdaptiveSession:
+    def __init__(self, parameters, max_items, min_items=MIN_ITEMS, confidence=CONFIDENCE):
+        self.parameters = parameters
+        self.max_items = max_items
+        self.min_items = min_items
+        self.confidence = confidence
+        self.available = parameters.calibrated.copy()
+        self.remaining = int(self.available.sum())
+        # a² of the items still available, 0 for the others: masking is part of the product
+        self.weights = np.where(self.available, parameters.a2_32, np.float32(0))
+        self.z = np.empty(len(self.weights), dtype=np.float32)
+        self.denominator = np.empty(len(self.weights), dtype=np.float32)
+        self.posterior = None
+        self.log_posterior = -parameters.grid ** 2 / 2  # standard normal prior
+        self.administered = []
+        self.theta = 0.0
+        self.sd = 1.0
+
+    def next_item(self):
+        # Maximum Fisher information a²·P·(1 - P) at the current estimate over the whole
+        # bank, in place on float32 buffers. With e = exp(-|z|), P·(1 - P) = e / (1 + e)².
+        if self.finished():
+            return None
+        z, denominator = self.z, self.denominator
+        np.multiply(self.parameters.a32, np.float32(self.theta), out=z)
+        np.subtract(z, self.parameters.ab32, out=z)
+        np.abs(z, out=z)
+        np.negative(z, out=z)
+        np.exp(z, out=z)
+        np.add(z, np.float32(1), out=denominator)
+        np.multiply(denominator, denominator, out=denominator)
+        np.divide(z, denominator, out=z)
+        np.multiply(z, self.weights, out=z)
+        item = int(np.argmax(z))
+        return item if self.available[item] else None
+
+    def record(self, item, correct):
+        if self.available[item]:
+            self.available[item] = False
+            self.weights[item] = 0
+            self.remaining -= 1
+        self.administered.append((item, correct))
+        a, b = self.parameters.a[item], self.parameters.b[item]
+        grid = self.parameters.grid
+        # log P = -log(1 + e^-z), log(1 - P) = -log(1 + e^z)
+        z = a * (grid - b)
+        self.log_posterior -= np.logaddexp(0, -z if correct else z)
+        posterior = np.exp(self.log_posterior - self.log_posterior.max())
+        posterior /= posterior.sum()
+        self.theta = float(posterior @ grid)
+        self.sd = float(np.sqrt(posterior @ (grid - self.theta) ** 2))
+        self.posterior = posterior
+
+    def pass_probability(self):
+        if self.posterior is None:
+            return 0.5
+        return float(self.posterior[self.parameters.grid >= self.parameters.cut].sum())
+
+    def decided(self):
+        if len(self.administered) < self.min_items:
+            return False
+        probability = self.pass_probability()
+        return probability >= self.confidence or probability <= 1 - self.confidence
+
+    def finished(self):
+        return len(self.administered) >= self.max_items or self.decided() or self.remaining <= 0
+
+    def passed(self):
+        return self.pass_probability() >= 0.5
+
+    def estimated_percentage(self):
+        return round(self.parameters.expected_score(self.theta) * 100, 2)
+
+
+def load_parameters(journal_file, model):
+    if np is None:
+        raise ImportError("Le mode adaptatif nécessite numpy (pip install numpy)")
+    return ItemParameters.calibrate(analyze(journal_file, model), model)
+
+
+def bench_selection(size, repeat=200, seed=0):
+    rng = np.random.default_rng(seed)
+    parameters = ItemParameters(rng.uniform(0.5, 2.0, size), rng.normal(0, 1, size), np.ones(size, dtype=bool))
+    session = AdaptiveSession(parameters, max_items=60)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        item = session.next_item()
+        timings.append(time.perf_counter() - started)
+        session.record(item, bool(rng.random() < 0.5))
+        session.administered.clear()
+    return min(timings), sorted(timings)[len(timings) // 2]
+
+
+if __name__ == "__main__":
+    from model import QuizModel
+
+    parser = argparse.ArgumentParser(description="Paramètres IRT calibrés et test de la sélection adaptative")
+    parser.add_argument('journal', nargs='?', default="journal.jsonl")
+    parser.add_argument('--bank', nargs='+', default=["questions.json"])
+    parser.add_argument('--bench', type=int, nargs='*', metavar='N', help="mesure la sélection sur N questions")
+    args = parser.parse_args()
+
+    if np is None:
+        print("numpy est nécessaire", file=sys.stderr)
+        sys.exit(1)
+    if args.bench is not None:
+        for size in args.bench or [1000, 10000, 100000]:
+            best, median = bench_selection(size)
+            print(f"{size:>7} questions : sélection {best * 1e6:.0f} µs (médiane {median * 1e6:.0f} µs)")
+        sys.exit(0)
+
+    model = QuizModel(args.bank)
+    parameters = load_parameters(args.journal, model)
+    print(f"{int(parameters.calibrated.sum())}/{len(model.data)} questions calibrées, "
+          f"seuil de réussite θ = {parameters.cut:.2f}")
+    for position in np.flatnonzero(parameters.calibrated)[:20]:
+        print(f"  #{position + 1:<4} a = {parameters.a[position]:.2f}  b = {parameters.b[position]:+.2f}  "
+              f"{model.data[position].text[:70]}")
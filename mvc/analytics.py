@@ -0,0 +1,307 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from journal import archive_path
+from question import MAX_ANSWERS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+STATS_SUFFIX = '.stats.npz'
+STATS_VERSION = 2
+BATCH_SESSIONS = 4096
+MIN_ATTEMPTS = 30
+TOO_EASY = 0.95
+TOO_HARD = 0.20
+LOW_DISCRIMINATION = 0.10
+MISLEADING = 0.40
+
+
+def response_matrix(sessions, rows):
+    # Sparse (COO) session x question matrix: one entry per answer, valued by the
+    # bitmask of chosen option ids. `rows` maps a question key to its column.
+    session_ids, columns, chosen, expected = [], [], [], []
+    for s, answers in enumerate(sessions):
+        for key, mask, correct_mask in answers:
+            session_ids.append(s)
+            columns.append(rows(key))
+            chosen.append(mask)
+            expected.append(correct_mask)
+    return (np.array(session_ids, dtype=np.int64), np.array(columns, dtype=np.int64),
+            np.array(chosen, dtype=np.uint64), np.array(expected, dtype=np.uint64))
+
+
+class ItemAnalysis:
+    # Classical item analysis kept as sufficient statistics, so new sessions are
+    # folded in without revisiting old ones. x is an item's 0/1 score, y the
+    # candidate's proportion correct on the other items of the session.
+    def __init__(self):
+        if np is None:
+            raise ImportError("L'analyse des questions nécessite numpy (pip install numpy)")
+        self.keys = []
+        self.rows = {}
+        self.attempts = np.zeros(0, dtype=np.int64)
+        self.correct = np.zeros(0, dtype=np.float64)
+        self.pb = np.zeros((0, 5), dtype=np.float64)  # n, Σx, Σy, Σy², Σxy
+        self.options = np.zeros((0, MAX_ANSWERS), dtype=np.int64)
+        self.scores = np.zeros(101, dtype=np.int64)
+        self.sessions = 0
+        self.records = 0
+        # Per file ('archive', 'journal'): inode and offset read up to
+        self.positions = {}
+        self.seen = set()
+
+    def row(self, key):
+        row = self.rows.get(key)
+        if row is None:
+            row = self.rows[key] = len(self.keys)
+            self.keys.append(key)
+        return row
+
+    def grow(self):
+        missing = len(self.keys) - len(self.attempts)
+        if missing > 0:
+            self.attempts = np.concatenate([self.attempts, np.zeros(missing, dtype=np.int64)])
+            self.correct = np.concatenate([self.correct, np.zeros(missing)])
+            self.pb = np.concatenate([self.pb, np.zeros((missing, 5))])
+            self.options = np.concatenate([self.options, np.zeros((missing, MAX_ANSWERS), dtype=np.int64)])
+
+    def add_sessions(self, sessions):
+        # sessions: lists of (question key, chosen mask, correct mask)
+        session_ids, columns, chosen, expected = response_matrix(sessions, self.row)
+        if not len(session_ids):
+            return
+        self.grow()
+        size = len(self.keys)
+        x = (chosen == expected).astype(np.float64)
+
+        answered = np.bincount(session_ids)
+        right = np.bincount(session_ids, weights=x)
+        self.scores += np.bincount(np.rint(right / np.maximum(answered, 1) * 100).astype(np.int64), minlength=101)
+
+        self.attempts += np.bincount(columns, minlength=size)
+        self.correct += np.bincount(columns, weights=x, minlength=size)
+
+        others = answered[session_ids] - 1
+        usable = others > 0
+        y = np.where(usable, (right[session_ids] - x) / np.maximum(others, 1), 0.0)
+        for i, values in enumerate((usable, x * usable, y, y * y, x * y)):
+            self.pb[:, i] += np.bincount(columns, weights=values.astype(np.float64), minlength=size)
+
+        for option in range(MAX_ANSWERS):
+            picked = ((chosen >> np.uint64(option)) & np.uint64(1)).astype(np.float64)
+            self.options[:, option] += np.bincount(columns, weights=picked, minlength=size).astype(np.int64)
+
+        self.sessions += len(answered)
+        self.records += len(session_ids)
+
+    def difficulty(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.correct / self.attempts
+
+    def discrimination(self):
+        n, sx, sy, syy, sxy = self.pb.T
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (n * sxy - sx * sy) / np.sqrt((n * sx - sx * sx) * (n * syy - sy * sy))
+
+    def option_rates(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.options / self.attempts[:, None]
+
+    def percentile(self, score_percentage):
+        # Share of candidates scoring below, counting ties as half
+        total = self.scores.sum()
+        if not total:
+            return None
+        score = int(round(score_percentage))
+        return float((self.scores[:score].sum() + self.scores[score] / 2) / total * 100)
+
+    def score_percentiles(self, fractions=(0.1, 0.25, 0.5, 0.75, 0.9)):
+        cumulative = np.cumsum(self.scores)
+        if not cumulative[-1]:
+            return {}
+        return {fraction: int(np.searchsorted(cumulative, fraction * cumulative[-1])) for fraction in fractions}
+
+    def flag_items(self, model, min_attempts=MIN_ATTEMPTS):
+        difficulty = self.difficulty()
+        discrimination = self.discrimination()
+        rates = self.option_rates()
+        flagged = []
+        for row, key in enumerate(self.keys):
+            position = model.get_position(key)
+            if position is None or self.attempts[row] < min_attempts:
+                continue
+            question = model.data[position]
+            reasons = []
+            p, r = difficulty[row], discrimination[row]
+            if p >= TOO_EASY:
+                reasons.append(f"trop facile ({p:.0%} de réussite)")
+            elif p <= TOO_HARD:
+                reasons.append(f"trop difficile ({p:.0%} de réussite)")
+            if not np.isnan(r) and r < LOW_DISCRIMINATION:
+                reasons.append(f"peu discriminante (r = {r:.2f})")
+            best_correct = max((rates[row, i] for i in range(len(question.answers)) if question.is_correct(i)),
+                               default=0.0)
+            for i in range(min(len(question.answers), MAX_ANSWERS)):
+                if not question.is_correct(i) and (rates[row, i] >= MISLEADING or rates[row, i] > best_correct):
+                    reasons.append(f"distracteur {i + 1} choisi par {rates[row, i]:.0%} "
+                                   f"({question.answers[i][:50]})")
+            if reasons:
+                flagged.append({'position': position, 'key': key, 'question': question.text,
+                                'attempts': int(self.attempts[row]), 'difficulty': float(p),
+                                'discrimination': None if np.isnan(r) else float(r), 'reasons': reasons})
+        flagged.sort(key=lambda item: item['discrimination'] if item['discrimination'] is not None else 1.0)
+        return flagged
+
+    def save(self, filename):
+        meta = {'version': STATS_VERSION, 'sessions': self.sessions, 'records': self.records,
+                'positions': self.positions}
+        tmp = filename + '.tmp.npz'
+        np.savez_compressed(tmp, meta=np.array(json.dumps(meta)), keys=np.array(self.keys, dtype=str),
+                            attempts=self.attempts, correct=self.correct, pb=self.pb, options=self.options,
+                            scores=self.scores, seen=np.array(sorted(self.seen), dtype=str))
+        os.replace(tmp, filename)
+
+    @classmethod
+    def load(cls, filename):
+        analysis = cls()
+        try:
+            with np.load(filename) as data:
+                meta = json.loads(str(data['meta']))
+                if meta.get('version') != STATS_VERSION:
+                    return analysis
+                analysis.keys = [str(key) for key in data['keys']]
+                analysis.rows = {key: i for i, key in enumerate(analysis.keys)}
+                analysis.attempts = data['attempts']
+                analysis.correct = data['correct']
+                analysis.pb = data['pb']
+                analysis.options = data['options']
+                analysis.scores = data['scores']
+                analysis.seen = set(str(session) for session in data['seen'])
+        except (OSError, ValueError, KeyError):
+            return analysis
+        analysis.sessions = meta['sessions']
+        analysis.records = meta['records']
+        analysis.positions = {name: tuple(position) for name, position in meta['positions'].items()}
+        return analysis
+
+    def update_from_journal(self, journal_file, model):
+        # Finished sessions moved out by a compaction are in the archive, read first
+        return (self.update_from_file('archive', archive_path(journal_file), model) +
+                self.update_from_file('journal', journal_file, model))
+
+    def update_from_file(self, name, filename, model):
+        # Reads only what was appended since the last update. After a compaction
+        # (new file) the journal is read again, skipping sessions already counted.
+        try:
+            stat = os.stat(filename)
+        except FileNotFoundError:
+            return 0
+        inode, offset = self.positions.get(name, (None, 0))
+        if stat.st_ino != inode or stat.st_size < offset:
+            offset = 0
+
+        added = 0
+        open_sessions = {}
+        batch = []
+        with open(filename, 'rb') as file:
+            file.seek(offset)
+            position = offset
+            for line in file:
+                start = position
+                position += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                session_id = record.get('session')
+                kind = record.get('type')
+                if kind == 'start':
+                    # The app runs one quiz at a time: a session still open when the next one
+                    # starts was abandoned, and must not hold the offset back forever
+                    open_sessions.clear()
+                    if session_id not in self.seen:
+                        open_sessions[session_id] = (start, [])
+                elif kind == 'answer' and session_id in open_sessions:
+                    question = model.get_question_by_key(record['question'])
+                    if question is not None:
+                        mask = 0
+                        for option in record['options']:
+                            mask |= 1 << option
+                        open_sessions[session_id][1].append((record['question'], mask, question.correct_mask))
+                elif kind == 'abandon' and session_id in open_sessions:
+                    # Closed but not scored: a partial attempt would skew every statistic
+                    del open_sessions[session_id]
+                    self.seen.add(session_id)
+                elif kind == 'end' and session_id in open_sessions:
+                    _, answers = open_sessions.pop(session_id)
+                    self.seen.add(session_id)
+                    if answers:
+                        batch.append(answers)
+                    if len(batch) >= BATCH_SESSIONS:
+                        self.add_sessions(batch)
+                        added += len(batch)
+                        batch = []
+        self.add_sessions(batch)
+        added += len(batch)
+        # The session still running is read again next time, from its start record
+        self.positions[name] = (stat.st_ino, min([start for start, _ in open_sessions.values()] + [position]))
+        return added
+
+
+def stats_path(journal_file):
+    return journal_file + STATS_SUFFIX
+
+
+def analyze(journal_file, model):
+    analysis = ItemAnalysis.load(stats_path(journal_file))
+    if analysis.update_from_journal(journal_file, model):
+        try:
+            analysis.save(stats_path(journal_file))
+        except OSError:
+            pass
+    return analysis
+
+
+def report_lines(analysis, model):
+    lines = [f"{analysis.sessions} sessions, {analysis.records} réponses analysées"]
+    percentiles = analysis.score_percentiles()
+    if percentiles:
+        lines.append("Scores : " + ", ".join(f"P{int(f * 100)} = {score}%" for f, score in percentiles.items()))
+    flagged = analysis.flag_items(model)
+    if not flagged:
+        lines.append(f"Aucune question signalée (minimum {MIN_ATTEMPTS} réponses par question).")
+    for item in flagged:
+        lines.append("")
+        lines.append(f"#{item['position'] + 1} {item['question'][:100]}  ({item['attempts']} réponses)")
+        lines.extend(f"    - {reason}" for reason in item['reasons'])
+    return lines
+
+
+if __name__ == "__main__":
+    from model import QuizModel
+
+    parser = argparse.ArgumentParser(description="Analyse des questions à partir du journal des sessions")
+    parser.add_argument('journal', nargs='?', default="journal.jsonl")
+    parser.add_argument('--bank', nargs='+', default=["questions.json"])
+    parser.add_argument('--json', action='store_true', help="sortie JSON des questions signalées")
+    args = parser.parse_args()
+
+    try:
+        model = QuizModel(args.bank)
+        started = time.perf_counter()
+        analysis = analyze(args.journal, model)
+    except ImportError as error:
+        print(error, file=sys.stderr)
+        sys.exit(1)
+    if args.json:
+        json.dump(analysis.flag_items(model), sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print("\n".join(report_lines(analysis, model)))
+        print(f"({time.perf_counter() - started:.2f}s)", file=sys.stderr)
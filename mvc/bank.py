@@ -0,0 +1,302 @@
+import glob
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from collections.abc import Sequence
+from itertools import chain
+
+from grading import correct_mask
+from question import CHOICE, COMMAND, Question, json_object_hook, question_key
+
+MAGIC = b'QBNK'
+VERSION = 5
+COMPILED_SUFFIX = '.qbank'
+HASH_SUFFIX = '.hash'
+
+# magic, version, question count, string count, string index offset, question index offset, mask offset,
+# key offset
+HEADER = struct.Struct('<4sHIIQQQQ')
+OFFSET = struct.Struct('<Q')
+# Question keys are 16 hex digits, stored as 8 bytes
+KEY_SIZE = 8
+# text id, answer count, exhibit path id (NO_EXHIBIT when the question has none), kind
+QUESTION = struct.Struct('<IBIB')
+ANSWER = struct.Struct('<IB')
+NO_EXHIBIT = 0xFFFFFFFF
+KINDS = (CHOICE, COMMAND)
+
+
+def compile_bank(source, target=None):
+    if target is None:
+        target = os.path.splitext(source)[0] + COMPILED_SUFFIX
+    with open(source, 'r', encoding='utf-8') as file:
+        questions = json.load(file)
+
+    strings = {}
+
+    def intern(text):
+        if text not in strings:
+            strings[text] = len(strings)
+        return strings[text]
+
+    records = []
+    masks = array('Q')
+    keys = bytearray()
+    for question in questions:
+        answers = question.get('answers', [])
+        exhibit = question.get('exhibit')
+        exhibit_id = intern(exhibit) if exhibit is not None else NO_EXHIBIT
+        kind = KINDS.index(question.get('type', CHOICE))
+        record = bytearray(QUESTION.pack(intern(question['question']), len(answers), exhibit_id, kind))
+        for answer in answers:
+            record += ANSWER.pack(intern(answer['text']), bool(answer.get('correct-answer', False)))
+        records.append(bytes(record))
+        # Every command listed for a command question is accepted
+        masks.append((1 << len(answers)) - 1 if KINDS[kind] == COMMAND else correct_mask(answers))
+        keys += bytes.fromhex(question_key(question['question']))
+
+    tmp = target + '.tmp'
+    with open(tmp, 'wb') as out:
+        out.write(b'\0' * HEADER.size)
+
+        string_offsets = []
+        position = HEADER.size
+        for text in strings:
+            encoded = text.encode('utf-8')
+            string_offsets.append(position)
+            out.write(encoded)
+            position += len(encoded)
+        string_offsets.append(position)
+
+        string_index = position
+        for offset in string_offsets:
+            out.write(OFFSET.pack(offset))
+        position += OFFSET.size * len(string_offsets)
+
+        question_offsets = []
+        for record in records:
+            question_offsets.append(position)
+            out.write(record)
+            position += len(record)
+
+        question_index = position
+        for offset in question_offsets:
+            out.write(OFFSET.pack(offset))
+        position += OFFSET.size * len(question_offsets)
+
+        mask_offset = position
+        if sys.byteorder != 'little':
+            masks.byteswap()
+        out.write(masks.tobytes())
+        position += masks.itemsize * len(masks)
+
+        key_offset = position
+        out.write(keys)
+
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, VERSION, len(records), len(strings), string_index, question_index,
+                              mask_offset, key_offset))
+    os.replace(tmp, target)
+    return target
+
+
+class CompiledBank(Sequence):
+    def __init__(self, filename):
+        self.filename = filename
+        self.directory = os.path.dirname(filename)
+        with open(filename, 'rb') as file:
+            try:
+                self._mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f"{filename}: empty compiled bank")
+        if len(self._mm) < HEADER.size:
+            raise ValueError(f"{filename}: truncated compiled bank")
+        header = HEADER.unpack_from(self._mm, 0)
+        magic, version, count, string_count, string_index, question_index, mask_offset, key_offset = header
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{filename}: unsupported compiled bank (version {version})")
+        self._count = count
+        self._string_index = string_index
+        self._question_index = question_index
+        self._key_offset = key_offset
+        masks = memoryview(self._mm)[mask_offset:mask_offset + count * 8]
+        if sys.byteorder == 'little':
+            self.correct_masks = masks.cast('Q')
+        else:
+            self.correct_masks = array('Q', masks.tobytes())
+            self.correct_masks.byteswap()
+            masks.release()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("question index out of range")
+        offset, = OFFSET.unpack_from(self._mm, self._question_index + index * OFFSET.size)
+        text_id, answer_count, exhibit_id, kind = QUESTION.unpack_from(self._mm, offset)
+        offset += QUESTION.size
+        answers = []
+        for _ in range(answer_count):
+            answer_id, _ = ANSWER.unpack_from(self._mm, offset)
+            offset += ANSWER.size
+            answers.append(self._string(answer_id))
+        exhibit = None
+        if exhibit_id != NO_EXHIBIT:
+            exhibit = os.path.join(self.directory, self._string(exhibit_id))
+        return Question(self._string(text_id), tuple(answers), self.correct_masks[index], key=self.key(index),
+                        exhibit=exhibit, kind=KINDS[kind])
+
+    def key(self, index):
+        start = self._key_offset + index * KEY_SIZE
+        return self._mm[start:start + KEY_SIZE].hex()
+
+    def question_keys(self):
+        # Read from the key table: no question is decoded nor hashed
+        digits = self._mm[self._key_offset:self._key_offset + self._count * KEY_SIZE].hex()
+        return [digits[i:i + 2 * KEY_SIZE] for i in range(0, len(digits), 2 * KEY_SIZE)]
+
+    def _string(self, string_id):
+        start, end = struct.unpack_from('<QQ', self._mm, self._string_index + string_id * OFFSET.size)
+        return self._mm[start:end].decode('utf-8')
+
+    def close(self):
+        if isinstance(self.correct_masks, memoryview):
+            self.correct_masks.release()
+        self._mm.close()
+
+
+def bank_hash(filename):
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cached_bank_hash(filename):
+    # Hashing reads the whole bank: its digest is kept next to it and reused while
+    # the bank's mtime and size are unchanged
+    stat = os.stat(filename)
+    signature = [stat.st_mtime_ns, stat.st_size]
+    path = filename + HASH_SUFFIX
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            cached = json.load(file)
+        if cached['signature'] == signature:
+            return cached['hash']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    digest = bank_hash(filename)
+    try:
+        with open(path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump({'signature': signature, 'hash': digest}, file)
+        os.replace(path + '.tmp', path)
+    except OSError:
+        pass
+    return digest
+
+
+def question_keys(bank):
+    # Keys in bank order; compiled banks read them from their key table
+    keys = getattr(bank, 'question_keys', None)
+    return keys() if keys is not None else [question.key for question in bank]
+
+
+class MergedBank(Sequence):
+    # Read-only concatenation of several loaded banks. Ids are positions in the
+    # merged order; a reload builds a new MergedBank instead of mutating this one.
+    def __init__(self, banks):
+        self.banks = list(banks)
+        self.starts = []
+        size = 0
+        for bank in self.banks:
+            self.starts.append(size)
+            size += len(bank)
+        self._count = size
+        self.correct_masks = array('Q')
+        for bank in self.banks:
+            masks = getattr(bank, 'correct_masks', None)
+            if masks is None:
+                masks = (question.correct_mask for question in bank)
+            self.correct_masks.extend(masks)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("question index out of range")
+        part = bisect_right(self.starts, index) - 1
+        return self.banks[part][index - self.starts[part]]
+
+    def __iter__(self):
+        return chain.from_iterable(self.banks)
+
+    def question_keys(self):
+        return list(chain.from_iterable(question_keys(bank) for bank in self.banks))
+
+
+def expand_banks(patterns):
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    filenames = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            raise FileNotFoundError(f"Aucune banque ne correspond à {pattern!r}")
+        for filename in matches:
+            if filename not in filenames:
+                filenames.append(filename)
+    return filenames
+
+
+def bank_signature(filename):
+    # mtime and size of the source and of the compiled file actually loaded
+    signature = []
+    for path in dict.fromkeys((filename, compiled_path(filename))):
+        if path is not None:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def compiled_path(filename):
+    if filename.endswith(COMPILED_SUFFIX):
+        return filename
+    candidate = os.path.splitext(filename)[0] + COMPILED_SUFFIX
+    try:
+        if os.path.getmtime(candidate) >= os.path.getmtime(filename):
+            return candidate
+    except OSError:
+        pass
+    return None
+
+
+def load_bank(filename):
+    compiled = compiled_path(filename)
+    if compiled is not None:
+        try:
+            return CompiledBank(compiled)
+        except (OSError, ValueError):
+            if compiled == filename:
+                raise
+    directory = os.path.dirname(filename)
+    with open(filename, 'r', encoding='utf-8') as file:
+        return json.load(file, object_hook=lambda data: json_object_hook(data, directory))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != 'compile':
+        print("usage: python bank.py compile questions.json [questions.qbank]")
+        sys.exit(1)
+    print(compile_bank(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None))
@@ -0,0 +1,234 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bank import compile_bank, load_bank
+from grading import answer_mask, grade_matrix
+from headless import run_exams
+from ioscmd import default_grammar, grade_commands
+from model import QuizModel
+from question import COMMAND, Question
+
+WORDS = ("routeur commutateur adresse réseau paquet trame protocole câble interface passerelle "
+         "masque sous-réseau VLAN IPv4 IPv6 SSH Telnet DHCP DNS TCP UDP couche modèle OSI "
+         "administrateur commande configuration mot de passe port hôte serveur client").split()
+
+
+def sentence(rng, low, high):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def generate_bank(size, seed=0):
+    rng = random.Random(seed)
+    questions = []
+    for number in range(1, size + 1):
+        answer_count = rng.randint(2, 7)
+        # At least one wrong option, as the validator requires
+        correct_count = 1 if rng.random() < 0.75 or answer_count == 2 else rng.randint(2, min(3, answer_count - 1))
+        correct = set(rng.sample(range(answer_count), correct_count))
+        text = f"{number}. {sentence(rng, 8, 30)} ?"
+        if correct_count > 1:
+            text += f" (Choisissez {correct_count} réponses.)"
+        questions.append({
+            'question': text,
+            'answers': [{'text': sentence(rng, 3, 15), 'correct-answer': i in correct} for i in range(answer_count)],
+        })
+    return questions
+
+
+def write_bank(path, size, seed=0):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(generate_bank(size, seed), file, ensure_ascii=False)
+    return path
+
+
+def measure(function, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return {'min': min(timings), 'median': statistics.median(timings)}
+
+
+def bench_bank(path, repeat):
+    results = {}
+    compiled = compile_bank(path, os.path.splitext(path)[0] + '.qbank')
+
+    def load_json():
+        with open(path, 'r', encoding='utf-8') as file:
+            json.load(file)
+
+    results['load_json'] = measure(load_json, repeat)
+    results['load_compiled'] = measure(lambda: load_bank(compiled).close(), repeat)
+
+    model = QuizModel(path)
+    results['get_questions_60'] = measure(lambda: [model.get_questions(60) for _ in range(100)], repeat)
+
+    sample = model.get_questions(60)
+    rng = random.Random(1)
+
+    def shuffle_answers():
+        for question in sample:
+            question.permutation(rng)
+
+    results['shuffle_answers_60'] = measure(lambda: [shuffle_answers() for _ in range(100)], repeat)
+
+    responses = [[rng.randrange(len(q.answers)) for q in sample] for _ in range(100)]
+
+    def check_answer():
+        for row in responses:
+            for question, choice in zip(sample, row):
+                answer_mask([choice]) == question.correct_mask
+
+    results['check_answer_6000'] = measure(check_answer, repeat)
+
+    def submit_answer():
+        session = model.new_session()
+        session.start_quiz(60)
+        while not session.is_quiz_finished():
+            session.submit_answer([0])
+        session.get_results()
+
+    results['submit_answer_60'] = measure(lambda: [submit_answer() for _ in range(100)], repeat)
+    # Whole controller flow (journal records, timer, shuffling) driven by a scripted candidate
+    results['headless_exams_100x60'] = measure(lambda: run_exams(model, 100, seed=1), repeat)
+
+    sessions = 10000
+    ids = [rng.sample(range(len(model.data)), 60) for _ in range(sessions)]
+    masks = [[1 << rng.randrange(3) for _ in range(60)] for _ in range(sessions)]
+    results['grade_matrix_10000x60'] = measure(lambda: grade_matrix(masks, ids, model.correct_masks), repeat)
+
+    # Typed IOS commands, abbreviated the way candidates type them, half of them wrong
+    grammar = default_grammar()
+    commands = [Question(command, (command,), 1, kind=COMMAND) for command in
+                ("configure terminal", "interface GigabitEthernet0/1", "ip domain-name cisco.com",
+                 "line vty 0 15; transport input ssh", "crypto key generate rsa general-keys modulus 1024",
+                 "ip address 192.168.10.1 255.255.255.0")]
+    typed_questions = [rng.choice(commands) for _ in range(6000)]
+    typed = [grammar.abbreviate(question.answers[0], rng) for question in typed_questions]
+    typed = [text if i % 2 else text.rsplit(' ', 1)[0] + ' 7' for i, text in enumerate(typed)]
+    results['grade_commands_6000'] = measure(lambda: grade_commands(typed_questions, typed), repeat)
+    return results
+
+
+def start_display():
+    if os.environ.get('DISPLAY'):
+        return None, None
+    xvfb = shutil.which('Xvfb')
+    if xvfb is None:
+        return None, "no DISPLAY and Xvfb not found"
+    display = ':97'
+    process = subprocess.Popen([xvfb, display, '-screen', '0', '1280x1024x24'],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    os.environ['DISPLAY'] = display
+    return process, None
+
+
+def bench_view(path, repeat):
+    process, reason = start_display()
+    if reason:
+        return {'skipped': reason}
+    try:
+        import tkinter as tk
+        from view import QuizView
+
+        model = QuizModel(path)
+        root = tk.Tk()
+        view = QuizView(root)
+        view.apply_theme()
+        view.show_start_menu()
+        questions = model.get_questions(60)
+        orders = [question.permutation() for question in questions]
+
+        def show_questions():
+            for number, (question, order) in enumerate(zip(questions, orders), start=1):
+                view.show_question(question, order, number, len(questions))
+            root.update()
+
+        answers = [{'question': q.text, 'user_answers': [q.answers[0]], 'option_ids': [0], 'is_correct': False}
+                   for q in questions]
+
+        def show_results():
+            view.show_results(10, 60, 16.67, 600, answers, questions, orders)
+            root.update()
+
+        results = {
+            'show_question_60': measure(show_questions, repeat),
+            'show_results_60': measure(show_results, repeat),
+        }
+        root.destroy()
+        return results
+    finally:
+        if process is not None:
+            process.terminate()
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(previous, current, threshold):
+    regressions = []
+    for size, benches in current['results'].items():
+        for name, timing in benches.items():
+            before = previous['results'].get(size, {}).get(name)
+            if isinstance(timing, dict) and isinstance(before, dict) and 'min' in timing and 'min' in before:
+                if timing['min'] > before['min'] * (1 + threshold):
+                    regressions.append(f"{size}/{name}: {before['min'] * 1000:.2f} ms -> {timing['min'] * 1000:.2f} ms")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks du quiz")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default="bench_results.json")
+    parser.add_argument('--threshold', type=float, default=0.2, help="ralentissement toléré avant alerte")
+    parser.add_argument('--no-view', action='store_true')
+    args = parser.parse_args()
+
+    run = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': {},
+    }
+    workdir = tempfile.mkdtemp(prefix="quizbench")
+    try:
+        for size in args.sizes:
+            path = write_bank(os.path.join(workdir, f"bank_{size}.json"), size)
+            run['results'][str(size)] = bench_bank(path, args.repeat)
+            for name, timing in run['results'][str(size)].items():
+                print(f"{size:>7} {name:<24} {timing['min'] * 1000:10.3f} ms")
+        if not args.no_view:
+            path = write_bank(os.path.join(workdir, "bank_view.json"), max(60, min(args.sizes)))
+            run['results']['view'] = bench_view(path, args.repeat)
+            print(f"   view {run['results']['view']}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    history = []
+    if os.path.exists(args.output):
+        with open(args.output, 'r', encoding='utf-8') as file:
+            history = json.load(file)
+    if history:
+        for regression in compare(history[-1], run, args.threshold):
+            print(f"REGRESSION {regression}", file=sys.stderr)
+    history.append(run)
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(history, file, indent=2)
@@ -0,0 +1,451 @@
+import argparse
+import asyncio
+import json
+import random
+import secrets
+import time
+
+from journal import ENCODER
+from model import QuizModel
+from search import bitmap, bitmap_ids
+
+HISTOGRAM_INTERVAL = 0.1
+# A client that lets this much pile up in its socket buffer is too slow for the room
+HIGH_WATER = 1 << 18
+
+# Protocol: one JSON object per line, over TCP or a Unix socket.
+#   client -> server  {"type": "join", "name": ..., ["role": "instructor", "token": ...]}
+#   student           {"type": "answer", "seq": n, "options": [display indices]}
+#   instructor        {"type": "start", "questions": n, ["topic": ...]}, {"type": "next"},
+#                     {"type": "close"}, {"type": "end"}
+#   server -> all     welcome, question, reveal, score; instructors also get histogram, results
+
+
+class Subscriber:
+    def __init__(self, client_id, writer, name, role):
+        self.id = client_id
+        self.writer = writer
+        self.name = name
+        self.role = role
+
+    def send(self, data):
+        self.writer.write(data)
+
+
+class Broadcaster:
+    # Messages are encoded once and written to every subscriber's transport buffer;
+    # nobody awaits a slow client, which is dropped past HIGH_WATER instead
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.groups = {'student': {}, 'instructor': {}}
+        self.dropped = 0
+
+    def add(self, subscriber):
+        self.groups[subscriber.role][subscriber.id] = subscriber
+
+    def remove(self, subscriber):
+        self.groups[subscriber.role].pop(subscriber.id, None)
+
+    def encode(self, message):
+        return ENCODER.encode(message).encode('utf-8') + b'\n'
+
+    def publish(self, message, role=None):
+        data = self.encode(message)
+        groups = self.groups.values() if role is None else (self.groups[role],)
+        for group in groups:
+            for subscriber in list(group.values()):
+                if subscriber.writer.transport.get_write_buffer_size() > HIGH_WATER:
+                    self.remove(subscriber)
+                    subscriber.writer.close()
+                    self.dropped += 1
+                else:
+                    subscriber.send(data)
+
+    def send(self, client_id, message):
+        for group in self.groups.values():
+            subscriber = group.get(client_id)
+            if subscriber is not None:
+                subscriber.send(self.encode(message))
+
+    def count(self, role):
+        return len(self.groups[role])
+
+    def after(self, delay, callback):
+        return (self.loop or asyncio.get_running_loop()).call_later(delay, callback)
+
+
+class Tally:
+    # Per-option counters updated on each submission. A student may change their
+    # answer until the question closes: only the options that changed are touched.
+    def __init__(self, size):
+        self.counts = [0] * size
+        self.masks = {}
+
+    def submit(self, client_id, mask):
+        old = self.masks.get(client_id)
+        if old == mask:
+            return False
+        changed = mask ^ (old or 0)
+        counts = self.counts
+        while changed:
+            bit = changed & -changed
+            counts[bit.bit_length() - 1] += 1 if mask & bit else -1
+            changed ^= bit
+        self.masks[client_id] = mask
+        return True
+
+    @property
+    def answered(self):
+        return len(self.masks)
+
+
+class ClassroomController:
+    # The instructor paces the room; the broadcaster plays the part of the view
+    def __init__(self, model, broadcaster, histogram_interval=HISTOGRAM_INTERVAL):
+        self.model = model
+        self.broadcaster = broadcaster
+        self.histogram_interval = histogram_interval
+        self.questions = []
+        self.current_question = -1
+        self.order = None
+        self.correct = 0
+        self.tally = None
+        self.open = False
+        self.opened_at = None
+        self.scores = {}
+        self.names = {}
+        self.histogram_timer = None
+        self.last_histogram = 0.0
+        self.aggregation_time = 0.0
+        self.submissions = 0
+        self.publish_times = []
+
+    def start_quiz(self, num_questions, topic=None):
+        # A question still open belongs to the previous quiz: dropped, neither scored nor revealed
+        self.discard_question()
+        data = self.model.data
+        # The live tally counts options: typed command questions stay in individual quizzes,
+        # and are left out before sampling so the room gets the number of questions asked for
+        choices = bitmap((i for i, question in enumerate(data) if not question.is_command), len(data))
+        if topic:
+            choices &= self.model.index.match(topic)
+        ids = bitmap_ids(choices)
+        self.questions = [data[i] for i in random.sample(ids, min(num_questions, len(ids)))]
+        self.current_question = -1
+        self.scores = {}
+        self.next_question()
+
+    def next_question(self):
+        if self.open:
+            self.close_question()
+        self.current_question += 1
+        if self.current_question >= len(self.questions):
+            self.show_results()
+            return
+        self.show_question()
+
+    def show_question(self):
+        question = self.questions[self.current_question]
+        # The whole room sees the same order, so the histogram is meaningful
+        self.order = question.permutation()
+        self.correct = sum(1 << i for i, option_id in enumerate(self.order) if question.is_correct(option_id))
+        self.tally = Tally(len(self.order))
+        self.open = True
+        self.opened_at = time.perf_counter()
+        self.broadcaster.publish(self.question_message())
+        self.publish_times.append(time.perf_counter() - self.opened_at)
+        self.push_histogram()
+
+    def question_message(self):
+        question = self.questions[self.current_question]
+        return {'type': 'question', 'seq': self.current_question, 'total': len(self.questions),
+                'text': question.text, 'answers': [question.answers[i] for i in self.order],
+                'multiple': question.multiple}
+
+    def submit(self, client_id, seq, indices):
+        if not self.open or seq != self.current_question:
+            return False
+        started = time.perf_counter()
+        mask = 0
+        for i in indices:
+            if type(i) is int and 0 <= i < len(self.order):
+                mask |= 1 << i
+        changed = self.tally.submit(client_id, mask)
+        self.aggregation_time += time.perf_counter() - started
+        self.submissions += 1
+        if changed:
+            self.schedule_histogram()
+        return changed
+
+    def schedule_histogram(self):
+        # At most one histogram per interval; submissions in between are coalesced
+        if self.histogram_timer is not None:
+            return
+        delay = self.last_histogram + self.histogram_interval - time.perf_counter()
+        if delay <= 0:
+            self.push_histogram()
+        else:
+            self.histogram_timer = self.broadcaster.after(delay, self.push_histogram)
+
+    def push_histogram(self):
+        self.histogram_timer = None
+        self.last_histogram = time.perf_counter()
+        if self.tally is None:
+            return
+        self.broadcaster.publish({'type': 'histogram', 'seq': self.current_question,
+                                  'counts': self.tally.counts, 'answered': self.tally.answered,
+                                  'connected': self.broadcaster.count('student')}, 'instructor')
+
+    def stop_histogram(self):
+        if self.histogram_timer is not None:
+            self.histogram_timer.cancel()
+            self.histogram_timer = None
+
+    def discard_question(self):
+        self.open = False
+        self.stop_histogram()
+        self.tally = None
+
+    def close_question(self):
+        if not self.open:
+            return
+        self.open = False
+        self.stop_histogram()
+        for client_id, mask in self.tally.masks.items():
+            self.scores[client_id] = self.scores.get(client_id, 0) + (mask == self.correct)
+        self.broadcaster.publish({'type': 'reveal', 'seq': self.current_question,
+                                  'correct': [i for i in range(len(self.order)) if self.correct >> i & 1],
+                                  'counts': self.tally.counts, 'answered': self.tally.answered})
+
+    def show_results(self):
+        total = len(self.questions)
+        for client_id in self.broadcaster.groups['student']:
+            score = self.scores.get(client_id, 0)
+            self.broadcaster.send(client_id, {'type': 'score', 'score': score, 'total': total,
+                                              'percentage': round(score / total * 100, 2) if total else 0.0})
+        ranking = sorted(((self.names.get(client_id, str(client_id)), score)
+                          for client_id, score in self.scores.items()), key=lambda item: -item[1])
+        mean = sum(self.scores.values()) / len(self.scores) if self.scores else 0.0
+        self.broadcaster.publish({'type': 'results', 'total': total, 'mean': round(mean, 2),
+                                  'ranking': ranking}, 'instructor')
+        self.tally = None
+
+    def current_state(self):
+        return self.question_message() if self.open else None
+
+
+class ClassroomServer:
+    def __init__(self, model, token=None):
+        self.token = token or secrets.token_hex(4)
+        self.broadcaster = Broadcaster()
+        self.controller = ClassroomController(model, self.broadcaster)
+        self.next_id = 0
+
+    def handle(self, subscriber, message):
+        kind = message.get('type')
+        controller = self.controller
+        if kind == 'answer' and subscriber.role == 'student':
+            options = message.get('options', [])
+            # bool is an int subclass: true/false are not indices
+            if not isinstance(options, list) or not all(type(i) is int for i in options):
+                self.broadcaster.send(subscriber.id, {'type': 'error', 'message': "options doit être une liste d'indices"})
+                return
+            controller.submit(subscriber.id, message.get('seq'), options)
+        elif subscriber.role != 'instructor':
+            return
+        elif kind == 'start':
+            try:
+                controller.start_quiz(int(message.get('questions', 60)), message.get('topic') or None)
+            except (TypeError, ValueError) as error:
+                self.broadcaster.send(subscriber.id, {'type': 'error', 'message': str(error)})
+        elif kind == 'next':
+            controller.next_question()
+        elif kind == 'close':
+            controller.close_question()
+        elif kind == 'end':
+            controller.close_question()
+            controller.show_results()
+
+    async def handle_client(self, reader, writer):
+        subscriber = None
+        try:
+            hello = json.loads(await reader.readline())
+            if not isinstance(hello, dict) or hello.get('type') != 'join':
+                return
+            instructor = hello.get('role') == 'instructor' and hello.get('token') == self.token
+            self.next_id += 1
+            subscriber = Subscriber(self.next_id, writer, str(hello.get('name') or self.next_id),
+                                    'instructor' if instructor else 'student')
+            self.controller.names[subscriber.id] = subscriber.name
+            self.broadcaster.add(subscriber)
+            subscriber.send(self.broadcaster.encode({'type': 'welcome', 'id': subscriber.id,
+                                                     'role': subscriber.role}))
+            # Late joiners get the question in progress
+            state = self.controller.current_state()
+            if state is not None:
+                subscriber.send(self.broadcaster.encode(state))
+            async for line in reader:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(message, dict):
+                    self.handle(subscriber, message)
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if subscriber is not None:
+                self.broadcaster.remove(subscriber)
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765, path=None):
+        self.broadcaster.loop = asyncio.get_running_loop()
+        if path:
+            server = await asyncio.start_unix_server(self.handle_client, path, backlog=1024)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port, backlog=1024)
+        async with server:
+            await server.serve_forever()
+
+
+async def open_client(host, port, path=None):
+    if path:
+        return await asyncio.open_unix_connection(path)
+    return await asyncio.open_connection(host, port)
+
+
+async def send(writer, message):
+    writer.write(ENCODER.encode(message).encode('utf-8') + b'\n')
+    await writer.drain()
+
+
+class SimulatedStudent:
+    # Answers every question as soon as it arrives and records how long the
+    # broadcast took to reach it (server and swarm share one clock)
+    def __init__(self, name, controller, rng):
+        self.name = name
+        self.controller = controller
+        self.rng = rng
+        self.latencies = []
+        self.score = None
+
+    async def run(self, host, port, path, ready):
+        reader, writer = await open_client(host, port, path)
+        await send(writer, {'type': 'join', 'name': self.name})
+        await reader.readline()
+        ready.release()
+        try:
+            async for line in reader:
+                message = json.loads(line)
+                kind = message['type']
+                if kind == 'question':
+                    self.latencies.append(time.perf_counter() - self.controller.opened_at)
+                    size = len(message['answers'])
+                    picks = self.rng.sample(range(size), 2 if message['multiple'] and size > 1 else 1)
+                    await send(writer, {'type': 'answer', 'seq': message['seq'], 'options': picks})
+                elif kind == 'score':
+                    self.score = message['score']
+                    break
+        finally:
+            writer.close()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def bench_classroom(model, clients, questions, path=None, seed=0):
+    server = ClassroomServer(model)
+    broadcaster, controller = server.broadcaster, server.controller
+    broadcaster.loop = asyncio.get_running_loop()
+    if path:
+        listener = await asyncio.start_unix_server(server.handle_client, path, backlog=4096)
+        host, port = None, None
+    else:
+        listener = await asyncio.start_server(server.handle_client, '127.0.0.1', 0, backlog=4096)
+        host, port = listener.sockets[0].getsockname()[:2]
+
+    rng = random.Random(seed)
+    ready = asyncio.Semaphore(0)
+    swarm = [SimulatedStudent(f"élève {i}", controller, random.Random(rng.random())) for i in range(clients)]
+    tasks = [asyncio.create_task(student.run(host, port, path, ready)) for student in swarm]
+    for _ in swarm:
+        await ready.acquire()
+
+    reader, writer = await open_client(host, port, path)
+    await send(writer, {'type': 'join', 'name': 'instructeur', 'role': 'instructor', 'token': server.token})
+    await reader.readline()
+    histograms = 0
+    collect_times = []
+    started = time.perf_counter()
+    await send(writer, {'type': 'start', 'questions': questions})
+    async for line in reader:
+        message = json.loads(line)
+        if message['type'] == 'histogram':
+            histograms += 1
+            # Next question once every student has answered
+            if message['answered'] == clients:
+                collect_times.append(time.perf_counter() - controller.opened_at)
+                await send(writer, {'type': 'next'})
+        elif message['type'] == 'results':
+            break
+    duration = time.perf_counter() - started
+    await asyncio.gather(*tasks)
+    writer.close()
+    await writer.wait_closed()
+    # Lets the server see every disconnection before the loop goes away
+    while broadcaster.count('student') or broadcaster.count('instructor'):
+        await asyncio.sleep(0.01)
+    listener.close()
+    await listener.wait_closed()
+
+    latencies = sorted(latency for student in swarm for latency in student.latencies)
+    last = sorted(max(student.latencies[i] for student in swarm) for i in range(len(controller.questions)))
+    return {
+        'clients': clients,
+        'questions': len(controller.questions),
+        'duration': duration,
+        'fanout_p50_ms': percentile(latencies, 0.50) * 1000,
+        'fanout_p99_ms': percentile(latencies, 0.99) * 1000,
+        'fanout_last_ms': percentile(last, 0.50) * 1000,
+        'publish_ms': percentile(sorted(controller.publish_times), 0.50) * 1000,
+        'collect_ms': percentile(sorted(collect_times), 0.50) * 1000,
+        'aggregation_us': controller.aggregation_time / max(controller.submissions, 1) * 1e6,
+        'aggregation_per_question_ms': controller.aggregation_time / max(len(controller.questions), 1) * 1000,
+        'histograms_per_question': histograms / max(len(controller.questions), 1),
+        'dropped': broadcaster.dropped,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mode classe : l'instructeur diffuse les questions à toute la salle")
+    parser.add_argument('--bank', nargs='+', default=["questions.json"],
+                        help="une ou plusieurs banques (motifs glob acceptés)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', metavar='CHEMIN', help="écoute sur une socket Unix plutôt qu'en TCP")
+    parser.add_argument('--token', help="jeton de l'instructeur (aléatoire par défaut)")
+    parser.add_argument('--bench', type=int, nargs='*', metavar='N', help="simule N élèves connectés")
+    parser.add_argument('--questions', type=int, default=20)
+    args = parser.parse_args()
+
+    model = QuizModel(args.bank)
+    if args.bench is not None:
+        for clients in args.bench or [100, 300, 500]:
+            stats = asyncio.run(bench_classroom(model, clients, args.questions, args.unix))
+            print(f"{stats['clients']:>4} élèves, {stats['questions']} questions en {stats['duration']:.2f}s : "
+                  f"diffusion p50 {stats['fanout_p50_ms']:.2f} ms, p99 {stats['fanout_p99_ms']:.2f} ms, "
+                  f"dernier élève {stats['fanout_last_ms']:.2f} ms (envoi {stats['publish_ms']:.2f} ms) ; réponses collectées en "
+                  f"{stats['collect_ms']:.1f} ms ; agrégation {stats['aggregation_us']:.2f} µs/réponse "
+                  f"({stats['aggregation_per_question_ms']:.3f} ms/question), "
+                  f"{stats['histograms_per_question']:.1f} histogrammes/question, {stats['dropped']} déconnectés")
+    else:
+        classroom = ClassroomServer(model, args.token)
+        where = args.unix or f"{args.host}:{args.port}"
+        print(f"Classe ouverte sur {where}, jeton instructeur : {classroom.token}")
+        try:
+            asyncio.run(classroom.serve(args.host, args.port, args.unix))
+        except KeyboardInterrupt:
+            pass
@@ -1,60 +1,235 @@
-import time
 import random
-import tkinter as tk
+import uuid
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from export import export, session_record
+from grading import answer_mask
+from journal import COMPACT_SIZE, Journal, last_unfinished
+from scheduler import Scheduler
+from timer import TimerService
+
+PROGRESS_FILE = "progress.json"
+JOURNAL_FILE = "journal.jsonl"
+RELOAD_INTERVAL = 2000
 
 class QuizController:
-    def __init__(self, model, view):
+    def __init__(self, model, view, journal=None, progress_file=PROGRESS_FILE, forms=None):
+        # view: QuizView or any backend from headless.py exposing the same attributes;
+        # forms: an optional forms.FormsFile of pregenerated exams selectable by id
         self.model = model
+        self.forms = forms
         self.view = view
+        self.progress_file = progress_file
         self.questions = []
         self.current_question = 0
         self.score = 0
         self.user_answers = []
-        self.start_time = 0
+        self.answer_orders = []
         self.elapsed_time = 0
+        self.question_times = []
+        self.session_id = None
+        self.interrupted_session = None
+        self.timer = TimerService(self.view.root, self.view.update_timer)
+        self.scheduler = None
+        self.spaced = False
+        self.adaptive = None
+        self.adaptive_items = []
+        self.adaptive_data = None
+        self.item_parameters = None
+        self.parameters_data = None
+        self.reload_executor = None
+        self.bank_reload = None
 
-        self.start_button = self.view.show_start_menu()
-        self.start_button.config(command=self.start_quiz)
-        self.view.create_menu(self.restart_quiz, self.quit_quiz, self.view.show_about)
+        self.journal = journal if journal is not None else Journal(JOURNAL_FILE)
+
+        self.show_start_menu()
+        self.view.create_menu(self.restart_quiz, self.quit_quiz, self.view.show_about, self.export_results,
+                              self.show_item_analysis)
 
         self.view.root.bind('<Return>', self.handle_return)
         self.view.root.bind('<KP_Enter>', self.handle_return)
         self.view.root.bind('r', self.handle_r)
         self.view.root.bind('R', self.handle_r)
+        # Number keys are bound once; toggle_answer ignores those beyond the current answers
+        for i in range(1, 8):
+            self.view.root.bind(str(i), lambda event, index=i-1: self.toggle_answer(index))
+            self.view.root.bind(f'<KP_{i}>', lambda event, index=i-1: self.toggle_answer(index))
+        self.view.root.after(RELOAD_INTERVAL, self.check_banks)
 
     def start_quiz(self):
         num_questions = int(self.view.num_questions_entry.get())
-        self.questions = self.model.get_questions(num_questions)
-        random.shuffle(self.questions)
+        topic = self.view.topic_entry.get().strip()
+        self.spaced = self.view.spaced_var.get()
+        self.adaptive = None
+        form_text = self.view.form_entry.get().strip() if self.forms else ""
+        form_id = None
+        try:
+            if form_text:
+                form_id = self.parse_form_id(form_text)
+                self.questions = self.form_questions(form_id)
+            elif self.view.adaptive_var.get():
+                self.questions = self.start_adaptive(num_questions)
+            elif self.spaced:
+                if self.scheduler is None:
+                    self.scheduler = Scheduler(self.progress_file, self.model.question_keys())
+                self.questions = self.model.get_scheduled_questions(num_questions, self.scheduler)
+            else:
+                self.questions = self.model.get_questions(num_questions, topic)
+        except (ValueError, ImportError) as error:
+            self.view.show_error(str(error))
+            return
+        if not self.questions:
+            self.view.show_error("Aucune question ne correspond à ce thème.")
+            return
+        if self.adaptive is None and form_id is None:
+            # A form keeps its generated order so that it can be audited
+            random.shuffle(self.questions)
         self.current_question = 0
         self.score = 0
         self.user_answers = []
-        self.start_time = time.time()
+        self.answer_orders = []
+        self.question_times = []
+        if self.interrupted_session is not None:
+            # Starting afresh abandons the interrupted session
+            self.journal.abandon(self.interrupted_session)
+            self.interrupted_session = None
+        self.session_id = uuid.uuid4().hex
+        options = {'spaced': self.spaced}
+        if self.adaptive is not None:
+            options.update(adaptive=True, max_items=num_questions)
+        if form_id is not None:
+            options['form'] = form_id
+        self.journal.start(self.session_id, [question.key for question in self.questions], **options)
+        self.timer.start()
+        self.show_question()
+
+    def parse_form_id(self, text):
+        try:
+            form_id = int(text)
+        except ValueError:
+            raise ValueError("Entrez un numéro de formulaire valide.")
+        if not 0 <= form_id < len(self.forms):
+            raise ValueError(f"Le numéro de formulaire doit être entre 0 et {len(self.forms) - 1}.")
+        return form_id
+
+    def form_questions(self, form_id):
+        questions = self.forms.questions(form_id, self.model)
+        if None in questions:
+            raise ValueError("Ce formulaire utilise des questions absentes de la banque chargée.")
+        return questions
+
+    def start_adaptive(self, max_items):
+        # Item parameters come from the journal's item analysis; they are recomputed
+        # when the bank is reloaded since item ids are positions in model.data
+        from adaptive import AdaptiveSession, load_parameters
+        if self.item_parameters is None or self.parameters_data is not self.model.data:
+            self.item_parameters = load_parameters(self.journal.filename, self.model)
+            self.parameters_data = self.model.data
+        self.adaptive = AdaptiveSession(self.item_parameters, max_items)
+        self.adaptive_data = self.parameters_data
+        self.adaptive_items = []
+        item = self.adaptive.next_item()
+        if item is None:
+            self.adaptive = None
+            raise ValueError("Pas assez de réponses archivées pour calibrer le mode adaptatif.")
+        self.adaptive_items.append(item)
+        return [self.adaptive_data[item]]
+
+    def next_adaptive_question(self, is_correct):
+        self.adaptive.record(self.adaptive_items[self.current_question], is_correct)
+        item = self.adaptive.next_item()
+        if item is not None:
+            self.adaptive_items.append(item)
+            self.questions.append(self.adaptive_data[item])
+
+    def total_questions(self):
+        return self.adaptive.max_items if self.adaptive is not None else len(self.questions)
+
+    def show_start_menu(self):
+        if self.journal.file.tell() > COMPACT_SIZE:
+            # Finished sessions move to the archive, the journal keeps only what can be
+            # resumed, so finding the interrupted session stays cheap
+            self.journal.compact()
+        session_id, session = last_unfinished(self.journal.filename)
+        self.interrupted_session = session_id
+        resume_text = None
+        if session is not None:
+            total = session['start'].get('max_items', len(session['start']['questions']))
+            resume_text = f"Reprendre la session interrompue ({len(session['answers'])}/{total})"
+        self.start_button = self.view.show_start_menu(resume_text, len(self.forms) if self.forms is not None else 0)
+        self.start_button.config(command=self.start_quiz)
+        if session is not None:
+            self.view.resume_button.config(command=lambda: self.resume_quiz(session_id, session))
+
+    def resume_quiz(self, session_id, session):
+        adaptive = session['start'].get('adaptive', False)
+        if adaptive:
+            keys = [record['question'] for record in session['answers']]
+        else:
+            keys = session['start']['questions']
+        self.questions = [self.model.get_question_by_key(key) for key in keys]
+        if None in self.questions:
+            self.view.show_error("Cette session utilise des questions absentes de la banque chargée.")
+            return
+        self.adaptive = None
+        if adaptive:
+            try:
+                self.start_adaptive(session['start']['max_items'])
+            except (ValueError, ImportError) as error:
+                self.view.show_error(str(error))
+                return
+            self.adaptive_items = [self.model.get_position(key) for key in keys]
+        self.spaced = session['start'].get('spaced', False)
+        if self.spaced and self.scheduler is None:
+            self.scheduler = Scheduler(self.progress_file, self.model.question_keys())
+
+        self.session_id = session_id
+        self.interrupted_session = None
+        self.score = 0
+        self.user_answers = []
+        self.answer_orders = []
+        self.question_times = []
+        for question, record in zip(self.questions, session['answers']):
+            self.answer_orders.append(b'' if question.is_command else array('B', range(len(question.answers))))
+            self.record_answer(question, record['options'], record['elapsed'], record.get('text'))
+        self.current_question = len(self.user_answers)
+        if self.adaptive is not None:
+            for item, answer in zip(self.adaptive_items, self.user_answers):
+                self.adaptive.record(item, answer['is_correct'])
+            item = self.adaptive.next_item()
+            if item is not None:
+                self.adaptive_items.append(item)
+                self.questions.append(self.adaptive_data[item])
+        self.timer.start(sum(self.question_times))
         self.show_question()
 
     def show_question(self):
         if self.current_question < len(self.questions):
             question = self.questions[self.current_question]
-            
-            # Shuffle the answers
-            shuffled_answers = question['answers'].copy()
-            random.shuffle(shuffled_answers)
-            question['answers'] = shuffled_answers
 
-            self.view.show_question(question, self.current_question + 1, len(self.questions))
-            self.view.submit_button.config(command=self.check_answer)
-            self.update_timer()
+            # Shuffle the answers as a per-session permutation, the bank entry stays untouched.
+            # The accepted commands of a command question are never shown.
+            if question.is_command:
+                order = b''
+                from ioscmd import default_grammar
+                default_grammar()  # imported and compiled once, before the first answer is graded
+            else:
+                order = question.permutation()
+            self.answer_orders.append(order)
 
-            # Bind number keys
-            for i in range(1, min(8, len(question['answers']) + 1)):
-                self.view.root.bind(str(i), lambda event, index=i-1: self.toggle_answer(index))
-                self.view.root.bind(f'<KP_{i}>', lambda event, index=i-1: self.toggle_answer(index))
+            self.view.show_question(question, order, self.current_question + 1, self.total_questions())
+            self.view.submit_button.config(command=self.check_answer)
+            # Lets the view decode the next exhibit while this question is answered
+            if self.current_question + 1 < len(self.questions):
+                self.view.prefetch(self.questions[self.current_question + 1])
 
         else:
             self.show_results()
 
     def toggle_answer(self, index):
-        if isinstance(self.view.answer_vars[0], tk.IntVar):  # Single choice
+        if self.view.current_screen != "question" or index >= len(self.answer_orders[self.current_question]):
+            return
+        if self.view.single_choice:  # Single choice
             self.view.answer_vars[0].set(index)
         else:  # Multiple choice
             current_value = self.view.answer_vars[index].get()
@@ -62,51 +237,132 @@ class QuizController:
 
     def check_answer(self):
         question = self.questions[self.current_question]
-        user_answer = []
-        correct_answers = [answer['text'] for answer in question['answers'] if answer.get('correct-answer', False)]
+        if question.is_command:
+            self.check_command(question)
+            return
 
-        if len(correct_answers) == 1:  # Single answer question
+        if self.view.single_choice:  # Single answer question
             selected = self.view.answer_vars[0].get()
-            if selected != -1:
-                user_answer = [question['answers'][selected]['text']]
+            selected_indices = [selected] if selected != -1 else []
         else:  # Multiple answer question
-            for i, var in enumerate(self.view.answer_vars):
-                if var.get():
-                    user_answer.append(question['answers'][i]['text'])
+            selected_indices = [i for i, var in enumerate(self.view.answer_vars) if var.get()]
+
+        # Option ids refer to the bank order, not to the shuffled display order
+        order = self.answer_orders[self.current_question]
+        option_ids = sorted(order[i] for i in selected_indices)
+        time_on_task = self.timer.lap()
+        self.journal.answer(self.session_id, question.key, option_ids, time_on_task)
+        is_correct = self.record_answer(question, option_ids, time_on_task)
+        self.next_question(question, is_correct)
+
+    def check_command(self, question):
+        # A right command counts as every accepted option chosen, a wrong one as none,
+        # so masks, batch grading and the analytics treat it like any other question
+        from ioscmd import grade_command
+        text = self.view.command_var.get().strip()
+        is_correct = grade_command(question, text)
+        option_ids = list(range(len(question.answers))) if is_correct else []
+        time_on_task = self.timer.lap()
+        self.journal.answer(self.session_id, question.key, option_ids, time_on_task, text)
+        self.record_answer(question, option_ids, time_on_task, text)
+        self.next_question(question, is_correct)
+
+    def next_question(self, question, is_correct):
+        if self.spaced:
+            self.scheduler.record(question.key, is_correct)
+        if self.adaptive is not None:
+            self.next_adaptive_question(is_correct)
+
+        self.current_question += 1
+        self.show_question()
 
-        is_correct = set(user_answer) == set(correct_answers)
+    def record_answer(self, question, option_ids, time_on_task, text=None):
+        is_correct = answer_mask(option_ids) == question.correct_mask
         if is_correct:
             self.score += 1
+        self.question_times.append(time_on_task)
 
         self.user_answers.append({
-            'question': question['question'],
-            'user_answers': user_answer,
-            'correct_answers': correct_answers,
-            'is_correct': is_correct
+            'question': question.text,
+            'user_answers': [text] if text is not None else [question.answers[i] for i in option_ids],
+            'option_ids': option_ids,
+            'correct_answers': question.correct_answers(),
+            'is_correct': is_correct,
+            'time': time_on_task,
+            'text': text
         })
-
-        self.current_question += 1
-        self.show_question()
+        return is_correct
 
     def show_results(self):
-        self.elapsed_time = int(time.time() - self.start_time)
-        score_percentage = (self.score / len(self.questions)) * 100
+        self.elapsed_time = int(self.timer.stop())
+        self.journal.end(self.session_id)
+        if self.spaced:
+            self.scheduler.save()
+        if self.adaptive is not None:
+            # Share of the calibrated bank the candidate is expected to get right
+            score_percentage = self.adaptive.estimated_percentage()
+        else:
+            score_percentage = (self.score / len(self.questions)) * 100
         self.view.show_results(self.score, len(self.questions), score_percentage, 
-                               self.elapsed_time, self.user_answers, self.questions)
+                               self.elapsed_time, self.user_answers, self.questions, self.answer_orders)
         self.view.restart_button.config(command=self.restart_quiz)
         self.view.exit_button.config(command=self.quit_quiz)
 
-    def update_timer(self):
-        elapsed = int(time.time() - self.start_time)
-        self.view.update_timer(elapsed)
-        if self.current_question < len(self.questions):
-            self.view.root.after(1000, self.update_timer)
+    def export_results(self):
+        if not self.user_answers:
+            self.view.show_error("Aucun résultat à exporter.")
+            return
+        filename = self.view.ask_export_filename()
+        if not filename:
+            return
+        answered = len(self.user_answers)
+        session = session_record(self.session_id, self.questions[:answered],
+                                 [answer['option_ids'] for answer in self.user_answers],
+                                 self.question_times, self.answer_orders[:answered],
+                                 texts=[answer['text'] for answer in self.user_answers])
+        try:
+            export([session], filename)
+        except (OSError, ValueError) as error:
+            self.view.show_error(str(error))
+
+    def show_item_analysis(self):
+        try:
+            from analytics import analyze, report_lines
+            analysis = analyze(self.journal.filename, self.model)
+        except (ImportError, OSError) as error:
+            self.view.show_error(str(error))
+            return
+        self.view.show_report("Analyse des questions", report_lines(analysis, self.model))
+
+    def check_banks(self):
+        # A cold load (validation, search index) would freeze the exam, so banks load in
+        # a worker thread and the new snapshot is published here, on the UI thread. The
+        # quiz in progress keeps its own Question objects, a reload only affects the next quiz.
+        self.view.root.after(RELOAD_INTERVAL, self.check_banks)
+        reload = self.bank_reload
+        if reload is not None and not reload.done():
+            return
+        self.bank_reload = None
+        if reload is not None:
+            reloaded, bank = reload.result()
+            self.model.publish(bank)
+            if reloaded and self.scheduler is not None:
+                self.scheduler.add_keys(self.model.question_keys())
+        if self.reload_executor is None:
+            self.reload_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bank-reload")
+        self.bank_reload = self.reload_executor.submit(self.model.load_changes)
 
     def restart_quiz(self):
-        self.start_button = self.view.show_start_menu()
-        self.start_button.config(command=self.start_quiz)
+        self.timer.stop()
+        if self.view.current_screen == "question":
+            # Leaving a quiz midway abandons it: closed, but not scored like a finished one
+            self.journal.abandon(self.session_id)
+        self.show_start_menu()
 
     def quit_quiz(self):
+        if self.reload_executor is not None:
+            self.reload_executor.shutdown(wait=False, cancel_futures=True)
+        self.journal.close()
         self.view.root.quit()
 
     def handle_return(self, event):
@@ -0,0 +1,155 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+
+from bank import load_bank
+from question import NUMBER_PREFIX
+from search import tokenize
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PRIME = 4294967291
+NUM_PERM = 64
+BANDS = 16
+SHINGLE = 3
+
+
+def normalize(question):
+    text = NUMBER_PREFIX.sub('', question.text)
+    answers = sorted(' '.join(tokenize(answer)) for answer in question.answers)
+    return tokenize(text), answers
+
+
+def shingles(question):
+    words, answers = normalize(question)
+    grams = {' '.join(words[i:i + SHINGLE]) for i in range(max(1, len(words) - SHINGLE + 1))}
+    grams.update('a:' + answer for answer in answers)
+    return grams
+
+
+def shingle_hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=4).digest(), 'little') % PRIME
+
+
+class MinHasher:
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = random.Random(seed)
+        self.a = [rng.randrange(1, 1 << 31) for _ in range(num_perm)]
+        self.b = [rng.randrange(0, 1 << 31) for _ in range(num_perm)]
+        if np is not None:
+            self.a_array = np.array(self.a, dtype=np.uint64)[:, None]
+            self.b_array = np.array(self.b, dtype=np.uint64)[:, None]
+
+    def signature(self, grams):
+        hashes = [shingle_hash(gram) for gram in grams] or [0]
+        if np is not None:
+            values = np.array(hashes, dtype=np.uint64)[None, :]
+            return tuple(((self.a_array * values + self.b_array) % PRIME).min(axis=1).tolist())
+        return tuple(min((a * h + b) % PRIME for h in hashes) for a, b in zip(self.a, self.b))
+
+
+class DisjointSet:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        i, j = self.find(i), self.find(j)
+        if i != j:
+            self.parent[max(i, j)] = min(i, j)
+
+
+def numbers(question):
+    return sorted(token for token in normalize(question)[0] if token.isdigit())
+
+
+def correct_tokens(question):
+    return {token for answer in question.correct_answers() for token in tokenize(answer)}
+
+
+def compatible(first, second):
+    # Variants of one template ("port 22" / "port 23", "espion" / "publicitaire") share
+    # most of their text, so near-duplicates must also agree on numbers and on the key.
+    if numbers(first) != numbers(second):
+        return False
+    first_key, second_key = correct_tokens(first), correct_tokens(second)
+    union = first_key | second_key
+    return not union or len(first_key & second_key) / len(union) >= 0.5
+
+
+def similarity(first, second):
+    return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+
+def find_clusters(questions, threshold=0.7, bands=BANDS, num_perm=NUM_PERM):
+    hasher = MinHasher(num_perm)
+    rows = num_perm // bands
+    signatures = [hasher.signature(shingles(question)) for question in questions]
+
+    sets = DisjointSet(len(questions))
+    for band in range(bands):
+        buckets = {}
+        for i, signature in enumerate(signatures):
+            buckets.setdefault(signature[band * rows:(band + 1) * rows], []).append(i)
+        for members in buckets.values():
+            # Comparing against the bucket's first member keeps large buckets linear
+            i = members[0]
+            for j in members[1:]:
+                if sets.find(i) != sets.find(j) and similarity(signatures[i], signatures[j]) >= threshold \
+                        and compatible(questions[i], questions[j]):
+                    sets.union(i, j)
+
+    clusters = {}
+    for i in range(len(questions)):
+        clusters.setdefault(sets.find(i), []).append(i)
+    return [members for members in clusters.values() if len(members) > 1]
+
+
+def deduplicate(questions, clusters):
+    duplicates = {i for members in clusters for i in members[1:]}
+    return (question for i, question in enumerate(questions) if i not in duplicates)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Détection des questions en double entre banques")
+    parser.add_argument('banks', nargs='+')
+    parser.add_argument('-o', '--output', help="banque dédoublonnée à écrire")
+    parser.add_argument('--report', help="fichier JSON des groupes de doublons")
+    parser.add_argument('--threshold', type=float, default=0.7)
+    args = parser.parse_args()
+
+    questions = []
+    origins = []
+    for filename in args.banks:
+        for i, question in enumerate(load_bank(filename)):
+            questions.append(question)
+            origins.append(f"{filename}#{i}")
+
+    clusters = find_clusters(questions, args.threshold)
+    removed = sum(len(members) - 1 for members in clusters)
+    for members in clusters:
+        print(f"{len(members)} x {questions[members[0]].text[:80]}")
+        for i in members[1:]:
+            print(f"    {origins[i]}: {questions[i].text[:76]}")
+    print(f"{len(questions)} questions, {len(clusters)} groupes de doublons, {removed} doublons", file=sys.stderr)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as file:
+            json.dump([[{'source': origins[i], 'question': questions[i].text} for i in members]
+                       for members in clusters], file, ensure_ascii=False, indent=2)
+    if args.output:
+        directory = os.path.dirname(args.output)
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump([question.to_dict(directory) for question in deduplicate(questions, clusters)], file,
+                      ensure_ascii=False, indent=4)
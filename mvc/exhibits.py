@@ -0,0 +1,200 @@
+import argparse
+import glob
+import os
+import queue
+import statistics
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+CACHE_BYTES = 32 << 20
+MAX_SIZE = (640, 360)
+POLL_INTERVAL = 15
+
+
+def decode(path, max_size=MAX_SIZE):
+    # Worker thread: everything except creating the Tk image. Without Pillow only
+    # the file read happens here, Tk decodes PNG/GIF/PPM itself on the main thread.
+    if Image is None:
+        with open(path, 'rb') as file:
+            return file.read()
+    with Image.open(path) as image:
+        image.draft('RGB', max_size)  # JPEG decodes straight at a reduced scale
+        image.thumbnail(max_size, Image.Resampling.LANCZOS)
+        return image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+
+def to_photo(decoded, max_size=MAX_SIZE):
+    # Main thread: Tk is not thread-safe
+    if Image is not None:
+        from PIL import ImageTk
+        return ImageTk.PhotoImage(decoded)
+    import tkinter as tk
+    photo = tk.PhotoImage(data=decoded)
+    factor = max(-(-photo.width() // max_size[0]), -(-photo.height() // max_size[1]))
+    return photo.subsample(factor) if factor > 1 else photo
+
+
+def photo_bytes(image):
+    # Tk keeps photo images as 32-bit pixels
+    return image.width() * image.height() * 4
+
+
+class ExhibitCache:
+    # Images are decoded and scaled by a worker thread, turned into Tk images when
+    # root.after polls the finished jobs, and kept in LRU order up to max_bytes.
+    # get() answers at once from the cache, so a prefetched exhibit never waits.
+    def __init__(self, root, max_bytes=CACHE_BYTES, max_size=MAX_SIZE, convert=to_photo, image_size=photo_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_size = max_size
+        self.convert = convert
+        self.image_size = image_size
+        self.images = OrderedDict()
+        self.size = 0
+        self.pending = {}
+        self.done = queue.SimpleQueue()
+        self.failed = set()
+        self.executor = None
+        self.poll_id = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.peak = 0
+
+    def get(self, path, callback=None):
+        entry = self.images.get(path)
+        if entry is not None:
+            self.images.move_to_end(path)
+            self.hits += 1
+            if callback is not None:
+                callback(entry[0])
+            return entry[0]
+        if path in self.failed:
+            if callback is not None:
+                callback(None)
+            return None
+        callbacks = self.pending.get(path)
+        if callbacks is None:
+            callbacks = self.pending[path] = []
+            self.misses += 1
+            self.submit(path)
+        if callback is not None:
+            callbacks.append(callback)
+        return None
+
+    def prefetch(self, path):
+        self.get(path)
+
+    def submit(self, path):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="exhibits")
+        self.executor.submit(self.work, path)
+        if self.poll_id is None:
+            self.poll_id = self.root.after(POLL_INTERVAL, self.poll)
+
+    def work(self, path):
+        try:
+            self.done.put((path, decode(path, self.max_size)))
+        except Exception:
+            # Whatever the decoder raises, the waiting callbacks must still be answered
+            self.done.put((path, None))
+
+    def poll(self):
+        self.poll_id = None
+        while True:
+            try:
+                path, decoded = self.done.get_nowait()
+            except queue.Empty:
+                break
+            image = None
+            if decoded is not None:
+                try:
+                    image = self.convert(decoded, self.max_size)
+                except Exception:
+                    image = None
+            if image is None:
+                self.failed.add(path)
+            else:
+                self.store(path, image)
+            for callback in self.pending.pop(path, ()):
+                callback(image)
+        if self.pending:
+            self.poll_id = self.root.after(POLL_INTERVAL, self.poll)
+
+    def store(self, path, image):
+        size = self.image_size(image)
+        self.images[path] = (image, size)
+        self.size += size
+        # The image on screen is also referenced by the view, so evicting it is harmless
+        while self.size > self.max_bytes and len(self.images) > 1:
+            _, (_, evicted) = self.images.popitem(last=False)
+            self.size -= evicted
+            self.evictions += 1
+        self.peak = max(self.peak, self.size)
+
+    def stats(self):
+        return {'images': len(self.images), 'bytes': self.size, 'peak': self.peak, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions, 'failed': len(self.failed)}
+
+    def close(self):
+        if self.poll_id is not None:
+            self.root.after_cancel(self.poll_id)
+            self.poll_id = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+if __name__ == "__main__":
+    from headless import HeadlessRoot
+
+    parser = argparse.ArgumentParser(description="Mesure du décodage des illustrations et du cache")
+    parser.add_argument('images', nargs='+', help="images ou motifs glob")
+    parser.add_argument('--cache', type=int, default=CACHE_BYTES >> 20, help="taille du cache en Mio")
+    parser.add_argument('--display', type=float, default=0.05, help="secondes passées sur chaque question")
+    args = parser.parse_args()
+
+    paths = [path for pattern in args.images for path in sorted(glob.glob(pattern)) if os.path.isfile(path)]
+    if Image is None:
+        print("Pillow absent : les images sont décodées par Tk dans le fil principal")
+    timings = []
+    for path in paths:
+        started = time.perf_counter()
+        decode(path)
+        timings.append(time.perf_counter() - started)
+    print(f"{len(paths)} images : décodage + mise à l'échelle (fil de travail) médiane "
+          f"{statistics.median(timings) * 1000:.1f} ms, max {max(timings) * 1000:.1f} ms")
+
+    # Walks the images like a quiz does, prefetching the next one; without a display the
+    # decoded image stands for the Tk one, with the same size accounting
+    root = HeadlessRoot()
+    cache = ExhibitCache(root, args.cache << 20, convert=lambda decoded, size: decoded,
+                         image_size=lambda image: image.width * image.height * 4 if Image else len(image))
+    waits = []
+    for i, path in enumerate(paths):
+        started = time.perf_counter()
+        shown = []
+        cache.get(path, shown.append)
+        while not shown:
+            root.after(1)
+            root.update()
+        waits.append(time.perf_counter() - started)
+        if i + 1 < len(paths):
+            cache.prefetch(paths[i + 1])
+        deadline = time.monotonic() + args.display
+        while time.monotonic() < deadline:
+            root.after(1)
+            root.update()
+    cache.close()
+    stats = cache.stats()
+    print(f"attente à l'affichage : médiane {statistics.median(waits) * 1000:.2f} ms, "
+          f"max {max(waits) * 1000:.1f} ms (première image incluse)")
+    print(f"cache : {stats['images']} images, {stats['bytes'] >> 10} Kio (pic {stats['peak'] >> 10} Kio, "
+          f"limite {args.cache} Mio), {stats['hits']} succès, {stats['misses']} défauts, "
+          f"{stats['evictions']} évictions")
@@ -0,0 +1,192 @@
+import argparse
+import csv
+import html
+import json
+import os
+import sys
+import time
+
+from grading import answer_mask
+from journal import read_journal
+
+FORMATS = ('jsonl', 'csv', 'html')
+CSV_FIELDS = ['session', 'number', 'key', 'question', 'is_correct', 'time',
+              'option_id', 'option', 'option_correct', 'option_chosen', 'typed']
+
+HTML_HEAD = """<!DOCTYPE html>
+<html lang="fr">
+<head>
+<meta charset="utf-8">
+<title>Résultats Quiz CCNA1</title>
+<style>
+body { font-family: Helvetica, Arial, sans-serif; max-width: 900px; margin: 2em auto; color: #2c3e50; }
+section { border-bottom: 1px solid #ccc; padding-bottom: 1em; margin-bottom: 2em; }
+.score { font-size: 1.4em; font-weight: bold; }
+.question { margin: 1em 0 0.3em; font-weight: bold; }
+.question.wrong { color: #e74c3c; }
+ul { margin: 0; }
+li.correct { color: #18bc9c; }
+li.chosen { font-weight: bold; }
+li.chosen:not(.correct) { color: #e74c3c; }
+.time { color: #7b8a8b; font-size: 0.9em; }
+.typed { font-family: monospace; }
+</style>
+</head>
+<body>
+<h1>Résultats Quiz CCNA1</h1>
+"""
+HTML_TAIL = "</body>\n</html>\n"
+
+
+def answer_rows(questions, option_ids, times, orders=None, texts=None):
+    # One row per answered question; options are listed in display order when known.
+    # Command questions list their accepted commands and keep what was typed.
+    for number, (question, chosen, time_on_task) in enumerate(zip(questions, option_ids, times), start=1):
+        chosen = set(chosen)
+        order = orders[number - 1] if orders is not None else range(len(question.answers))
+        if question.is_command:
+            order = range(len(question.answers))
+        row = {
+            'number': number,
+            'key': question.key,
+            'question': question.text,
+            'is_correct': answer_mask(chosen) == question.correct_mask,
+            'time': round(time_on_task, 3),
+            'options': [{'id': option_id, 'text': question.answers[option_id],
+                         'correct': question.is_correct(option_id), 'chosen': option_id in chosen}
+                        for option_id in order],
+        }
+        if question.is_command:
+            row['typed'] = texts[number - 1] if texts is not None else None
+        yield row
+
+
+def session_record(session_id, questions, option_ids, times, orders=None, elapsed=None, texts=None):
+    answers = list(answer_rows(questions, option_ids, times, orders, texts))
+    score = sum(answer['is_correct'] for answer in answers)
+    total = len(questions)
+    return {
+        'session': session_id,
+        'score': score,
+        'total': total,
+        'percentage': round(score / total * 100, 2) if total else 0.0,
+        'elapsed': round(sum(times) if elapsed is None else elapsed, 3),
+        'answers': answers,
+    }
+
+
+def journal_sessions(filename, model):
+    # Sessions are emitted as soon as their end record is read, so only the ones
+    # still open (and the ids of those done) are held in memory. Archived sessions come first.
+    open_sessions = {}
+    done = set()
+    for record in read_journal(filename):
+        session_id = record.get('session')
+        kind = record.get('type')
+        if kind == 'start':
+            if session_id in done:
+                # Left in both files by a compaction that was interrupted
+                continue
+            # An adaptive start only lists the first item: its questions are those answered
+            open_sessions[session_id] = (None if record.get('adaptive') else record['questions'], [])
+        elif kind == 'answer' and session_id in open_sessions:
+            open_sessions[session_id][1].append(record)
+        elif kind == 'abandon':
+            # Left midway: no result to export
+            open_sessions.pop(session_id, None)
+        elif kind == 'end' and session_id in open_sessions:
+            keys, answers = open_sessions.pop(session_id)
+            done.add(session_id)
+            if keys is None:
+                keys = [answer['question'] for answer in answers]
+            questions = [model.get_question_by_key(key) for key in keys]
+            if None in questions:
+                print(f"session {session_id}: questions absentes de la banque, ignorée", file=sys.stderr)
+                continue
+            yield session_record(session_id, questions, [answer['options'] for answer in answers],
+                                 [answer['elapsed'] for answer in answers],
+                                 texts=[answer.get('text') for answer in answers])
+
+
+def write_jsonl(sessions, out):
+    count = 0
+    for session in sessions:
+        out.write(json.dumps(session, ensure_ascii=False, separators=(',', ':')) + '\n')
+        count += 1
+    return count
+
+
+def write_csv(sessions, out):
+    writer = csv.writer(out)
+    writer.writerow(CSV_FIELDS)
+    count = 0
+    for session in sessions:
+        for answer in session['answers']:
+            for option in answer['options']:
+                writer.writerow([session['session'], answer['number'], answer['key'], answer['question'],
+                                 int(answer['is_correct']), answer['time'], option['id'], option['text'],
+                                 int(option['correct']), int(option['chosen']), answer.get('typed') or ''])
+        count += 1
+    return count
+
+
+def html_session(session):
+    yield (f"<section>\n<h2>Session {html.escape(session['session'])}</h2>\n"
+           f"<p class=\"score\">{session['score']}/{session['total']} ({session['percentage']:.2f}%)</p>\n"
+           f"<p class=\"time\">Temps total : {int(session['elapsed']) // 60}m {int(session['elapsed']) % 60}s</p>\n")
+    for answer in session['answers']:
+        status = '' if answer['is_correct'] else ' wrong'
+        yield (f"<p class=\"question{status}\">Question {answer['number']} : {html.escape(answer['question'])} "
+               f"<span class=\"time\">({answer['time']:.1f}s)</span></p>\n")
+        if 'typed' in answer:
+            yield f"<p class=\"typed\">Commande saisie : {html.escape(answer['typed'] or '-')}</p>\n"
+        yield "<ul>\n"
+        for option in answer['options']:
+            classes = ' '.join(name for name, flag in (('correct', option['correct']), ('chosen', option['chosen']))
+                               if flag)
+            yield f"<li class=\"{classes}\">{html.escape(option['text'])}</li>\n"
+        yield "</ul>\n"
+    yield "</section>\n"
+
+
+def write_html(sessions, out):
+    out.write(HTML_HEAD)
+    count = 0
+    for session in sessions:
+        out.write(''.join(html_session(session)))
+        count += 1
+    out.write(HTML_TAIL)
+    return count
+
+
+WRITERS = {'jsonl': write_jsonl, 'csv': write_csv, 'html': write_html}
+
+
+def export(sessions, filename, fmt=None):
+    fmt = fmt or os.path.splitext(filename)[1].lstrip('.').lower()
+    if fmt not in WRITERS:
+        raise ValueError(f"Format d'export inconnu : {fmt!r} (attendu : {', '.join(FORMATS)})")
+    tmp = filename + '.tmp'
+    with open(tmp, 'w', encoding='utf-8', newline='') as out:
+        count = WRITERS[fmt](sessions, out)
+    os.replace(tmp, filename)
+    return count
+
+
+if __name__ == "__main__":
+    from model import QuizModel
+
+    parser = argparse.ArgumentParser(description="Export des sessions du journal en JSONL, CSV ou HTML")
+    parser.add_argument('journal', help="journal des sessions (journal.jsonl)")
+    parser.add_argument('-o', '--output', required=True, help="fichier de sortie (.jsonl, .csv ou .html)")
+    parser.add_argument('-f', '--format', choices=FORMATS, default=None)
+    parser.add_argument('--bank', default="questions.json")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        count = export(journal_sessions(args.journal, QuizModel(args.bank)), args.output, args.format)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        sys.exit(1)
+    print(f"{count} sessions exportées vers {args.output} en {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,321 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from bank import question_keys
+from search import bitmap, bitmap_ids
+
+MAGIC = b'QFRM'
+VERSION = 1
+FORMS_SUFFIX = '.forms'
+# magic, version, form count, questions per form, key count, metadata size
+HEADER = struct.Struct('<4sHIIII')
+KEY_SIZE = 8
+MAX_ATTEMPTS = 50
+
+
+def position_type(key_count):
+    # Forms store indexes into the key table, on as few bytes as the table allows
+    return 'B' if key_count <= 1 << 8 else 'H' if key_count <= 1 << 16 else 'I'
+
+
+class Blueprint:
+    # questions: form length; topics: {search query: number of questions drawn for it};
+    # multiple: share of multi-answer items (None: no constraint); disjoint: forms of
+    # a group share no question (group = form id // disjoint)
+    def __init__(self, questions, topics=None, multiple=None, disjoint=1):
+        self.questions = int(questions)
+        self.topics = dict(topics or {})
+        self.multiple = multiple
+        self.disjoint = int(disjoint)
+        if sum(self.topics.values()) > self.questions:
+            raise ValueError("Le plan demande plus de questions par thème que la taille du formulaire.")
+        if multiple is not None and not 0 <= multiple <= 1:
+            raise ValueError("La part de questions à réponses multiples doit être entre 0 et 1.")
+        if self.disjoint < 1:
+            raise ValueError("disjoint doit valoir au moins 1.")
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['questions'], data.get('topics'), data.get('multiple'), data.get('disjoint', 1))
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'r', encoding='utf-8') as file:
+            return cls.from_dict(json.load(file))
+
+    def to_dict(self):
+        return {'questions': self.questions, 'topics': self.topics, 'multiple': self.multiple,
+                'disjoint': self.disjoint}
+
+    def multiple_count(self):
+        return None if self.multiple is None else round(self.multiple * self.questions)
+
+
+def bank_digest(model):
+    # Forms are drawn by position, so regenerating one needs the same questions in the same order
+    digest = hashlib.sha256()
+    for key in question_keys(model.data):
+        digest.update(bytes.fromhex(key))
+    return digest.hexdigest()
+
+
+class FormGenerator:
+    def __init__(self, model, blueprint):
+        self.model = model
+        self.blueprint = blueprint
+        size = len(model.data)
+        self.universe = (1 << size) - 1
+        # Same definition as form_summary: a command question with several accepted commands is not multi-answer
+        self.multiple_bits = bitmap((i for i, question in enumerate(model.data) if question.multiple), size)
+        quotas = []
+        covered = 0
+        for query, count in blueprint.topics.items():
+            bits = model.index.match(query)
+            quotas.append((bits, count, query))
+            covered |= bits
+        # Scarcest topics are filled first; the rest of the form comes from questions outside every topic
+        quotas.sort(key=lambda quota: quota[0].bit_count() - quota[1])
+        rest = blueprint.questions - sum(blueprint.topics.values())
+        if rest:
+            quotas.append((self.universe & ~covered, rest, None))
+        self.quotas = quotas
+
+    def form(self, rng, used=0):
+        available = self.universe & ~used
+        target = self.blueprint.multiple_count()
+        slots = self.blueprint.questions
+        picked = []
+        for bits, count, query in self.quotas:
+            pool = bits & available
+            if pool.bit_count() < count:
+                raise ValueError(f"Pas assez de questions pour le thème {query or '(autres)'!r}")
+            if target is None:
+                chosen = rng.sample(bitmap_ids(pool), count)
+            else:
+                multiple = pool & self.multiple_bits
+                single = pool & ~self.multiple_bits
+                # Multi-answer items are spread over the quotas in proportion to their size
+                low = max(0, count - single.bit_count())
+                high = min(count, multiple.bit_count(), target)
+                wanted = int(target * count / slots + rng.random()) if slots else 0
+                k = min(max(wanted, low), high)
+                chosen = rng.sample(bitmap_ids(multiple), k) + rng.sample(bitmap_ids(single), count - k)
+                target -= k
+            slots -= count
+            picked.extend(chosen)
+            available &= ~bitmap(chosen, len(self.model.data))
+        if target:
+            raise ValueError("Impossible d'atteindre la part de questions à réponses multiples demandée.")
+        rng.shuffle(picked)
+        return picked
+
+    def group(self, seed, group_id):
+        # Each group has its own generator seeded from (seed, group), so a form is
+        # reproducible whatever the number of processes or the order they run in
+        rng = random.Random(f"{seed}:{group_id}")
+        for _ in range(MAX_ATTEMPTS):
+            try:
+                forms = []
+                used = 0
+                for _ in range(self.blueprint.disjoint):
+                    form = self.form(rng, used)
+                    used |= bitmap(form, len(self.model.data))
+                    forms.append(form)
+                return forms
+            except ValueError as error:
+                last_error = error
+        raise ValueError(f"Plan irréalisable avec cette banque : {last_error}")
+
+    def group_keys(self, seed, group_id):
+        data = self.model.data
+        return [[data[i].key for i in form] for form in self.group(seed, group_id)]
+
+
+_generator = None
+
+
+def init_worker(banks, blueprint):
+    global _generator
+    from model import QuizModel
+    _generator = FormGenerator(QuizModel(banks), Blueprint.from_dict(blueprint))
+
+
+def worker_group(seed, group_id):
+    return _generator.group_keys(seed, group_id)
+
+
+def generate(banks, blueprint, count, seed=0, workers=1, model=None):
+    groups = -(-count // blueprint.disjoint)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(banks, blueprint.to_dict())) as pool:
+            results = pool.map(worker_group, [seed] * groups, range(groups), chunksize=max(1, groups // (workers * 8)))
+            forms = [form for group in results for form in group]
+    else:
+        if model is None:
+            from model import QuizModel
+            model = QuizModel(banks)
+        generator = FormGenerator(model, blueprint)
+        forms = [form for group_id in range(groups) for form in generator.group_keys(seed, group_id)]
+    return forms[:count]
+
+
+def write_forms(filename, forms, meta):
+    keys = {}
+    for form in forms:
+        for key in form:
+            keys.setdefault(key, len(keys))
+    positions = array(position_type(len(keys)), (keys[key] for form in forms for key in form))
+    if sys.byteorder != 'little':
+        positions.byteswap()
+    encoded = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+    length = len(forms[0]) if forms else 0
+
+    tmp = filename + '.tmp'
+    with open(tmp, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, VERSION, len(forms), length, len(keys), len(encoded)))
+        out.write(encoded)
+        out.write(b''.join(bytes.fromhex(key) for key in keys))
+        out.write(positions.tobytes())
+    os.replace(tmp, filename)
+    return filename
+
+
+class FormsFile:
+    # Fixed-size records: a form is read by id without loading the others
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as file:
+            try:
+                self._mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f"{filename}: empty forms file")
+        if len(self._mm) < HEADER.size:
+            raise ValueError(f"{filename}: truncated forms file")
+        magic, version, count, length, key_count, meta_size = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{filename}: unsupported forms file (version {version})")
+        self._count = count
+        self.length = length
+        self.meta = json.loads(self._mm[HEADER.size:HEADER.size + meta_size].decode('utf-8'))
+        self._keys = HEADER.size + meta_size
+        self._forms = self._keys + key_count * KEY_SIZE
+        self._type = position_type(key_count)
+        self._record = length * array(self._type).itemsize
+        if len(self._mm) < self._forms + count * self._record:
+            raise ValueError(f"{filename}: truncated forms file")
+
+    def __len__(self):
+        return self._count
+
+    def keys(self, form_id):
+        if not 0 <= form_id < self._count:
+            raise IndexError("form id out of range")
+        offset = self._forms + form_id * self._record
+        positions = array(self._type, self._mm[offset:offset + self._record])
+        if sys.byteorder != 'little':
+            positions.byteswap()
+        return [self._mm[self._keys + i * KEY_SIZE:self._keys + (i + 1) * KEY_SIZE].hex() for i in positions]
+
+    def questions(self, form_id, model):
+        return [model.get_question_by_key(key) for key in self.keys(form_id)]
+
+    def close(self):
+        self._mm.close()
+
+
+def verify(forms_file, model, form_ids=None):
+    # Regenerates the forms from the recorded blueprint and seed; returns the ids that differ
+    if forms_file.meta.get('bank') != bank_digest(model):
+        raise ValueError("La banque chargée n'est pas celle qui a servi à générer les formulaires.")
+    blueprint = Blueprint.from_dict(forms_file.meta['blueprint'])
+    generator = FormGenerator(model, blueprint)
+    seed = forms_file.meta['seed']
+    ids = range(len(forms_file)) if form_ids is None else form_ids
+    mismatches = []
+    groups = {}
+    for form_id in ids:
+        group_id = form_id // blueprint.disjoint
+        if group_id not in groups:
+            groups = {group_id: generator.group_keys(seed, group_id)}
+        if groups[group_id][form_id % blueprint.disjoint] != forms_file.keys(form_id):
+            mismatches.append(form_id)
+    return mismatches
+
+
+def form_summary(keys, model, blueprint):
+    questions = [model.get_question_by_key(key) for key in keys]
+    multiple = sum(1 for question in questions if question is not None and question.multiple)
+    # Keys no longer in the bank are listed as missing by the caller and count for no topic
+    positions = [position for position in map(model.get_position, keys) if position is not None]
+    topics = {}
+    for query in blueprint.topics:
+        bits = model.index.match(query)
+        topics[query] = sum(1 for position in positions if bits >> position & 1)
+    return questions, multiple, topics
+
+
+if __name__ == "__main__":
+    from model import QuizModel
+
+    parser = argparse.ArgumentParser(description="Génération de formulaires d'examen équilibrés et reproductibles")
+    bank_option = argparse.ArgumentParser(add_help=False)
+    bank_option.add_argument('--bank', nargs='+', default=["questions.json"])
+    commands = parser.add_subparsers(dest='command', required=True)
+    generate_parser = commands.add_parser('generate', parents=[bank_option],
+                                          help="génère des formulaires à partir d'un plan JSON")
+    generate_parser.add_argument('blueprint')
+    generate_parser.add_argument('-n', '--count', type=int, default=1000)
+    generate_parser.add_argument('--seed', type=int, default=0)
+    generate_parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1)
+    generate_parser.add_argument('-o', '--output', default="examens" + FORMS_SUFFIX)
+    show_parser = commands.add_parser('show', parents=[bank_option], help="affiche un formulaire")
+    show_parser.add_argument('forms')
+    show_parser.add_argument('form_id', type=int)
+    verify_parser = commands.add_parser('verify', parents=[bank_option],
+                                        help="régénère les formulaires et les compare au fichier")
+    verify_parser.add_argument('forms')
+    verify_parser.add_argument('form_ids', type=int, nargs='*')
+    args = parser.parse_args()
+
+    model = QuizModel(args.bank)
+    try:
+        if args.command == 'generate':
+            blueprint = Blueprint.load(args.blueprint)
+            started = time.perf_counter()
+            forms = generate(args.bank, blueprint, args.count, args.seed, args.workers, model)
+            seconds = time.perf_counter() - started
+            meta = {'blueprint': blueprint.to_dict(), 'seed': args.seed, 'banks': model.filenames,
+                    'bank': bank_digest(model)}
+            write_forms(args.output, forms, meta)
+            print(f"{len(forms)} formulaires en {seconds:.2f}s ({len(forms) / seconds:.0f}/s) -> {args.output} "
+                  f"({os.path.getsize(args.output)} octets)")
+        elif args.command == 'show':
+            forms = FormsFile(args.forms)
+            blueprint = Blueprint.from_dict(forms.meta['blueprint'])
+            questions, multiple, topics = form_summary(forms.keys(args.form_id), model, blueprint)
+            print(f"Formulaire {args.form_id} (graine {forms.meta['seed']}) : {len(questions)} questions, "
+                  f"{multiple} à réponses multiples")
+            for query, count in topics.items():
+                print(f"  {query}: {count}")
+            for number, question in enumerate(questions, start=1):
+                print(f"{number:3}. {question.text[:90] if question is not None else '(absente de la banque)'}")
+        else:
+            forms = FormsFile(args.forms)
+            mismatches = verify(forms, model, args.form_ids or None)
+            if mismatches:
+                print(f"{len(mismatches)} formulaires diffèrent : {mismatches[:20]}")
+                sys.exit(1)
+            print(f"{len(args.form_ids) or len(forms)} formulaires régénérés à l'identique")
+    except (OSError, ValueError, IndexError) as error:
+        print(error, file=sys.stderr)
+        sys.exit(1)
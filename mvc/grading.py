@@ -0,0 +1,80 @@
+from array import array
+
+# numpy takes ~100 ms to import and only batch grading uses it, so it is loaded on first use
+np = None
+
+
+def load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        np = numpy
+    return np or None
+
+
+def correct_mask(answers):
+    mask = 0
+    for i, answer in enumerate(answers):
+        if answer.get('correct-answer', False):
+            mask |= 1 << i
+    return mask
+
+
+def answer_mask(indices):
+    mask = 0
+    for i in indices:
+        mask |= 1 << i
+    return mask
+
+
+def mask_indices(mask):
+    indices = []
+    i = 0
+    while mask:
+        if mask & 1:
+            indices.append(i)
+        mask >>= 1
+        i += 1
+    return indices
+
+
+def bank_masks(questions):
+    masks = getattr(questions, 'correct_masks', None)
+    if masks is not None:
+        return masks
+    return array('Q', (question.correct_mask for question in questions))
+
+
+def grade_matrix(responses, question_ids, masks):
+    # responses[s][k] is the answer mask session s gave to bank question question_ids[s][k];
+    # question_ids may also be a single row shared by every session, and -1 marks padding.
+    if load_numpy() is not None:
+        return _grade_matrix_numpy(responses, question_ids, masks)
+    return _grade_matrix_python(responses, question_ids, masks)
+
+
+def _grade_matrix_numpy(responses, question_ids, masks):
+    masks = np.asarray(masks, dtype=np.uint64)
+    responses = np.asarray(responses, dtype=np.uint64)
+    question_ids = np.asarray(question_ids, dtype=np.int64)
+    if question_ids.ndim == 1:
+        question_ids = np.broadcast_to(question_ids, responses.shape)
+    answered = question_ids >= 0
+    expected = masks[np.where(answered, question_ids, 0)]
+    correct = (responses == expected) & answered
+    return correct, correct.sum(axis=1)
+
+
+def _grade_matrix_python(responses, question_ids, masks):
+    shared = len(question_ids) > 0 and not hasattr(question_ids[0], '__len__')
+    correct = []
+    scores = []
+    for s, row in enumerate(responses):
+        ids = question_ids if shared else question_ids[s]
+        graded = [q >= 0 and mask == masks[q] for mask, q in zip(row, ids)]
+        correct.append(graded)
+        scores.append(sum(graded))
+    return correct, scores
@@ -0,0 +1,424 @@
+import argparse
+import heapq
+import itertools
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from controller import QuizController
+from forms import FormsFile
+from ioscmd import default_grammar
+from journal import Journal
+from model import QuizModel
+
+# What QuizController needs from a view backend (QuizView is the Tk one):
+#   root                 bind(), after(), after_idle(), after_cancel(), quit()
+#   current_screen       "start_menu", "question" or "results"
+#   show_start_menu(resume_text, form_count) -> start button; num_questions_entry,
+#                        topic_entry, spaced_var, adaptive_var, form_entry, resume_button
+#   show_question(question, order, current, total); answer_vars, single_choice,
+#                        command_var (typed command), submit_button; prefetch(next question)
+#   show_results(score, total, percentage, elapsed, user_answers, questions, orders);
+#                        restart_button, exit_button
+#   update_timer(seconds), create_menu(...), show_error(message), show_about(),
+#   ask_export_filename(), show_report(title, lines)
+# Buttons only need config(command=...), variables and entries get()/set().
+
+
+class Value:
+    def __init__(self, value=None):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class Button:
+    def __init__(self):
+        self.command = None
+
+    def config(self, command=None, **options):
+        if command is not None:
+            self.command = command
+
+    def invoke(self):
+        if self.command is not None:
+            return self.command()
+
+
+class HeadlessRoot:
+    # Stand-in for tk.Tk: key bindings and a timer queue run on demand by update()
+    def __init__(self):
+        self.bindings = {}
+        self.callbacks = {}
+        self.queue = []
+        self.ids = itertools.count()
+        self.running = False
+
+    def bind(self, sequence, callback):
+        self.bindings[sequence] = callback
+
+    def event(self, sequence):
+        callback = self.bindings.get(sequence)
+        if callback is not None:
+            return callback(None)
+
+    def after(self, ms, func=None, *args):
+        if func is None:
+            time.sleep(ms / 1000)
+            return None
+        after_id = f"after#{next(self.ids)}"
+        self.callbacks[after_id] = (func, args)
+        heapq.heappush(self.queue, (time.monotonic() + ms / 1000, after_id))
+        return after_id
+
+    def after_idle(self, func, *args):
+        return self.after(0, func, *args)
+
+    def after_cancel(self, after_id):
+        self.callbacks.pop(after_id, None)
+
+    def next_due(self):
+        while self.queue and self.queue[0][1] not in self.callbacks:
+            heapq.heappop(self.queue)
+        return self.queue[0][0] if self.queue else None
+
+    def update(self):
+        now = time.monotonic()
+        while self.queue and self.queue[0][0] <= now:
+            _, after_id = heapq.heappop(self.queue)
+            entry = self.callbacks.pop(after_id, None)
+            if entry is not None:
+                entry[0](*entry[1])
+
+    def mainloop(self):
+        self.running = True
+        while self.running:
+            due = self.next_due()
+            if due is None:
+                break
+            time.sleep(max(0.0, due - time.monotonic()))
+            self.update()
+
+    def quit(self):
+        self.running = False
+
+
+class HeadlessView:
+    def __init__(self, root=None):
+        self.root = root if root is not None else HeadlessRoot()
+        self.current_screen = None
+        self.num_questions_entry = Value("60")
+        self.topic_entry = Value("")
+        self.spaced_var = Value(False)
+        self.adaptive_var = Value(False)
+        self.form_entry = Value("")
+        self.form_count = 0
+        self.start_button = Button()
+        self.resume_button = None
+        self.resume_text = None
+        self.submit_button = Button()
+        self.restart_button = Button()
+        self.exit_button = Button()
+        self.answer_vars = []
+        self.single_choice = False
+        self.choice_var = Value(-1)
+        self.command_var = Value("")
+        self.question = None
+        self.order = None
+        self.progress = (0, 0)
+        self.elapsed = 0
+        self.results = None
+        self.errors = []
+        self.prefetched = None
+        self.export_filename = None
+
+    def create_menu(self, restart_callback, quit_callback, about_callback, export_callback, analysis_callback):
+        self.menu = {'restart': restart_callback, 'quit': quit_callback,
+                     'about': about_callback, 'export': export_callback, 'analysis': analysis_callback}
+
+    def show_start_menu(self, resume_text=None, form_count=0):
+        self.current_screen = "start_menu"
+        self.resume_text = resume_text
+        self.form_count = form_count
+        self.resume_button = Button() if resume_text else None
+        return self.start_button
+
+    def show_question(self, question, order, current_question, total_questions):
+        self.current_screen = "question"
+        self.question = question
+        self.order = order
+        self.progress = (current_question, total_questions)
+        if question.is_command:
+            self.single_choice = False
+            self.answer_vars = []
+            self.command_var.set("")
+            return
+        if not question.answers:
+            self.answer_vars = []
+            self.show_error("No answers found for this question.")
+            return
+        self.single_choice = question.correct_count == 1
+        if self.single_choice:
+            self.choice_var.set(-1)
+            self.answer_vars = [self.choice_var]
+        else:
+            self.answer_vars = [Value(False) for _ in order]
+
+    def displayed_answers(self):
+        return [self.question.answers[i] for i in self.order]
+
+    def prefetch(self, question):
+        self.prefetched = question
+
+    def choose(self, indices):
+        # Selects answers by their displayed position, as a click or a number key would
+        if self.single_choice:
+            self.choice_var.set(indices[0] if indices else -1)
+        else:
+            for i, var in enumerate(self.answer_vars):
+                var.set(i in indices)
+
+    def update_timer(self, elapsed_time):
+        self.elapsed = elapsed_time
+
+    def show_results(self, score, total, score_percentage, elapsed_time, user_answers, selected_questions, orders):
+        self.current_screen = "results"
+        self.results = (score, total, score_percentage, elapsed_time)
+        self.user_answers = user_answers
+
+    def show_error(self, message):
+        self.errors.append(message)
+
+    def show_about(self):
+        pass
+
+    def ask_export_filename(self):
+        return self.export_filename
+
+    def show_report(self, title, lines):
+        self.report = (title, lines)
+
+
+class TerminalView(HeadlessView):
+    def __init__(self, root=None, out=sys.stdout, read=input):
+        super().__init__(root)
+        self.out = out
+        self.read = read
+
+    def write(self, text=""):
+        print(text, file=self.out)
+
+    def show_start_menu(self, resume_text=None, form_count=0):
+        button = super().show_start_menu(resume_text, form_count)
+        self.write("\nBienvenue sur Quizz CCNA1!")
+        if resume_text:
+            self.write(f"(tapez 'reprendre' pour : {resume_text})")
+        if form_count:
+            self.write(f"(tapez 'f N' pour passer le formulaire N, de 0 à {form_count - 1})")
+        return button
+
+    def show_question(self, question, order, current_question, total_questions):
+        super().show_question(question, order, current_question, total_questions)
+        minutes, seconds = divmod(self.elapsed, 60)
+        self.write(f"\nQuestion {current_question} sur {total_questions}  [{minutes:02d}:{seconds:02d}]")
+        self.write(question.text)
+        if question.exhibit is not None:
+            self.write(f"  [illustration : {question.exhibit}]")
+        for i, answer in enumerate(self.displayed_answers(), start=1):
+            self.write(f"  {i}. {answer}")
+        if not self.single_choice and not question.is_command:
+            self.write(f"  ({question.correct_count} réponses)")
+
+    def show_results(self, score, total, score_percentage, elapsed_time, user_answers, selected_questions, orders):
+        super().show_results(score, total, score_percentage, elapsed_time, user_answers, selected_questions, orders)
+        minutes, seconds = divmod(elapsed_time, 60)
+        self.write(f"\nScore: {score}/{total} ({score_percentage:.2f}%) en {minutes}m {seconds}s")
+        self.write("Félicitations, vous auriez eu votre CCNA1!" if score_percentage >= 70
+                   else "Vous n'auriez pas eu votre CCNA1.")
+        for number, answer in enumerate(user_answers, start=1):
+            if not answer['is_correct']:
+                self.write(f"\n{number}. {answer['question']}")
+                self.write(f"   Vos réponses : {', '.join(answer['user_answers']) or '-'}")
+                self.write(f"   Bonnes réponses : {', '.join(answer['correct_answers'])}")
+
+    def show_error(self, message):
+        super().show_error(message)
+        self.write(f"Erreur: {message}")
+
+    def show_report(self, title, lines):
+        super().show_report(title, lines)
+        self.write(f"\n{title}")
+        for line in lines:
+            self.write(line)
+
+    def run(self):
+        self.root.running = True
+        try:
+            while self.root.running:
+                self.root.update()
+                if self.current_screen == "start_menu":
+                    line = self.read("Nombre de questions (60 au CCNA1, ex. 'a 60' en mode adaptatif), "
+                                     "'analyse' ou 'q' : ").strip()
+                    if line == 'q':
+                        self.menu['quit']()
+                    elif line == 'analyse':
+                        self.menu['analysis']()
+                    elif line == 'reprendre' and self.resume_button is not None:
+                        self.resume_button.invoke()
+                    elif line.startswith('f ') and self.form_count:
+                        self.form_entry.set(line[2:].strip())
+                        self.adaptive_var.set(False)
+                        self.start_button.invoke()
+                        self.form_entry.set("")
+                    else:
+                        self.adaptive_var.set(line.startswith('a'))
+                        self.num_questions_entry.set(line.lstrip('a').strip())
+                        self.topic_entry.set(self.read("Thème (optionnel) : ").strip())
+                        try:
+                            self.start_button.invoke()
+                        except ValueError:
+                            self.show_error("Entrez un nombre de questions valide.")
+                elif self.current_screen == "question" and self.question.is_command:
+                    self.command_var.set(self.read("Commande IOS : "))
+                    self.submit_button.invoke()
+                elif self.current_screen == "question":
+                    line = self.read("Réponse(s), ex. 1 3 : ")
+                    try:
+                        indices = [int(token) - 1 for token in line.replace(',', ' ').split()]
+                    except ValueError:
+                        indices = []
+                    self.choose([i for i in indices if 0 <= i < len(self.order)])
+                    self.submit_button.invoke()
+                else:
+                    line = self.read("'r' pour recommencer, autre touche pour quitter : ").strip().lower()
+                    (self.restart_button if line == 'r' else self.exit_button).invoke()
+        except (EOFError, KeyboardInterrupt):
+            self.menu['quit']()
+
+
+class ScriptedCandidate:
+    # Answers correctly with probability `accuracy`, otherwise picks a wrong option.
+    # Command questions get an accepted command typed with random abbreviations, or
+    # the same command with its last word changed.
+    def __init__(self, accuracy=0.75, rng=None):
+        self.accuracy = accuracy
+        self.rng = rng if rng is not None else random.Random()
+
+    def answer(self, view):
+        if view.question.is_command:
+            typed = default_grammar().abbreviate(self.rng.choice(view.question.answers), self.rng)
+            if self.rng.random() >= self.accuracy:
+                typed = typed.rsplit(' ', 1)[0] + ' x'
+            view.command_var.set(typed)
+            return
+        mask, order = view.question.correct_mask, view.order
+        correct = [i for i, option_id in enumerate(order) if mask >> option_id & 1]
+        if self.rng.random() >= self.accuracy:
+            wrong = [i for i in range(len(order)) if i not in correct]
+            if wrong:
+                correct = correct[:-1] + [self.rng.choice(wrong)]
+        view.choose(correct)
+
+
+class MemoryJournal(Journal):
+    # Sink for simulated exams nobody reads back: the controller builds its records
+    # as usual, they are counted but neither encoded nor written. The file stays
+    # empty, so there is never a session to resume.
+    def __init__(self, filename):
+        super().__init__(filename, durable=False)
+        self.records = 0
+
+    def write(self, record):
+        self.records += 1
+
+
+def run_exams(model, count, num_questions=60, accuracy=0.75, seed=0, journal_dir=None, durable=False):
+    # Drives the real controller through complete exams. The journal is only written
+    # when journal_dir asks to keep it, and then fsync'ed only if durable: that cost
+    # belongs to the disk, not the quiz.
+    directory = journal_dir or tempfile.mkdtemp(prefix='quiz-headless-')
+    if journal_dir is None:
+        journal = MemoryJournal(os.path.join(directory, 'journal.jsonl'))
+    else:
+        journal = Journal(os.path.join(directory, 'journal.jsonl'), durable=durable)
+    random.seed(seed)
+    view = HeadlessView()
+    view.num_questions_entry.set(str(num_questions))
+    controller = QuizController(model, view, journal=journal,
+                                progress_file=os.path.join(directory, 'progress.json'))
+    candidate = ScriptedCandidate(accuracy, random.Random(seed))
+    scores = []
+    started = time.perf_counter()
+    try:
+        for _ in range(count):
+            view.start_button.invoke()
+            while view.current_screen == "question":
+                candidate.answer(view)
+                view.submit_button.invoke()
+            scores.append(view.results[2])
+        seconds = time.perf_counter() - started
+    finally:
+        controller.timer.stop()
+        journal.close()
+        if journal_dir is None:
+            shutil.rmtree(directory, ignore_errors=True)
+    return {
+        'exams': count,
+        'seconds': seconds,
+        'exams_per_s': count / seconds if seconds else 0.0,
+        'mean_score': sum(scores) / len(scores) if scores else 0.0,
+    }
+
+
+def run_chunk(banks, count, num_questions, accuracy, seed):
+    return run_exams(QuizModel(banks), count, num_questions, accuracy, seed)
+
+
+def run_parallel(banks, count, workers, num_questions=60, accuracy=0.75, seed=0):
+    # One model per process; throughput is measured on the wall clock, bank loading included
+    chunks = [count // workers + (i < count % workers) for i in range(workers)]
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run_chunk, [banks] * workers, chunks, [num_questions] * workers,
+                                [accuracy] * workers, [seed + i for i in range(workers)]))
+    seconds = time.perf_counter() - started
+    return {
+        'exams': count,
+        'seconds': seconds,
+        'exams_per_s': count / seconds if seconds else 0.0,
+        'mean_score': sum(r['mean_score'] * r['exams'] for r in results) / count if count else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quiz sans interface graphique : terminal ou candidats simulés")
+    parser.add_argument('banks', nargs='*', default=["questions.json"])
+    parser.add_argument('--simulate', type=int, metavar='N', help="fait passer N examens à un candidat simulé")
+    parser.add_argument('--questions', type=int, default=60)
+    parser.add_argument('--accuracy', type=float, default=0.75)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-j', '--workers', type=int, default=1, help="processus pour --simulate")
+    parser.add_argument('--forms', metavar='FICHIER', help="formulaires générés par forms.py")
+    args = parser.parse_args()
+
+    model = QuizModel(args.banks)
+    if args.simulate:
+        num_questions = min(args.questions, len(model.data))
+        if args.workers > 1:
+            stats = run_parallel(args.banks, args.simulate, args.workers, num_questions, args.accuracy, args.seed)
+        else:
+            stats = run_exams(model, args.simulate, num_questions, args.accuracy, args.seed)
+        print(f"{stats['exams']} examens en {stats['seconds']:.2f}s ({stats['exams_per_s']:.0f} examens/s), "
+              f"score moyen {stats['mean_score']:.1f}%")
+    else:
+        view = TerminalView()
+        QuizController(model, view, forms=FormsFile(args.forms) if args.forms else None)
+        view.run()
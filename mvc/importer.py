@@ -0,0 +1,169 @@
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+
+QUESTION_START = re.compile(r'^\s*\d+\s*[.)]\s*\S')
+HIGHLIGHT = re.compile(r'color\s*:\s*(#f00\b|#ff0000|red\b|rgb\(\s*255\s*,\s*0\s*,\s*0\s*\))', re.IGNORECASE)
+BLOCKS = {'p', 'h2', 'h3', 'h4', 'div'}
+
+
+class ExamPageParser(HTMLParser):
+    # ccnareponses pages put each question in a paragraph starting with its number,
+    # followed by a list whose correct items are wrapped in a red (or "correct") span.
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.questions = []
+        self.skipped = []
+        self.current = None
+        self.text = []
+        self.in_block = False
+        self.in_item = False
+        self.list_depth = 0
+        self.list_done = False
+        self.highlight_stack = []
+        self.item_correct = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        highlighted = bool(HIGHLIGHT.search(attrs.get('style') or '')) or 'correct' in (attrs.get('class') or '')
+        if tag in ('ul', 'ol'):
+            self.list_depth += 1
+        elif tag == 'li' and self.list_depth == 1 and self.current is not None and not self.list_done:
+            self.in_item = True
+            self.item_correct = highlighted
+            self.text = []
+        elif tag in BLOCKS and not self.in_item:
+            self.in_block = True
+            self.text = []
+        elif tag == 'br' and (self.in_block or self.in_item):
+            self.text.append(' ')
+        if tag not in ('br', 'img', 'hr', 'input'):
+            self.highlight_stack.append((tag, highlighted))
+
+    def handle_endtag(self, tag):
+        while self.highlight_stack:
+            if self.highlight_stack.pop()[0] == tag:
+                break
+        if tag in ('ul', 'ol'):
+            self.list_depth = max(0, self.list_depth - 1)
+            if self.list_depth == 0 and self.current is not None and self.current['answers']:
+                self.list_done = True
+        elif tag == 'li' and self.in_item:
+            self.in_item = False
+            text = self.collected()
+            if text:
+                self.current['answers'].append({'text': text, 'correct-answer': self.item_correct})
+        elif tag in BLOCKS and self.in_block:
+            self.in_block = False
+            text = self.collected()
+            if QUESTION_START.match(text):
+                self.finish_question()
+                self.current = {'question': text, 'answers': []}
+                self.list_done = False
+
+    def handle_data(self, data):
+        if self.in_item or self.in_block:
+            self.text.append(data)
+            if self.in_item and data.strip() and any(h for _, h in self.highlight_stack):
+                self.item_correct = True
+
+    def collected(self):
+        return ' '.join(''.join(self.text).split())
+
+    def finish_question(self):
+        question = self.current
+        self.current = None
+        if question is None:
+            return
+        if len(question['answers']) < 2 or not any(a['correct-answer'] for a in question['answers']):
+            self.skipped.append(question['question'][:80])
+        else:
+            self.questions.append(question)
+
+    def close(self):
+        super().close()
+        self.finish_question()
+
+
+def parse_page(path):
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as file:
+            parser = ExamPageParser()
+            parser.feed(file.read())
+            parser.close()
+    except Exception as error:
+        return path, [], [], f"{type(error).__name__}: {error}"
+    if not parser.questions:
+        return path, [], parser.skipped, "aucune question trouvée"
+    return path, parser.questions, parser.skipped, None
+
+
+def iter_pages(paths, workers=None):
+    if workers == 1:
+        yield from map(parse_page, paths)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(parse_page, paths, chunksize=max(1, len(paths) // ((workers or os.cpu_count() or 1) * 4)))
+
+
+def iter_questions(results, stats, errors=sys.stderr):
+    for path, questions, skipped, error in results:
+        stats['pages'] += 1
+        for text in skipped:
+            stats['skipped'] += 1
+            print(f"{path}: question ignorée (réponses manquantes) : {text}", file=errors)
+        if error:
+            stats['errors'] += 1
+            print(f"{path}: {error}", file=errors)
+            continue
+        yield from questions
+
+
+def write_bank_stream(questions, out, stats):
+    out.write('[')
+    for question in questions:
+        out.write(',\n    ' if stats['questions'] else '\n    ')
+        out.write(json.dumps(question, ensure_ascii=False, indent=4).replace('\n', '\n    '))
+        stats['questions'] += 1
+    out.write('\n]\n')
+
+
+def import_pages(paths, output, workers=None, errors=sys.stderr):
+    stats = {'pages': 0, 'questions': 0, 'skipped': 0, 'errors': 0}
+    started = time.perf_counter()
+    tmp = output + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as out:
+        write_bank_stream(iter_questions(iter_pages(paths, workers), stats, errors), out, stats)
+    os.replace(tmp, output)
+    stats['seconds'] = time.perf_counter() - started
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import de pages ccnareponses enregistrées vers une banque de questions")
+    parser.add_argument('pages', help="dossier contenant les pages .html enregistrées")
+    parser.add_argument('-o', '--output', required=True, help="banque à écrire")
+    parser.add_argument('--force', action='store_true', help="remplacer la banque si elle existe déjà")
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    args = parser.parse_args()
+    if os.path.exists(args.output) and not args.force:
+        print(f"{args.output} existe déjà (--force pour le remplacer)", file=sys.stderr)
+        sys.exit(1)
+
+    paths = sorted(glob.glob(os.path.join(args.pages, '*.htm')) + glob.glob(os.path.join(args.pages, '*.html')))
+    if not paths:
+        print(f"Aucune page HTML dans {args.pages}", file=sys.stderr)
+        sys.exit(1)
+
+    stats = import_pages(paths, args.output, args.workers)
+    rate = stats['pages'] / stats['seconds'] if stats['seconds'] else 0.0
+    print(f"{stats['pages']} pages, {stats['questions']} questions, {stats['skipped']} ignorées, "
+          f"{stats['errors']} erreurs en {stats['seconds']:.2f}s ({rate:.0f} pages/s)")
+    if stats['errors']:
+        sys.exit(2)
@@ -0,0 +1,555 @@
+import argparse
+import ipaddress
+import random
+import re
+import sys
+import time
+
+# One command per line under its mode; <...> are arguments. "a = b" grades a as b,
+# "a > mode" enters that mode, so a multi-line answer is parsed the way a router would.
+COMMANDS = """
+[exec]
+enable
+disable
+configure terminal > config
+exit
+logout
+reload
+show running-config
+show startup-config
+show version
+show flash
+show history
+show users
+show arp
+show protocols
+show controllers
+show interfaces
+show interfaces <interface>
+show ip interface brief
+show ip route
+show ip ssh
+show ipv6 interface brief
+show ipv6 route
+show mac address-table
+show vlan brief
+show cdp neighbors
+copy running-config startup-config
+copy startup-config running-config
+write = copy running-config startup-config
+write memory = copy running-config startup-config
+write erase = erase startup-config
+erase startup-config
+ping <host>
+traceroute <host>
+telnet <host>
+ssh -l <word> <host>
+clock set <text>
+terminal history size <number>
+undebug all
+
+[config]
+hostname <word>
+enable secret <word>
+enable password <word>
+service password-encryption
+security passwords min-length <number>
+login block-for <number> attempts <number> within <number>
+banner motd <text>
+ip domain-name <host>
+ip domain name <host> = ip domain-name <host>
+ip domain-lookup
+ip domain lookup = ip domain-lookup
+ip default-gateway <ip>
+ip route <ip> <ip> <host>
+ip ssh version <number>
+ip ssh time-out <number>
+ip ssh authentication-retries <number>
+ip dhcp excluded-address <ip> <ip>
+ip dhcp pool <word> > dhcp
+ipv6 unicast-routing
+crypto key generate rsa
+crypto key generate rsa general-keys modulus <number>
+crypto key zeroize rsa
+username <word> secret <word>
+username <word> password <word>
+username <word> privilege <number> secret <word>
+interface <interface> > interface
+interface range <text> > interface
+line console <number> > line
+line vty <number> <number> > line
+line aux <number> > line
+vlan <number> > vlan
+cdp run
+lldp run
+end > exec
+exit > exec
+
+[interface]
+ip address <ip> <ip>
+ip address dhcp
+ipv6 address <ipv6>
+ipv6 address <ipv6> link-local
+ipv6 address autoconfig
+ipv6 enable
+shutdown
+description <text>
+duplex full
+duplex half
+duplex auto
+speed <number>
+speed auto
+mdix auto
+switchport mode access
+switchport mode trunk
+switchport access vlan <number>
+switchport port-security
+switchport port-security maximum <number>
+switchport port-security mac-address sticky
+switchport port-security violation shutdown
+switchport port-security violation restrict
+switchport port-security violation protect
+end > exec
+exit > config
+
+[line]
+password <word>
+login
+login local
+transport input ssh
+transport input telnet
+transport input all
+transport input none
+transport input ssh telnet = transport input telnet ssh
+transport input telnet ssh
+exec-timeout <number>
+exec-timeout <number> <number>
+logging synchronous
+history size <number>
+end > exec
+exit > config
+
+[vlan]
+name <word>
+end > exec
+exit > config
+
+[dhcp]
+network <ip> <ip>
+default-router <ip>
+dns-server <ip>
+domain-name <host>
+end > exec
+exit > config
+"""
+MODES = ('exec', 'config', 'interface', 'line', 'vlan', 'dhcp')
+# Configuration modes take "no" and "do"; a submode also accepts global commands
+CONFIG_MODES = frozenset(MODES[1:])
+PREFIXES = ('no', 'do')
+INTERFACE_TYPES = ('GigabitEthernet', 'FastEthernet', 'Ethernet', 'Serial', 'Loopback', 'Vlan',
+                   'TenGigabitEthernet', 'Port-channel', 'Tunnel')
+INTERFACE = re.compile(r'([a-z-]+?)-?(\d+(?:/\d+)*(?:\.\d+)?)$')
+INTERFACE_NUMBER = re.compile(r'\d+(?:/\d+)*(?:\.\d+)?$')
+IPV4 = re.compile(r'\d{1,3}(?:\.\d{1,3}){3}$')
+SEPARATORS = re.compile(r'[;\n]')
+AMBIGUOUS = object()
+
+
+class CommandError(ValueError):
+    # position: index of the token where parsing stopped, to report the furthest failure
+    def __init__(self, message, position=-1):
+        super().__init__(message)
+        self.position = position
+
+
+def furthest(error, other):
+    return other if error is None or other.position > error.position else error
+
+
+def prefix_table(words):
+    # Every prefix of every word, mapped to the word it designates. As on IOS a prefix
+    # shared by several words is ambiguous, unless one of them is a prefix of all the
+    # others: "dom" next to domain, domain-lookup and domain-name maps to all three,
+    # and the next token decides ("ip dom cisco.com" can only be domain-name).
+    table = {}
+    for word in words:
+        for length in range(1, len(word) + 1):
+            prefix = word[:length]
+            candidates = sorted((other for other in words if other.startswith(prefix)), key=len)
+            if prefix in words or len(candidates) == 1:
+                table[prefix] = prefix if prefix in words else word
+            elif all(other.startswith(candidates[0]) for other in candidates):
+                table[prefix] = tuple(candidates)
+            else:
+                table[prefix] = AMBIGUOUS
+    return table
+
+
+def shortest_prefix(table, word):
+    return next(length for length in range(1, len(word) + 1) if table[word[:length]] == word)
+
+
+def lookup(table, token, position=-1, last=True):
+    # A prefix with several candidates needs a following token to choose between them
+    word = table.get(token)
+    if word is AMBIGUOUS or (type(word) is tuple and last):
+        raise CommandError(f"abréviation ambiguë : {token!r}", position)
+    return word
+
+
+INTERFACE_TABLE = prefix_table([name.lower() for name in INTERFACE_TYPES])
+INTERFACE_NAMES = {name.lower(): name for name in INTERFACE_TYPES}
+
+
+def parse_interface(tokens, i):
+    token = tokens[i].lower()
+    match = INTERFACE.match(token)
+    if match:
+        kind, number, used = match.group(1), match.group(2), 1
+    elif i + 1 < len(tokens) and INTERFACE_NUMBER.match(tokens[i + 1]):
+        kind, number, used = token, tokens[i + 1], 2
+    else:
+        return None
+    name = INTERFACE_TABLE.get(kind)
+    if name is None or name is AMBIGUOUS:
+        return None
+    port, dot, sub = number.partition('.')
+    number = '/'.join(str(int(part)) for part in port.split('/')) + (dot + str(int(sub)) if dot else '')
+    return INTERFACE_NAMES[name] + number, used
+
+
+def parse_ip(tokens, i):
+    token = tokens[i]
+    if not IPV4.match(token):
+        return None
+    parts = [int(part) for part in token.split('.')]
+    if max(parts) > 255:
+        return None
+    return '.'.join(map(str, parts)), 1
+
+
+def parse_ipv6(tokens, i):
+    token = tokens[i]
+    if ':' not in token:
+        return None
+    try:
+        value = ipaddress.IPv6Interface(token) if '/' in token else ipaddress.IPv6Address(token)
+    except ValueError:
+        return None
+    return str(value).lower(), 1
+
+
+def parse_number(tokens, i):
+    token = tokens[i]
+    return (str(int(token)), 1) if token.isdigit() else None
+
+
+def parse_word(tokens, i):
+    return tokens[i], 1
+
+
+def parse_host(tokens, i):
+    return parse_ip(tokens, i) or parse_ipv6(tokens, i) or (tokens[i].lower(), 1)
+
+
+def parse_text(tokens, i):
+    return ' '.join(tokens[i:]), len(tokens) - i
+
+
+ARGUMENTS = {'interface': parse_interface, 'ip': parse_ip, 'ipv6': parse_ipv6, 'number': parse_number,
+             'host': parse_host, 'word': parse_word, 'text': parse_text}
+# Specific argument types are tried before the catch-all ones
+ARGUMENT_ORDER = ('interface', 'ip', 'ipv6', 'number', 'host', 'word', 'text')
+
+
+class Node:
+    __slots__ = ('keywords', 'table', 'arguments', 'output', 'enters', 'shortest')
+
+    def __init__(self):
+        self.keywords = {}
+        self.table = {}
+        self.arguments = []
+        self.output = None
+        self.enters = None
+        self.shortest = {}
+
+
+class CommandGrammar:
+    # One trie of keywords and typed arguments per mode, with the prefix tables
+    # precomputed so that matching costs one dictionary lookup per token
+    def __init__(self, commands=COMMANDS):
+        self.roots = {}
+        self.expected_cache = {}
+        root = None
+        for line in commands.strip().splitlines():
+            line = line.strip()
+            if line.startswith('['):
+                root = self.roots[line[1:-1]] = Node()
+            elif line and not line.startswith('#'):
+                line, _, enters = line.partition(' > ')
+                command, _, canonical = line.partition('=')
+                self.add(root, command.split(), (canonical or command).split(), enters.strip() or None)
+        for mode in CONFIG_MODES:
+            for prefix in PREFIXES:
+                self.roots[mode].keywords[prefix] = Node()
+        for root in self.roots.values():
+            self.compile(root)
+
+    def add(self, node, tokens, canonical, enters):
+        for token in tokens:
+            if token.startswith('<'):
+                kind = token[1:-1]
+                for existing_kind, child in node.arguments:
+                    if existing_kind == kind:
+                        node = child
+                        break
+                else:
+                    child = Node()
+                    node.arguments.append((kind, child))
+                    node.arguments.sort(key=lambda argument: ARGUMENT_ORDER.index(argument[0]))
+                    node = child
+            else:
+                node = node.keywords.setdefault(token.lower(), Node())
+        # Output template: keywords as text, arguments as their rank in the typed command;
+        # the n-th <ip> of the canonical form is the n-th <ip> typed
+        arguments = [token for token in tokens if token.startswith('<')]
+        seen = {}
+        output = []
+        for token in canonical:
+            if token.startswith('<'):
+                nth = seen[token] = seen.get(token, -1) + 1
+                output.append([rank for rank, argument in enumerate(arguments) if argument == token][nth])
+            else:
+                output.append(token)
+        node.output = tuple(output)
+        node.enters = enters
+
+    def compile(self, node):
+        node.table = prefix_table(list(node.keywords))
+        node.shortest = {keyword: shortest_prefix(node.table, keyword) for keyword in node.keywords}
+        for child in node.keywords.values():
+            self.compile(child)
+        for _, child in node.arguments:
+            self.compile(child)
+
+    def walk(self, tokens, mode):
+        # Steps through the trie: (node, keyword, None) or (node, argument kind, (value, tokens used))
+        root = self.roots[mode]
+        steps = []
+        prefix = root.table.get(tokens[0].lower()) if len(tokens) > 1 else None
+        if prefix in PREFIXES:
+            steps.append((root, prefix, None))
+            if prefix == 'do':
+                root = self.roots['exec']
+        else:
+            prefix = None
+        steps, node = self.descend(root, tokens, len(steps), steps)
+        return steps, node, prefix
+
+    def descend(self, node, tokens, i, steps):
+        while i < len(tokens):
+            keyword = lookup(node.table, tokens[i].lower(), i, i + 1 == len(tokens))
+            if type(keyword) is tuple:
+                # Each candidate is followed; the command is read only if exactly one goes through
+                found = []
+                error = None
+                for candidate in keyword:
+                    try:
+                        found.append(self.descend(node.keywords[candidate], tokens, i + 1,
+                                                  steps + [(node, candidate, None)]))
+                    except CommandError as raised:
+                        error = furthest(error, raised)
+                if len(found) > 1:
+                    raise CommandError(f"abréviation ambiguë : {tokens[i]!r}", i)
+                if not found:
+                    raise error
+                return found[0]
+            if keyword is not None and keyword not in PREFIXES:
+                steps.append((node, keyword, None))
+                node = node.keywords[keyword]
+                i += 1
+                continue
+            for kind, child in node.arguments:
+                parsed = ARGUMENTS[kind](tokens, i)
+                if parsed is not None:
+                    steps.append((node, kind, parsed))
+                    i += parsed[1]
+                    node = child
+                    break
+            else:
+                raise CommandError(f"commande inconnue près de {tokens[i]!r}", i)
+        if node.output is None:
+            raise CommandError("commande incomplète", len(tokens))
+        return steps, node
+
+    def walk_in(self, tokens, mode, fallback=True):
+        # A submode falls back to the global configuration commands, as IOS does
+        try:
+            return self.walk(tokens, mode)
+        except CommandError as error:
+            if not fallback or mode == 'config' or mode not in CONFIG_MODES:
+                raise
+            try:
+                return self.walk(tokens, 'config')
+            except CommandError as raised:
+                raise furthest(error, raised)
+
+    def parse(self, text, mode, fallback=True):
+        # Canonical form of one command typed in a mode, and the mode it leads to
+        tokens = text.split()
+        if not tokens:
+            raise CommandError("commande vide")
+        steps, node, prefix = self.walk_in(tokens, mode, fallback)
+        values = [parsed[0] for _, _, parsed in steps if parsed is not None]
+        words = [values[item] if isinstance(item, int) else item for item in node.output]
+        if prefix is not None:
+            words.insert(0, prefix)
+        elif node.enters is not None:
+            mode = node.enters
+        return ' '.join(words), mode
+
+    def canonical(self, text, mode):
+        # Several commands may be given, separated by ';' or new lines. The first one must
+        # belong to the starting mode itself: a global command read from a submode would
+        # only repeat its reading from the configuration mode.
+        forms = []
+        for line in SEPARATORS.split(text):
+            if line.strip():
+                form, mode = self.parse(line, mode, bool(forms))
+                forms.append(form)
+        if not forms:
+            raise CommandError("commande vide")
+        return tuple(forms)
+
+    def readings(self, text):
+        # The question does not say at which prompt the answer is typed: every mode
+        # that accepts it gives a reading
+        readings = {}
+        error = None
+        for mode in MODES:
+            try:
+                readings[mode] = self.canonical(text, mode)
+            except CommandError as raised:
+                # The mode that got furthest names the token actually at fault
+                error = furthest(error, raised)
+        if not readings:
+            raise error
+        return readings
+
+    def expected(self, accepted):
+        # Accepted answers are parsed once per question and shared by every session
+        expected = self.expected_cache.get(accepted)
+        if expected is None:
+            expected = {}
+            for answer in accepted:
+                for mode, form in self.readings(answer).items():
+                    expected.setdefault(mode, set()).add(form)
+            self.expected_cache[accepted] = expected
+        return expected
+
+    def grade(self, accepted, text):
+        # Only the modes where an accepted answer exists are tried
+        for mode, forms in self.expected(accepted).items():
+            try:
+                if self.canonical(text, mode) in forms:
+                    return True
+            except CommandError:
+                pass
+        return False
+
+    def abbreviate(self, text, rng=random):
+        # A way a candidate could type the commands: keywords cut anywhere from their
+        # shortest unambiguous prefix, interfaces in short form
+        mode = next(iter(self.readings(text)))
+        typed = []
+        for line in SEPARATORS.split(text):
+            tokens = line.split()
+            if not tokens:
+                continue
+            steps, node, prefix = self.walk_in(tokens, mode, bool(typed))
+            words = []
+            i = 0
+            for step_node, name, parsed in steps:
+                if parsed is None:
+                    words.append(name[:rng.randint(step_node.shortest[name], len(name))])
+                    i += 1
+                elif name == 'interface':
+                    number = INTERFACE_NUMBER.search(parsed[0]).group()
+                    kind = parsed[0][:-len(number)].lower()
+                    words.append(kind[:shortest_prefix(INTERFACE_TABLE, kind)] + number)
+                    i += parsed[1]
+                else:
+                    words.extend(tokens[i:i + parsed[1]])
+                    i += parsed[1]
+            typed.append(' '.join(words))
+            if prefix is None and node.enters is not None:
+                mode = node.enters
+        return '; '.join(typed)
+
+
+_grammar = None
+
+
+def default_grammar():
+    # Built on first use, then shared by every session and view
+    global _grammar
+    if _grammar is None:
+        _grammar = CommandGrammar()
+    return _grammar
+
+
+def check_command(text):
+    # Readings of the command by mode; CommandError when no mode accepts it
+    return default_grammar().readings(text)
+
+
+def grade_command(question, text):
+    return default_grammar().grade(question.answers, text)
+
+
+def grade_commands(questions, texts):
+    # Batch path: one result per (question, typed answer) pair
+    grammar = default_grammar()
+    return [grammar.grade(question.answers, text) for question, text in zip(questions, texts)]
+
+
+def bench_grading(repeat=20000, seed=0):
+    grammar = default_grammar()
+    rng = random.Random(seed)
+    commands = ["configure terminal", "interface GigabitEthernet0/0", "ip domain-name cisco.com",
+                "crypto key generate rsa general-keys modulus 1024", "line vty 0 4; transport input ssh",
+                "ip address 192.168.1.1 255.255.255.0", "ipv6 address 2001:db8:acad:1::1/64",
+                "username admin secret Cisco123", "copy running-config startup-config", "no shutdown"]
+    right = [((command,), grammar.abbreviate(command, rng)) for command in commands for _ in range(10)]
+    wrong = [(accepted, typed.rsplit(' ', 1)[0] + ' x') for accepted, typed in right]
+    timings = {}
+    for name, pairs in (("bonnes réponses", right), ("mauvaises réponses", wrong)):
+        started = time.perf_counter()
+        count = 0
+        while count < repeat:
+            for accepted, typed in pairs:
+                grammar.grade(accepted, typed)
+            count += len(pairs)
+        timings[name] = (time.perf_counter() - started) / count
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Forme canonique des commandes IOS (abréviations développées)")
+    parser.add_argument('commands', nargs='*', help="commandes à analyser (séparées par ';')")
+    parser.add_argument('--bench', action='store_true', help="mesure le coût de la correction")
+    args = parser.parse_args()
+
+    if args.bench:
+        started = time.perf_counter()
+        default_grammar()
+        print(f"grammaire compilée en {(time.perf_counter() - started) * 1000:.1f} ms")
+        for name, seconds in bench_grading().items():
+            print(f"{name} : {seconds * 1e6:.2f} µs par correction")
+        sys.exit(0)
+    for command in args.commands or sys.stdin:
+        try:
+            for mode, forms in check_command(command).items():
+                print(f"{mode:>9} : {' ; '.join(forms)}")
+        except CommandError as error:
+            print(f"% {error}")
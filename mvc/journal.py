@@ -0,0 +1,178 @@
+import json
+import os
+import sys
+import time
+
+# The journal is replayed to offer resuming: past this size its finished sessions are archived
+COMPACT_SIZE = 1 << 16
+ARCHIVE_SUFFIX = '.archive'
+# json.dumps builds a new encoder whenever options are passed; reuse one instead
+ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+class Journal:
+    # Append-only JSON-lines log of quiz sessions. Lines are flushed to the OS on
+    # every write but only fsync'ed in batches, so a submit costs one small write().
+    # A journal that is not durable (simulated exams) leaves lines in the file buffer
+    # and never fsyncs: losing it in a crash costs nothing.
+    def __init__(self, filename, sync_every=8, sync_interval=1.0, durable=True):
+        self.filename = filename
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.durable = durable
+        self.pending = 0
+        self.last_sync = time.monotonic()
+        self.file = open(filename, 'a', encoding='utf-8')
+
+    def write(self, record):
+        record['t'] = time.monotonic()
+        self.file.write(ENCODER.encode(record) + '\n')
+        if not self.durable:
+            return
+        self.file.flush()
+        self.pending += 1
+        if self.pending >= self.sync_every or record['t'] - self.last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        if self.pending:
+            os.fsync(self.file.fileno())
+            self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def start(self, session_id, question_keys, **options):
+        self.write({'type': 'start', 'session': session_id, 'questions': list(question_keys), **options})
+
+    def answer(self, session_id, question_key, option_ids, elapsed, text=None):
+        record = {'type': 'answer', 'session': session_id, 'question': question_key,
+                  'options': list(option_ids), 'elapsed': round(elapsed, 3)}
+        if text is not None:
+            # Command questions: what was typed, graded again on review and export
+            record['text'] = text
+        self.write(record)
+
+    def end(self, session_id):
+        self.write({'type': 'end', 'session': session_id})
+        self.sync()
+
+    def abandon(self, session_id):
+        # Closed without a result: no longer resumable, and never scored
+        self.write({'type': 'abandon', 'session': session_id})
+        self.sync()
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+    def compact(self, keep_finished=None):
+        self.close()
+        try:
+            return compact(self.filename, keep_finished)
+        finally:
+            self.file = open(self.filename, 'a', encoding='utf-8')
+
+
+def archive_path(filename):
+    return filename + ARCHIVE_SUFFIX
+
+
+def read_records(filename):
+    try:
+        with open(filename, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A crash can leave a torn last line; everything before it is intact
+                    continue
+    except FileNotFoundError:
+        return
+
+
+def read_journal(filename):
+    # Every session recorded: the archived ones first, then those still in the journal
+    yield from read_records(archive_path(filename))
+    yield from read_records(filename)
+
+
+def replay(filename):
+    sessions = {}
+    for record in read_records(filename):
+        session_id = record.get('session')
+        if record.get('type') == 'start':
+            sessions[session_id] = {'start': record, 'answers': [], 'ended': False, 'abandoned': False}
+        elif session_id in sessions:
+            if record.get('type') == 'answer':
+                sessions[session_id]['answers'].append(record)
+            elif record.get('type') == 'end':
+                sessions[session_id]['ended'] = True
+            elif record.get('type') == 'abandon':
+                sessions[session_id]['abandoned'] = True
+    return sessions
+
+
+def last_unfinished(filename):
+    unfinished = [(session_id, session) for session_id, session in replay(filename).items()
+                  if not session['ended'] and not session['abandoned'] and session['answers']]
+    return unfinished[-1] if unfinished else (None, None)
+
+
+def session_records(session_id, session):
+    return [session['start']] + session['answers'] + ([{'type': 'end', 'session': session_id}]
+                                                       if session['ended'] else [])
+
+
+def write_sessions(out, sessions):
+    for session_id, session in sessions:
+        for record in session_records(session_id, session):
+            out.write(ENCODER.encode(record) + '\n')
+    out.flush()
+    os.fsync(out.fileno())
+
+
+def rewrite(filename, sessions):
+    tmp = filename + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as out:
+        write_sessions(out, sessions)
+    os.replace(tmp, filename)
+
+
+def compact(filename, keep_finished=None):
+    # Finished sessions move to the archive, which analytics, adaptive calibration and
+    # export read with the journal: the journal itself keeps only what can be resumed,
+    # so launching and offering to resume never parse the whole history.
+    # Sessions never answered or abandoned are dropped, and so are interrupted ones
+    # older than the last (the only one offered for resuming).
+    # keep_finished (explicit compaction only) also trims the archive to its most recent sessions.
+    # Returns the number of sessions archived and dropped.
+    sessions = replay(filename)
+    finished = [(session_id, session) for session_id, session in sessions.items() if session['ended']]
+    unfinished = [(session_id, session) for session_id, session in sessions.items()
+                  if not session['ended'] and not session['abandoned'] and session['answers']]
+    keep = unfinished[-1:]
+    if len(keep) < len(sessions):
+        if finished:
+            # Archived before the journal is rewritten: a crash in between leaves a session
+            # in both files, never in none (readers skip the second copy)
+            with open(archive_path(filename), 'a', encoding='utf-8') as out:
+                write_sessions(out, finished)
+        rewrite(filename, keep)
+    dropped = len(sessions) - len(keep) - len(finished)
+    if keep_finished is not None:
+        archived = list(replay(archive_path(filename)).items())
+        if len(archived) > keep_finished:
+            rewrite(archive_path(filename), archived[len(archived) - keep_finished:])
+            dropped += len(archived) - keep_finished
+    return len(finished), dropped
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != 'compact' or (len(sys.argv) > 3 and not sys.argv[3].isdigit()):
+        print("usage: python journal.py compact journal.jsonl [sessions archivées à garder (au moins 1)]")
+        sys.exit(1)
+    keep_finished = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    if keep_finished == 0:
+        print("refusé : les sessions terminées servent à l'analyse, au calibrage et à l'export")
+        sys.exit(1)
+    archived, dropped = compact(sys.argv[2], keep_finished)
+    print(f"{archived} sessions archivées dans {archive_path(sys.argv[2])}, {dropped} supprimées")
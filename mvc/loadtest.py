@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+
+class Client:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.latencies = []
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    async def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        started = time.perf_counter()
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {self.host}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body
+        )
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+        data = json.loads(await self.reader.readexactly(length))
+        self.latencies.append(time.perf_counter() - started)
+        if status != 200:
+            raise RuntimeError(f"{method} {path} -> {status}: {data.get('error')}")
+        return data
+
+    async def run_exam(self, num_questions):
+        session = (await self.request('POST', '/start', {'num_questions': num_questions}))['session']
+        while True:
+            question = await self.request('GET', f'/next?session={session}')
+            if question['finished']:
+                break
+            if question.get('type') == 'command':
+                await self.request('POST', '/submit', {'session': session, 'text': 'show running-config'})
+                continue
+            count = len(question['answers'])
+            picks = random.sample(range(count), random.randint(2, min(3, count))) if question['multiple'] \
+                else [random.randrange(count)]
+            await self.request('POST', '/submit', {'session': session, 'answers': picks})
+        return await self.request('GET', f'/results?session={session}')
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def load_test(host, port, clients, exams, num_questions):
+    swarm = [Client(host, port) for _ in range(clients)]
+    await asyncio.gather(*(client.connect() for client in swarm))
+
+    async def candidate(client):
+        for _ in range(exams):
+            await client.run_exam(num_questions)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(candidate(client) for client in swarm))
+    duration = time.perf_counter() - started
+    await asyncio.gather(*(client.close() for client in swarm))
+
+    latencies = sorted(latency for client in swarm for latency in client.latencies)
+    return {
+        'requests': len(latencies),
+        'duration': duration,
+        'rps': len(latencies) / duration if duration else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test de charge du serveur d'examen")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--exams', type=int, default=5, help="examens par client")
+    parser.add_argument('--questions', type=int, default=60)
+    args = parser.parse_args()
+
+    stats = asyncio.run(load_test(args.host, args.port, args.clients, args.exams, args.questions))
+    print(f"{stats['requests']} requests in {stats['duration']:.2f}s: "
+          f"{stats['rps']:.0f} req/s, p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms")
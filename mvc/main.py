@@ -1,11 +1,58 @@
-import tkinter as tk
-from model import QuizModel
-from view import QuizView
-from controller import QuizController
+import argparse
+import time
 
 if __name__ == "__main__":
+    started = time.perf_counter()
+    parser = argparse.ArgumentParser(description="Quiz CCNA1")
+    parser.add_argument('banks', nargs='*', default=["questions.json"],
+                        help="banques de questions à fusionner (motifs glob acceptés)")
+    parser.add_argument('--profile', nargs='?', const="profile.json", default=None,
+                        metavar='FICHIER', help="mesure les gestionnaires d'événements et écrit une trace Chrome à la sortie")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="affiche le temps de chaque phase du démarrage et des imports")
+    parser.add_argument('--forms', metavar='FICHIER', help="formulaires d'examen générés par forms.py")
+    args = parser.parse_args()
+
+    # Imports come after argument parsing so that --profile-startup can time them
+    from startup import StartupProfile, preload
+    startup = StartupProfile(started) if args.profile_startup else None
+    preload()
+
+    import tkinter as tk
+    from model import QuizModel
+    from view import QuizView
+    from controller import QuizController
+    from profiling import install, output_from_env
+    if startup:
+        startup.mark("imports")
+
+    profile_output = args.profile or output_from_env()
+    profiler = install(profile_output) if profile_output else None
+    # The bank loads while Tk builds the window; the controller only touches it on start
+    model = QuizModel(args.banks, background=True)
     root = tk.Tk()
-    model = QuizModel("questions.json")
+    if profiler is not None:
+        profiler.watch_root(root)
+    if startup:
+        startup.mark("fenêtre Tk")
     view = QuizView(root)
-    controller = QuizController(model, view)
+    forms = None
+    if args.forms:
+        from forms import FormsFile
+        forms = FormsFile(args.forms)
+    controller = QuizController(model, view, forms=forms)
+    if startup:
+        startup.mark("menu de démarrage construit")
+
+    def first_frame():
+        if startup:
+            startup.visible()
+        view.apply_theme()
+        if startup:
+            startup.mark("thème appliqué")
+            model.wait()
+            startup.mark("banque chargée")
+            startup.report()
+
+    root.after(1, first_frame)
     root.mainloop()
@@ -1,38 +1,198 @@
-import json
+import copy
 import random
+import sys
+import threading
 import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from bank import MergedBank, bank_signature, cached_bank_hash, expand_banks, load_bank, question_keys
+from grading import answer_mask, bank_masks, grade_matrix
+from search import SearchIndex
+from validate import validate_bank
+
+BankPart = namedtuple('BankPart', 'signature questions index')
+LOADED_ATTRIBUTES = ('bank',)
+
+
+def load_part(filename):
+    signature = bank_signature(filename)
+    # One content hash serves both caches: validation and search index. It is only
+    # recomputed when the bank's mtime or size changed.
+    digest = cached_bank_hash(filename)
+    validate_bank(filename, digest)
+    questions = load_bank(filename)
+    return BankPart(signature, questions, SearchIndex.load_or_build(filename, questions, digest))
+
+
+class BankSnapshot:
+    # Everything derived from the loaded banks. A reload builds a new one and publishes
+    # it in a single assignment, so no reader pairs new questions with old masks.
+    __slots__ = ('data', 'index', 'correct_masks', 'key_index')
+
+    def __init__(self, data, index):
+        self.data = data
+        self.index = index
+        self.correct_masks = bank_masks(data)
+        self.key_index = None
+
+    def keys(self):
+        if self.key_index is None:
+            self.key_index = {key: i for i, key in enumerate(question_keys(self.data))}
+        return self.key_index
+
 
 class QuizModel:
-    def __init__(self, filename):
-        self.data = self.load_questions(filename)
+    def __init__(self, filenames, workers=None, background=False):
+        # filenames: one bank, a list of banks, or glob patterns ("banques/*.json").
+        # With background=True the banks load in a thread and the first access to
+        # data/index waits for it, so the window can be built meanwhile.
+        self.filenames = expand_banks(filenames)
+        self.workers = workers
+        self.parts = {}
+        self.failed = {}
+        self.loader = None
+        self.load_error = None
+        self.reset()
+        if background:
+            self.loader = threading.Thread(target=self.load_in_background, name="bank-loader", daemon=True)
+            self.loader.start()
+        else:
+            self.load_parts(self.filenames)
+
+    def load_in_background(self):
+        try:
+            self.load_parts(self.filenames)
+        except Exception as error:
+            self.load_error = error
+
+    def wait(self):
+        loader = self.__dict__.get('loader')
+        if loader is not None:
+            loader.join()
+            if self.load_error is not None:
+                raise self.load_error
+            self.loader = None
+
+    @property
+    def data(self):
+        return self.bank.data
+
+    @property
+    def index(self):
+        return self.bank.index
+
+    @property
+    def correct_masks(self):
+        return self.bank.correct_masks
+
+    def __getattr__(self, name):
+        # Only called for attributes not set yet, i.e. while a background load runs
+        if name in LOADED_ATTRIBUTES and self.__dict__.get('loader') is not None:
+            self.wait()
+            return getattr(self, name)
+        raise AttributeError(name)
+
+    def reset(self):
         self.num_questions = 0
+        self.selected_ids = []
         self.selected_questions = []
         self.current_question_index = 0
         self.user_answers = []
         self.start_time = None
+        self.question_started = None
+        self.question_times = []
+
+    def new_session(self):
+        # Shares the loaded bank and masks, but gets its own quiz state
+        self.wait()
+        session = copy.copy(self)
+        session.reset()
+        return session
 
     def load_questions(self, filename):
-        with open(filename, 'r') as file:
-            return json.load(file)
+        return load_bank(filename)
+
+    def load_parts(self, filenames):
+        if len(filenames) == 1:
+            loaded = [load_part(filenames[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                loaded = list(pool.map(load_part, filenames))
+        self.parts.update(zip(filenames, loaded))
+        self.bank = self.merge()
+
+    def merge(self):
+        # Sessions made by new_session() keep the previous snapshot, so publishing
+        # a new one never affects a quiz in progress
+        parts = [self.parts[filename] for filename in self.filenames]
+        if len(parts) == 1:
+            return BankSnapshot(parts[0].questions, parts[0].index)
+        return BankSnapshot(MergedBank(part.questions for part in parts),
+                            SearchIndex.merge([part.index for part in parts]))
+
+    def reload(self):
+        reloaded, bank = self.load_changes()
+        self.publish(bank)
+        return reloaded
+
+    def publish(self, bank):
+        if bank is not None:
+            self.bank = bank
+
+    def load_changes(self):
+        # Returns the reloaded filenames and their new snapshot, not yet published, so a
+        # worker thread can do the loading and the owner of the model the swap.
+        self.wait()
+        # Reloads only the banks whose mtime or size changed. A bank that fails to
+        # load (e.g. saved halfway) keeps its previous version until it changes again.
+        reloaded = []
+        for filename in self.filenames:
+            try:
+                signature = bank_signature(filename)
+            except OSError:
+                continue
+            if signature in (self.parts[filename].signature, self.failed.get(filename)):
+                continue
+            try:
+                self.parts[filename] = load_part(filename)
+            except (OSError, ValueError) as error:
+                self.failed[filename] = signature
+                print(f"{filename}: rechargement impossible ({error})", file=sys.stderr)
+                continue
+            self.failed.pop(filename, None)
+            reloaded.append(filename)
+        return reloaded, self.merge() if reloaded else None
 
     def start_quiz(self, num_questions):
         self.num_questions = num_questions
-        self.selected_questions = random.sample(self.data, self.num_questions)
+        self.selected_ids = random.sample(range(len(self.data)), self.num_questions)
+        self.selected_questions = [self.data[i] for i in self.selected_ids]
         self.current_question_index = 0
         self.user_answers = []
-        self.start_time = time.time()
+        self.question_times = []
+        self.start_time = self.question_started = time.monotonic()
 
     def get_current_question(self):
         return self.selected_questions[self.current_question_index]
 
-    def submit_answer(self, user_answer_indices):
+    def submit_answer(self, user_answer_indices, text=None):
+        # Command questions are graded on the typed text, the indices are ignored
         question = self.get_current_question()
-        correct_answer_indices = [i for i, answer in enumerate(question['answers']) if answer.get('correct-answer', False)]
-        is_correct = set(user_answer_indices) == set(correct_answer_indices)
+        if question.is_command:
+            from ioscmd import grade_command
+            is_correct = grade_command(question, text or '')
+            user_answers = [text or '']
+        else:
+            correct = self.correct_masks[self.selected_ids[self.current_question_index]]
+            is_correct = answer_mask(user_answer_indices) == correct
+            user_answers = [question.answers[i] for i in user_answer_indices]
+        now = time.monotonic()
+        self.question_times.append(now - self.question_started)
+        self.question_started = now
 
         self.user_answers.append({
-            'question': question['question'],
-            'user_answers': [question['answers'][i]['text'] for i in user_answer_indices],
+            'question': question.text,
+            'user_answers': user_answers,
             'is_correct': is_correct
         })
 
@@ -45,11 +205,36 @@ class QuizModel:
         score = sum(1 for answer in self.user_answers if answer['is_correct'])
         total = len(self.user_answers)
         score_percentage = round((score / total) * 100, 2)
-        elapsed_time = int(time.time() - self.start_time)
-        return score, total, score_percentage, elapsed_time
+        elapsed_time = int(time.monotonic() - self.start_time)
+        return score, total, score_percentage, elapsed_time, list(self.question_times)
 
     def get_all_answers(self):
         return self.user_answers
 
-    def get_questions(self, num_questions):
-        return random.sample(self.data, num_questions)
+    def search(self, query):
+        return self.index.search(query)
+
+    def get_questions(self, num_questions, topic=None):
+        if not topic:
+            return random.sample(self.data, num_questions)
+        return [self.data[i] for i in self.index.sample(topic, num_questions)]
+
+    def question_keys(self):
+        return self.bank.keys().keys()
+
+    def get_question_by_key(self, key):
+        bank = self.bank
+        i = bank.keys().get(key)
+        return bank.data[i] if i is not None else None
+
+    def get_position(self, key):
+        return self.bank.keys().get(key)
+
+    def get_scheduled_questions(self, num_questions, scheduler):
+        bank = self.bank
+        positions = bank.keys()
+        # Keys of questions removed by a reload are skipped
+        return [bank.data[positions[key]] for key in scheduler.select(num_questions) if key in positions]
+
+    def rescore(self, responses, question_ids):
+        return grade_matrix(responses, question_ids, self.correct_masks)
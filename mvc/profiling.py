@@ -0,0 +1,165 @@
+import atexit
+import functools
+import json
+import os
+import sys
+import time
+from array import array
+
+ENV_VAR = 'QUIZ_PROFILE'
+DEFAULT_OUTPUT = 'profile.json'
+MAX_EVENTS = 200000
+
+CONTROLLER_METHODS = ('start_quiz', 'resume_quiz', 'show_question', 'toggle_answer', 'check_answer', 'show_results')
+VIEW_METHODS = ('show_start_menu', 'show_question', 'show_results', 'show_review', 'update_timer', 'clear_widgets')
+REVIEW_METHODS = ('refresh',)
+
+
+def output_from_env():
+    value = os.environ.get(ENV_VAR, '')
+    if value in ('', '0'):
+        return None
+    return DEFAULT_OUTPUT if value == '1' else value
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class Profiler:
+    # Only exists when profiling is requested: wrapping happens at class level before
+    # the controller and view are built, so the disabled path runs the original methods.
+    def __init__(self, output):
+        self.output = output
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.durations = {}
+        self.events = []
+        self.dropped = 0
+        self.root = None
+
+    def now_us(self):
+        return (time.perf_counter() - self.origin) * 1e6
+
+    def add_event(self, event):
+        if len(self.events) < MAX_EVENTS:
+            event['pid'] = self.pid
+            event['tid'] = 0
+            self.events.append(event)
+        else:
+            self.dropped += 1
+
+    def record(self, name, start, duration, category):
+        self.durations.setdefault(name, array('d')).append(duration)
+        self.add_event({'name': name, 'cat': category, 'ph': 'X', 'ts': start, 'dur': duration})
+
+    def wrap(self, cls, names, category, count_widgets=False):
+        prefix = cls.__name__
+        for name in names:
+            method = getattr(cls, name, None)
+            if method is None or getattr(method, '__profiled__', False):
+                continue
+            setattr(cls, name, self.timed(method, f"{prefix}.{name}", category, count_widgets))
+
+    def timed(self, method, name, category, count_widgets):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = self.now_us()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.record(name, start, self.now_us() - start, category)
+                if count_widgets:
+                    self.count_widgets()
+        wrapper.__profiled__ = True
+        return wrapper
+
+    def count_widgets(self):
+        if self.root is None:
+            return
+        count = 0
+        pending = [self.root]
+        while pending:
+            widget = pending.pop()
+            count += 1
+            pending.extend(widget.winfo_children())
+        self.add_event({'name': 'widgets', 'ph': 'C', 'ts': self.now_us(), 'args': {'count': count}})
+
+    def watch_root(self, root):
+        # Event-queue lag: how late an after()/after_idle() callback runs compared
+        # to when it was due
+        self.root = root
+        after = root.after
+        after_idle = root.after_idle
+
+        def lagged(callback, due):
+            def run(*args):
+                lag = max(0.0, self.now_us() - due)
+                self.durations.setdefault('tk.after_lag', array('d')).append(lag)
+                self.add_event({'name': 'after_lag', 'ph': 'C', 'ts': self.now_us(), 'args': {'us': lag}})
+                return callback(*args)
+            return run
+
+        def profiled_after(ms, func=None, *args):
+            if func is None:
+                return after(ms)
+            return after(ms, lagged(func, self.now_us() + ms * 1000), *args)
+
+        def profiled_after_idle(func, *args):
+            return after_idle(lagged(func, self.now_us()), *args)
+
+        root.after = profiled_after
+        root.after_idle = profiled_after_idle
+
+    def summary(self):
+        stats = {}
+        for name, values in self.durations.items():
+            ordered = sorted(values)
+            stats[name] = {
+                'count': len(ordered),
+                'p50_us': round(percentile(ordered, 0.50), 1),
+                'p90_us': round(percentile(ordered, 0.90), 1),
+                'p99_us': round(percentile(ordered, 0.99), 1),
+                'max_us': round(ordered[-1], 1),
+                'total_ms': round(sum(ordered) / 1000, 3),
+                'histogram_log2_us': self.histogram(ordered),
+            }
+        return stats
+
+    def histogram(self, values):
+        buckets = {}
+        for value in values:
+            bucket = 1 << max(0, int(value)).bit_length()
+            buckets[bucket] = buckets.get(bucket, 0) + 1
+        return {f"<{bucket}": count for bucket, count in sorted(buckets.items())}
+
+    def dump(self):
+        stats = self.summary()
+        trace = {'traceEvents': self.events, 'displayTimeUnit': 'ms',
+                 'otherData': {'summary': stats, 'dropped_events': self.dropped}}
+        tmp = self.output + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as file:
+            json.dump(trace, file)
+        os.replace(tmp, self.output)
+
+        print(f"Profil écrit dans {self.output} (chrome://tracing ou ui.perfetto.dev)", file=sys.stderr)
+        width = max((len(name) for name in stats), default=0)
+        for name, entry in sorted(stats.items(), key=lambda item: -item[1]['total_ms']):
+            print(f"  {name:<{width}}  n={entry['count']:<6} p50={entry['p50_us'] / 1000:7.2f}ms "
+                  f"p99={entry['p99_us'] / 1000:7.2f}ms max={entry['max_us'] / 1000:7.2f}ms", file=sys.stderr)
+
+
+def install(output):
+    # Must run before QuizController/QuizView are instantiated so that callbacks
+    # bound in their constructors already point to the wrapped methods
+    from controller import QuizController
+    from view import QuizView, ReviewList
+
+    profiler = Profiler(output)
+    profiler.wrap(QuizController, CONTROLLER_METHODS, 'controller')
+    profiler.wrap(QuizView, VIEW_METHODS, 'view', count_widgets=True)
+    profiler.wrap(ReviewList, REVIEW_METHODS, 'view')
+    atexit.register(profiler.dump)
+    return profiler
@@ -0,0 +1,138 @@
+import hashlib
+import os
+import random
+import re
+import sys
+from itertools import permutations
+
+NUMBER_PREFIX = re.compile(r'^\s*\d+\s*[.)-]\s*')
+# The Tk view pools radio/check buttons for this many answers
+MAX_ANSWERS = 7
+# Up to 7 answers (7! = 5040 orders) a shuffle is a lookup in a table of all permutations
+PERMUTATION_TABLE_MAX = MAX_ANSWERS
+PERMUTATION_TABLES = {}
+# Question types: options to pick, or an IOS command to type (answers are the accepted commands)
+CHOICE = 'choice'
+COMMAND = 'command'
+
+
+def question_key(text):
+    # Stable id: ignores the "12. " numbering that changes between exam versions
+    text = NUMBER_PREFIX.sub('', text).strip()
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+class Question:
+    # Immutable bank entry: interned texts plus a bitmask of the correct options.
+    # Sessions never reorder it; they keep their own permutation instead.
+    # exhibit: optional path of an image (topology, command output) shown with the question
+    # kind: CHOICE or COMMAND; every answer of a COMMAND question is accepted, so its mask is full
+    __slots__ = ('text', 'answers', 'correct_mask', '_key', 'exhibit', 'kind')
+
+    def __init__(self, text, answers, correct_mask, key=None, exhibit=None, kind=CHOICE):
+        object.__setattr__(self, 'text', text)
+        object.__setattr__(self, 'answers', answers)
+        object.__setattr__(self, 'correct_mask', correct_mask)
+        object.__setattr__(self, '_key', key)
+        object.__setattr__(self, 'exhibit', exhibit)
+        object.__setattr__(self, 'kind', kind)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Question is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Question is immutable")
+
+    def __eq__(self, other):
+        if not isinstance(other, Question):
+            return NotImplemented
+        return ((self.text, self.answers, self.correct_mask, self.exhibit, self.kind) ==
+                (other.text, other.answers, other.correct_mask, other.exhibit, other.kind))
+
+    def __hash__(self):
+        return hash((self.text, self.answers, self.correct_mask))
+
+    def __repr__(self):
+        return f"Question({self.text[:40]!r}, {len(self.answers)} answers, mask={self.correct_mask:#b})"
+
+    @classmethod
+    def from_dict(cls, data):
+        answers = data.get('answers', [])
+        kind = data.get('type', CHOICE)
+        mask = 0
+        for i, answer in enumerate(answers):
+            if kind == COMMAND or answer.get('correct-answer', False):
+                mask |= 1 << i
+        return cls(sys.intern(data['question']), tuple(sys.intern(answer['text']) for answer in answers), mask,
+                   exhibit=data.get('exhibit'), kind=kind)
+
+    def to_dict(self, directory=None):
+        # exhibit holds the resolved path (see json_object_hook); a bank written to
+        # directory gets it relative to that directory again
+        data = {
+            'question': self.text,
+            'answers': [{'text': text, 'correct-answer': self.is_correct(i)} for i, text in enumerate(self.answers)],
+        }
+        if self.exhibit is not None:
+            data['exhibit'] = self.exhibit
+            if directory is not None:
+                data['exhibit'] = os.path.relpath(self.exhibit, directory or os.curdir)
+        if self.kind != CHOICE:
+            data['type'] = self.kind
+        return data
+
+    @property
+    def key(self):
+        if self._key is None:
+            object.__setattr__(self, '_key', question_key(self.text))
+        return self._key
+
+    @property
+    def correct_count(self):
+        return bin(self.correct_mask).count('1')
+
+    @property
+    def multiple(self):
+        return self.kind == CHOICE and self.correct_count > 1
+
+    @property
+    def is_command(self):
+        return self.kind == COMMAND
+
+    def is_correct(self, index):
+        return bool(self.correct_mask >> index & 1)
+
+    def correct_answers(self):
+        return [text for i, text in enumerate(self.answers) if self.correct_mask >> i & 1]
+
+    def permutation(self, rng=random):
+        size = len(self.answers)
+        if size > PERMUTATION_TABLE_MAX:
+            order = list(range(size))
+            rng.shuffle(order)
+            return bytes(order)
+        table = PERMUTATION_TABLES.get(size)
+        if table is None:
+            # bytes, so the shared orders cannot be modified by a session
+            table = PERMUTATION_TABLES[size] = [bytes(order) for order in permutations(range(size))]
+        return table[int(rng.random() * len(table))]
+
+
+def json_object_hook(data, directory=None):
+    # Used with json.load so raw dicts are turned into Questions as they are parsed.
+    # Exhibit paths are relative to the bank's directory.
+    if 'question' in data:
+        answers = data.get('answers', [])
+        kind = data.get('type', CHOICE)
+        mask = 0
+        for i, (_, correct) in enumerate(answers):
+            if correct or kind == COMMAND:
+                mask |= 1 << i
+        exhibit = data.get('exhibit')
+        if exhibit is not None and directory:
+            exhibit = os.path.join(directory, exhibit)
+        return Question(sys.intern(data['question']), tuple(text for text, _ in answers), mask, exhibit=exhibit,
+                        kind=kind)
+    if 'text' in data:
+        return sys.intern(data['text']), bool(data.get('correct-answer', False))
+    return data
@@ -0,0 +1,74 @@
+import heapq
+import json
+import os
+import time
+
+DAY = 86400
+RETRY_DELAY = 600
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+
+
+class Scheduler:
+    # SM-2 scheduler. Every bank question sits in a min-heap ordered by due time;
+    # entries left behind by a reschedule are skipped when they surface.
+    def __init__(self, filename, keys):
+        self.filename = filename
+        self.state = {}
+        if os.path.exists(filename):
+            with open(filename, 'r', encoding='utf-8') as file:
+                self.state = json.load(file)
+
+        self.keys = set(keys)
+        self.heap = [(self.due(key), key) for key in self.keys]
+        heapq.heapify(self.heap)
+
+    def add_keys(self, keys):
+        for key in set(keys) - self.keys:
+            self.keys.add(key)
+            heapq.heappush(self.heap, (self.due(key), key))
+
+    def due(self, key):
+        entry = self.state.get(key)
+        return entry['due'] if entry else 0
+
+    def select(self, count):
+        selected = []
+        seen = set()
+        while self.heap and len(selected) < count:
+            due, key = heapq.heappop(self.heap)
+            if due == self.due(key) and key not in seen:
+                seen.add(key)
+                selected.append((due, key))
+        for entry in selected:
+            heapq.heappush(self.heap, entry)
+        return [key for _, key in selected]
+
+    def record(self, key, correct, now=None):
+        now = time.time() if now is None else now
+        entry = self.state.setdefault(key, {'ease': DEFAULT_EASE, 'interval': 0, 'repetitions': 0, 'due': 0})
+        quality = 5 if correct else 1
+
+        if correct:
+            if entry['repetitions'] == 0:
+                entry['interval'] = 1
+            elif entry['repetitions'] == 1:
+                entry['interval'] = 6
+            else:
+                entry['interval'] = round(entry['interval'] * entry['ease'])
+            entry['repetitions'] += 1
+            entry['due'] = now + entry['interval'] * DAY
+        else:
+            entry['repetitions'] = 0
+            entry['interval'] = 0
+            entry['due'] = now + RETRY_DELAY
+
+        entry['ease'] = max(MIN_EASE, entry['ease'] + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        if key in self.keys:
+            heapq.heappush(self.heap, (entry['due'], key))
+
+    def save(self):
+        tmp = self.filename + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as file:
+            json.dump(self.state, file)
+        os.replace(tmp, self.filename)
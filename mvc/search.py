@@ -0,0 +1,223 @@
+import os
+import pickle
+import random
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+from bank import bank_hash
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = '.index'
+TOKEN = re.compile(r"\w+")
+QUERY_TOKEN = re.compile(r'\(|\)|"[^"]*"|[^\s()]+')
+OPERATORS = {'and': 'AND', 'et': 'AND', 'or': 'OR', 'ou': 'OR', 'not': 'NOT', 'sauf': 'NOT'}
+
+
+def fold(text):
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def tokenize(text):
+    return TOKEN.findall(fold(text))
+
+
+def question_text(question):
+    return ' '.join((question.text,) + question.answers)
+
+
+def bitmap(ids, size):
+    bits = bytearray((size + 7) // 8)
+    for i in ids:
+        bits[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def bitmap_ids(bits):
+    ids = []
+    digits = format(bits, 'b')[::-1]
+    position = digits.find('1')
+    while position != -1:
+        ids.append(position)
+        position = digits.find('1', position + 1)
+    return ids
+
+
+class SearchIndex:
+    # Frequent tokens are kept as precomputed bitmaps so boolean queries reduce to
+    # big-integer operations; rare tokens stay as compact id arrays.
+    DENSE_FRACTION = 16
+
+    def __init__(self, postings, size, dense=None):
+        self.postings = postings
+        self.size = size
+        self.universe = (1 << size) - 1
+        self.vocabulary = sorted(postings)
+        if dense is None:
+            threshold = max(1, size // self.DENSE_FRACTION)
+            dense = {token: bitmap(ids, size) for token, ids in postings.items() if len(ids) >= threshold}
+        self.dense = dense
+
+    @classmethod
+    def build(cls, questions):
+        postings = {}
+        for i, question in enumerate(questions):
+            for token in set(tokenize(question_text(question))):
+                postings.setdefault(token, array('I')).append(i)
+        return cls(postings, len(questions))
+
+    @classmethod
+    def load_or_build(cls, filename, questions, digest=None):
+        cache = filename + INDEX_SUFFIX
+        if digest is None:
+            digest = bank_hash(filename)
+        try:
+            with open(cache, 'rb') as file:
+                cached = pickle.load(file)
+            if cached['version'] == INDEX_VERSION and cached['hash'] == digest:
+                return cls(cached['postings'], cached['size'], cached['dense'])
+        except Exception:
+            # A cache that is stale, corrupt or pickled by another version can fail in
+            # many ways (AttributeError, ModuleNotFoundError, ValueError...): rebuild it
+            pass
+
+        index = cls.build(questions)
+        try:
+            with open(cache + '.tmp', 'wb') as file:
+                pickle.dump({'version': INDEX_VERSION, 'hash': digest, 'size': index.size,
+                             'postings': index.postings, 'dense': index.dense},
+                            file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(cache + '.tmp', cache)
+        except OSError:
+            pass
+        return index
+
+    @classmethod
+    def merge(cls, indexes):
+        # Ids of each index are shifted by the size of the ones before it,
+        # so per-bank caches can be reused as is
+        postings = {}
+        size = 0
+        starts = []
+        for index in indexes:
+            starts.append(size)
+            for token, ids in index.postings.items():
+                postings.setdefault(token, array('I')).extend(i + size for i in ids)
+            size += index.size
+
+        threshold = max(1, size // cls.DENSE_FRACTION)
+        dense = {}
+        for token, ids in postings.items():
+            if len(ids) >= threshold:
+                bits = 0
+                for start, index in zip(starts, indexes):
+                    if token in index.postings:
+                        bits |= index.token_bits(token) << start
+                dense[token] = bits
+        return cls(postings, size, dense)
+
+    def token_bits(self, token):
+        bits = self.dense.get(token)
+        if bits is None:
+            bits = bitmap(self.postings.get(token, ()), self.size)
+        return bits
+
+    def lookup(self, term):
+        # "term*" matches every token starting with term
+        if term.endswith('*'):
+            prefix = term[:-1]
+            matches = 0
+            position = bisect_left(self.vocabulary, prefix)
+            while position < len(self.vocabulary) and self.vocabulary[position].startswith(prefix):
+                matches |= self.token_bits(self.vocabulary[position])
+                position += 1
+            return matches
+        return self.token_bits(term)
+
+    def match_words(self, words):
+        tokens = tokenize(words)
+        if words.endswith('*') and tokens:
+            tokens[-1] += '*'
+        if not tokens:
+            return 0
+        tokens.sort(key=lambda token: len(self.postings.get(token, ())))
+        result = self.lookup(tokens[0])
+        for token in tokens[1:]:
+            if not result:
+                break
+            result &= self.lookup(token)
+        return result
+
+    def match(self, query):
+        tokens = QUERY_TOKEN.findall(query)
+        if not tokens:
+            return 0
+        position, result = self.parse_or(tokens, 0)
+        if position != len(tokens):
+            raise ValueError(f"Requête invalide près de {tokens[position]!r}")
+        return result
+
+    def search(self, query):
+        return bitmap_ids(self.match(query))
+
+    def sample(self, query, count, rng=random):
+        bits = self.match(query)
+        matches = bits.bit_count()
+        if count * 4 > matches:
+            ids = bitmap_ids(bits)
+            return rng.sample(ids, min(count, len(ids)))
+        data = bits.to_bytes((self.size + 7) // 8, 'little')
+        picked = set()
+        while len(picked) < count:
+            i = rng.randrange(self.size)
+            if data[i >> 3] >> (i & 7) & 1:
+                picked.add(i)
+        return list(picked)
+
+    def parse_or(self, tokens, position):
+        position, result = self.parse_and(tokens, position)
+        while position < len(tokens) and OPERATORS.get(tokens[position].lower()) == 'OR':
+            position, other = self.parse_and(tokens, position + 1)
+            result = result | other
+        return position, result
+
+    def parse_and(self, tokens, position):
+        included = None
+        excluded = 0
+        while position < len(tokens) and tokens[position] != ')':
+            operator = OPERATORS.get(tokens[position].lower())
+            if operator == 'OR':
+                break
+            if operator == 'AND':
+                position += 1
+                continue
+            negate = False
+            if operator == 'NOT':
+                negate = True
+                position += 1
+            elif tokens[position].startswith('-') and len(tokens[position]) > 1:
+                negate = True
+                tokens[position] = tokens[position][1:]
+            position, operand = self.parse_operand(tokens, position)
+            if negate:
+                excluded |= operand
+            elif included is None:
+                included = operand
+            else:
+                included &= operand
+        if included is None:
+            included = self.universe if excluded else 0
+        return position, included & ~excluded
+
+    def parse_operand(self, tokens, position):
+        if position >= len(tokens):
+            raise ValueError("Requête incomplète")
+        token = tokens[position]
+        if token == '(':
+            position, result = self.parse_or(tokens, position + 1)
+            if position >= len(tokens) or tokens[position] != ')':
+                raise ValueError("Parenthèse fermante manquante")
+            return position + 1, result
+        return position + 1, self.match_words(token.strip('"'))
@@ -0,0 +1,236 @@
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from urllib.parse import parse_qs, urlsplit
+
+from model import QuizModel
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+           413: "Payload Too Large"}
+# A request line or header longer than this fails the read; all headers together are capped too
+MAX_LINE = 8 << 10
+MAX_HEADERS = 32 << 10
+MAX_BODY = 1 << 20
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class ExamServer:
+    def __init__(self, model, session_ttl=3600, reload_interval=2.0):
+        self.model = model
+        self.session_ttl = session_ttl
+        self.reload_interval = reload_interval
+        self.sessions = {}
+        self.last_seen = {}
+        self.routes = {
+            ('POST', '/start'): self.start,
+            ('GET', '/next'): self.next_question,
+            ('POST', '/submit'): self.submit,
+            ('GET', '/results'): self.results,
+        }
+
+    def get_session(self, session_id):
+        if not isinstance(session_id, str):
+            raise HTTPError(400, "session must be a string")
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HTTPError(404, f"Unknown session {session_id!r}")
+        self.last_seen[session_id] = time.monotonic()
+        return session
+
+    def start(self, params):
+        num_questions = params.get('num_questions', 60)
+        # Query strings give text; JSON must give a true integer (not 2.5, not true)
+        if isinstance(num_questions, str) and num_questions.strip().isdigit():
+            num_questions = int(num_questions)
+        if type(num_questions) is not int:
+            raise HTTPError(400, "num_questions must be an integer")
+        if not 0 < num_questions <= len(self.model.data):
+            raise HTTPError(400, f"num_questions must be between 1 and {len(self.model.data)}")
+
+        session = self.model.new_session()
+        session.start_quiz(num_questions)
+        session_id = uuid.uuid4().hex
+        self.sessions[session_id] = session
+        self.last_seen[session_id] = time.monotonic()
+        return {'session': session_id, 'total': num_questions}
+
+    def next_question(self, params):
+        session = self.get_session(params.get('session'))
+        if session.is_quiz_finished():
+            return {'finished': True}
+        question = session.get_current_question()
+        return {
+            'finished': False,
+            'index': session.current_question_index + 1,
+            'total': session.num_questions,
+            'question': question.text,
+            'type': question.kind,
+            # The answers of a command question are the accepted commands: never sent
+            'answers': [] if question.is_command else list(question.answers),
+            'multiple': question.multiple,
+        }
+
+    def submit(self, params):
+        session = self.get_session(params.get('session'))
+        if session.is_quiz_finished():
+            raise HTTPError(409, "Quiz already finished")
+        question = session.get_current_question()
+        if question.is_command:
+            text = params.get('text')
+            if not isinstance(text, str):
+                raise HTTPError(400, "text must be the typed command")
+            session.submit_answer([], text)
+            return {'finished': session.is_quiz_finished()}
+        indices = params.get('answers')
+        answer_count = len(question.answers)
+        # bool is an int subclass: true/false are not indices
+        if not isinstance(indices, list) or not all(type(i) is int and 0 <= i < answer_count for i in indices):
+            raise HTTPError(400, f"answers must be a list of indices below {answer_count}")
+        session.submit_answer(sorted(set(indices)))
+        return {'finished': session.is_quiz_finished()}
+
+    def results(self, params):
+        session = self.get_session(params.get('session'))
+        if not session.is_quiz_finished():
+            raise HTTPError(409, "Quiz not finished")
+        score, total, score_percentage, elapsed_time, question_times = session.get_results()
+        return {'score': score, 'total': total, 'percentage': score_percentage, 'elapsed': elapsed_time,
+                'question_times': [round(t, 3) for t in question_times]}
+
+    def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            if any(path == url.path for _, path in self.routes):
+                raise HTTPError(405, f"{method} not allowed on {url.path}")
+            raise HTTPError(404, f"No route for {url.path}")
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if body:
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                raise HTTPError(400, "Body is not valid JSON")
+            if not isinstance(payload, dict):
+                raise HTTPError(400, "Body must be a JSON object")
+            params.update(payload)
+        return handler(params)
+
+    async def read_head(self, reader):
+        # Returns (method, target, headers), or None at the end of the connection.
+        # Raises ValueError for a line over the stream limit or headers over MAX_HEADERS.
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, target, _ = request_line.decode('latin-1').split(' ', 2)
+        headers = {}
+        size = 0
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                return method, target, headers
+            size += len(line)
+            if size > MAX_HEADERS:
+                raise ValueError("headers too large")
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await self.read_head(reader)
+                except ValueError:
+                    # Past a bad head the stream cannot be trusted: answer and close
+                    keep_alive = False
+                    status, payload = 400, {'error': "Malformed or oversized request header"}
+                else:
+                    if head is None:
+                        break
+                    method, target, headers = head
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                    try:
+                        length = int(headers.get('content-length', 0) or 0)
+                        if length < 0:
+                            raise ValueError(length)
+                    except ValueError:
+                        length = None
+                    if length is None or length > MAX_BODY:
+                        # The body is not read, so the next request cannot be found: answer and close
+                        keep_alive = False
+                        status, payload = ((400, {'error': "Invalid Content-Length"}) if length is None else
+                                           (413, {'error': f"Body larger than {MAX_BODY} bytes"}))
+                    else:
+                        body = await reader.readexactly(length) if length else b''
+                        try:
+                            status, payload = 200, self.dispatch(method, target, body)
+                        except HTTPError as error:
+                            status, payload = error.status, {'error': error.message}
+
+                data = json.dumps(payload).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def expire_sessions(self):
+        while True:
+            await asyncio.sleep(min(60, self.session_ttl))
+            deadline = time.monotonic() - self.session_ttl
+            for session_id in [s for s, seen in self.last_seen.items() if seen < deadline]:
+                del self.sessions[session_id]
+                del self.last_seen[session_id]
+
+    async def watch_banks(self):
+        # Running sessions hold their own snapshot of the bank (see QuizModel.new_session)
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            reloaded = await asyncio.to_thread(self.model.reload)
+            for filename in reloaded:
+                print(f"{filename} rechargée, {len(self.model.data)} questions")
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        server = await asyncio.start_server(self.handle_client, host, port, limit=MAX_LINE)
+        tasks = [asyncio.create_task(self.expire_sessions())]
+        if self.reload_interval:
+            tasks.append(asyncio.create_task(self.watch_banks()))
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serveur d'examen HTTP/JSON")
+    parser.add_argument('--bank', nargs='+', default=["questions.json"],
+                        help="une ou plusieurs banques (motifs glob acceptés)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--reload', type=float, default=2.0,
+                        help="intervalle de vérification des banques en secondes (0 pour désactiver)")
+    args = parser.parse_args()
+
+    exam_server = ExamServer(QuizModel(args.bank), reload_interval=args.reload)
+    print(f"Serving {len(exam_server.model.data)} questions on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(exam_server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,110 @@
+import importlib
+import sys
+import threading
+import time
+from importlib.abc import MetaPathFinder
+
+STARTUP_BUDGET = 0.5
+PRELOADED = ('ttkbootstrap',)
+
+
+def preload(names=PRELOADED):
+    # Heavy pure-Python imports run in a thread while Tk creates the window;
+    # the import lock makes a later `import` in the main thread wait for it
+    def run():
+        for name in names:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                pass
+    thread = threading.Thread(target=run, name="preload", daemon=True)
+    thread.start()
+    return thread
+
+
+class ImportTimer(MetaPathFinder):
+    # Times exec_module of every module imported after install(), like -X importtime
+    def __init__(self):
+        self.timings = []
+        self.depth = 0
+        self.lock = threading.Lock()
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+        return self
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = TimedLoader(spec.loader, self, threading.current_thread().name)
+                return spec
+        return None
+
+
+class TimedLoader:
+    def __init__(self, loader, timer, thread):
+        self.loader = loader
+        self.timer = timer
+        self.thread = thread
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        started = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            with self.timer.lock:
+                self.timer.timings.append((module.__name__, time.perf_counter() - started, self.thread))
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+class StartupProfile:
+    def __init__(self, started=None, budget=STARTUP_BUDGET):
+        self.started = time.perf_counter() if started is None else started
+        self.budget = budget
+        self.phases = []
+        self.visible_at = None
+        self.imports = ImportTimer().install()
+
+    def mark(self, name):
+        self.phases.append((name, time.perf_counter()))
+
+    def visible(self):
+        self.mark("premier affichage")
+        self.visible_at = self.phases[-1][1]
+
+    def report(self, out=sys.stderr, top=12):
+        self.imports.uninstall()
+        print("Démarrage :", file=out)
+        previous = self.started
+        for name, at in self.phases:
+            print(f"  {name:<28} {(at - previous) * 1000:8.1f} ms  (cumul {(at - self.started) * 1000:8.1f} ms)",
+                  file=out)
+            previous = at
+        total = (self.visible_at or previous) - self.started
+
+        # Cumulative times include sub-imports; only top-level packages are listed
+        roots = {}
+        for name, duration, thread in self.imports.timings:
+            key = (name.partition('.')[0], thread)
+            roots[key] = max(roots.get(key, 0.0), duration)
+        print("Imports les plus coûteux (cumulés) :", file=out)
+        for (name, thread), duration in sorted(roots.items(), key=lambda item: -item[1])[:top]:
+            where = "" if thread == "MainThread" else f"  [{thread}]"
+            print(f"  {name:<28} {duration * 1000:8.1f} ms{where}", file=out)
+
+        status = "OK" if total <= self.budget else "DÉPASSÉ"
+        print(f"Menu affiché en {total * 1000:.0f} ms (budget {self.budget * 1000:.0f} ms) : {status}", file=out)
+        return total
@@ -0,0 +1,48 @@
+import time
+
+
+class TimerService:
+    # One after() chain per quiz, aligned on whole seconds of time.monotonic().
+    # The view is only redrawn when the displayed second changes.
+    def __init__(self, root, on_tick):
+        self.root = root
+        self.on_tick = on_tick
+        self.after_id = None
+        self.started = None
+        self.question_started = None
+        self.displayed = None
+
+    def start(self, offset=0.0):
+        self.stop()
+        self.question_started = time.monotonic()
+        self.started = self.question_started - offset
+        self.displayed = None
+        self.after_id = self.root.after_idle(self.tick)
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return time.monotonic() - self.started
+
+    def tick(self):
+        elapsed = self.elapsed()
+        seconds = int(elapsed)
+        if seconds != self.displayed:
+            self.displayed = seconds
+            self.on_tick(seconds)
+        delay = max(1, int((seconds + 1 - elapsed) * 1000))
+        self.after_id = self.root.after(delay, self.tick)
+
+    def lap(self):
+        now = time.monotonic()
+        duration = now - self.question_started
+        self.question_started = now
+        return duration
+
+    def stop(self):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+        elapsed = self.elapsed()
+        self.started = None
+        return elapsed
@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import re
+import sys
+from collections import namedtuple
+
+from bank import COMPILED_SUFFIX, CompiledBank, bank_hash
+from ioscmd import CommandError, check_command
+from question import CHOICE, COMMAND, MAX_ANSWERS, question_key
+
+VALIDATION_VERSION = 4
+VALIDATION_SUFFIX = '.valid'
+CHOOSE = re.compile(r"Choisissez (deux|trois|quatre|cinq|\d+) (?:réponses|propositions)", re.IGNORECASE)
+NUMBERS = {'deux': 2, 'trois': 3, 'quatre': 4, 'cinq': 5}
+REPORTED = 20
+
+Issue = namedtuple('Issue', 'position severity message')
+
+
+class BankValidationError(ValueError):
+    def __init__(self, filename, issues):
+        self.filename = filename
+        self.issues = issues
+        errors = [issue for issue in issues if issue.severity == 'erreur']
+        lines = [f"{filename} : {len({issue.position for issue in errors})} question(s) invalide(s)"]
+        lines.extend(format_issue(issue) for issue in errors[:REPORTED])
+        if len(errors) > REPORTED:
+            lines.append(f"  ... et {len(errors) - REPORTED} autres (python validate.py {filename})")
+        super().__init__("\n".join(lines))
+
+
+def format_issue(issue):
+    where = f"question {issue.position + 1}" if issue.position is not None else "banque"
+    return f"  {where} : {issue.message}"
+
+
+def check_entry(position, entry, issues):
+    # Schema of a raw JSON entry; returns (text, answers, mask, kind) when it can be checked further
+    if type(entry) is not dict:
+        issues.append(Issue(position, 'erreur', "l'entrée n'est pas un objet JSON"))
+        return None
+    text = entry.get('question')
+    if type(text) is not str or not text.strip():
+        issues.append(Issue(position, 'erreur', "texte de la question manquant"))
+        return None
+    answers = entry.get('answers')
+    if type(answers) is not list:
+        issues.append(Issue(position, 'erreur', "liste 'answers' manquante"))
+        return None
+    kind = entry.get('type', CHOICE)
+    if kind not in (CHOICE, COMMAND):
+        issues.append(Issue(position, 'erreur', f"'type' doit valoir {CHOICE!r} ou {COMMAND!r}"))
+        return None
+    texts = []
+    mask = 0
+    valid = True
+    for i, answer in enumerate(answers):
+        answer_text = answer.get('text') if type(answer) is dict else None
+        if type(answer_text) is not str or not answer_text.strip():
+            issues.append(Issue(position, 'erreur', f"réponse {i + 1} sans texte"))
+            valid = False
+            continue
+        correct = answer.get('correct-answer', False)
+        if kind == COMMAND:
+            # Every command listed is accepted
+            mask |= 1 << i
+        elif correct is True:
+            mask |= 1 << i
+        elif correct is not False:
+            issues.append(Issue(position, 'erreur', f"réponse {i + 1} : 'correct-answer' doit valoir true ou false"))
+            valid = False
+        texts.append(answer_text)
+    exhibit = entry.get('exhibit')
+    if exhibit is not None and (type(exhibit) is not str or not exhibit.strip()):
+        issues.append(Issue(position, 'erreur', "'exhibit' doit être le chemin d'une image"))
+        valid = False
+    return (text, texts, mask, kind) if valid else None
+
+
+def fold_answer(text):
+    return text.strip().casefold()
+
+
+def check_commands(position, answers, issues):
+    # Accepted commands must parse, or no typed answer could ever match them
+    seen = {}
+    for i, answer in enumerate(answers):
+        try:
+            readings = tuple(sorted(check_command(answer).items()))
+        except CommandError as error:
+            issues.append(Issue(position, 'erreur', f"commande {i + 1} non reconnue ({error}) : {answer}"))
+            continue
+        if readings in seen:
+            issues.append(Issue(position, 'avertissement', f"commandes {seen[readings] + 1} et {i + 1} équivalentes"))
+        else:
+            seen[readings] = i
+
+
+def check_content(position, text, answers, mask, issues, kind=CHOICE):
+    if not answers:
+        issues.append(Issue(position, 'erreur', "aucune réponse"))
+        return
+    if kind == COMMAND:
+        check_commands(position, answers, issues)
+        return
+    if not mask:
+        issues.append(Issue(position, 'erreur', "aucune réponse marquée correcte"))
+    if len(answers) > MAX_ANSWERS:
+        issues.append(Issue(position, 'erreur', f"{len(answers)} réponses (au plus {MAX_ANSWERS} au clavier et à l'écran)"))
+    if len(set(map(fold_answer, answers))) < len(answers):
+        seen = {}
+        for i, answer in enumerate(answers):
+            folded = fold_answer(answer)
+            if folded not in seen:
+                seen[folded] = i
+                continue
+            # The same text both right and wrong cannot be graded; a plain repeat only looks odd
+            first = seen[folded]
+            severity = 'erreur' if (mask >> first & 1) != (mask >> i & 1) else 'avertissement'
+            issues.append(Issue(position, severity, f"réponses {first + 1} et {i + 1} identiques"))
+    correct_count = mask.bit_count()
+    if correct_count == len(answers) > 1:
+        issues.append(Issue(position, 'avertissement', "toutes les réponses sont correctes"))
+    match = CHOOSE.search(text) if mask and 'hoisissez' in text else None
+    if match:
+        word = match.group(1).lower()
+        expected = int(word) if word.isdigit() else NUMBERS[word]
+        if expected != correct_count:
+            issues.append(Issue(position, 'avertissement',
+                                f"l'énoncé demande {expected} réponses mais {correct_count} sont correctes"))
+
+
+def check_questions(questions, directory=''):
+    # questions: raw JSON entries or Question objects (compiled banks, exhibit paths resolved)
+    issues = []
+    keys = {}
+    for position, entry in enumerate(questions):
+        if isinstance(entry, dict) or not hasattr(entry, 'correct_mask'):
+            checked = check_entry(position, entry, issues)
+            if checked is None:
+                continue
+            text, answers, mask, kind = checked
+            exhibit = entry.get('exhibit')
+            if exhibit is not None:
+                exhibit = os.path.join(directory, exhibit)
+        else:
+            text, answers, mask, exhibit = entry.text, entry.answers, entry.correct_mask, entry.exhibit
+            kind = entry.kind
+            if not text.strip():
+                issues.append(Issue(position, 'erreur', "texte de la question manquant"))
+                continue
+        check_content(position, text, answers, mask, issues, kind)
+        if exhibit is not None and not os.path.isfile(exhibit):
+            issues.append(Issue(position, 'avertissement', f"image introuvable : {exhibit}"))
+        key = question_key(text)
+        if key in keys:
+            issues.append(Issue(position, 'avertissement', f"même énoncé que la question {keys[key] + 1}"))
+        else:
+            keys[key] = position
+    return issues
+
+
+def read_entries(filename):
+    if filename.endswith(COMPILED_SUFFIX):
+        return CompiledBank(filename)
+    with open(filename, 'r', encoding='utf-8') as file:
+        entries = json.load(file)
+    if not isinstance(entries, list):
+        raise BankValidationError(filename, [Issue(None, 'erreur', "la banque doit être une liste JSON de questions")])
+    return entries
+
+
+def validation_path(filename):
+    return filename + VALIDATION_SUFFIX
+
+
+def cached_clean(filename, digest):
+    try:
+        with open(validation_path(filename), 'r', encoding='utf-8') as file:
+            cached = json.load(file)
+        return cached['version'] == VALIDATION_VERSION and cached['hash'] == digest
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+
+
+def validate_bank(filename, digest=None, warnings=sys.stderr):
+    # Run at load. The whole bank is checked only when its content changed since the
+    # last clean pass; errors are all reported at once by BankValidationError.
+    if digest is None:
+        digest = bank_hash(filename)
+    if cached_clean(filename, digest):
+        return []
+    issues = check_questions(read_entries(filename), os.path.dirname(filename))
+    if any(issue.severity == 'erreur' for issue in issues):
+        raise BankValidationError(filename, issues)
+    if issues and warnings is not None:
+        print(f"{filename} : {len(issues)} avertissement(s)", file=warnings)
+        for issue in issues[:REPORTED]:
+            print(format_issue(issue), file=warnings)
+    try:
+        with open(validation_path(filename) + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump({'version': VALIDATION_VERSION, 'hash': digest, 'warnings': len(issues)}, file)
+        os.replace(validation_path(filename) + '.tmp', validation_path(filename))
+    except OSError:
+        pass
+    return issues
+
+
+if __name__ == "__main__":
+    from bank import expand_banks
+
+    parser = argparse.ArgumentParser(description="Vérifie les banques de questions et liste tous les problèmes")
+    parser.add_argument('banks', nargs='*', default=["questions.json"])
+    parser.add_argument('--json', action='store_true', help="sortie JSON")
+    args = parser.parse_args()
+
+    report = {}
+    failed = False
+    for filename in expand_banks(args.banks):
+        try:
+            issues = check_questions(read_entries(filename), os.path.dirname(filename))
+        except BankValidationError as error:
+            issues = error.issues
+        except (OSError, ValueError) as error:
+            issues = [Issue(None, 'erreur', str(error))]
+        failed = failed or any(issue.severity == 'erreur' for issue in issues)
+        report[filename] = issues
+    if args.json:
+        json.dump({filename: [issue._asdict() for issue in issues] for filename, issues in report.items()},
+                  sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        for filename, issues in report.items():
+            errors = sum(issue.severity == 'erreur' for issue in issues)
+            print(f"{filename} : {errors} erreur(s), {len(issues) - errors} avertissement(s)")
+            for issue in issues:
+                print(f"{format_issue(issue)} [{issue.severity}]")
+    sys.exit(1 if failed else 0)
@@ -1,32 +1,54 @@
+import time
 import tkinter as tk
-from tkinter import ttk, messagebox
-from ttkbootstrap import Style
-from ttkbootstrap.widgets import Meter
+from bisect import bisect_left, bisect_right
+from collections import deque
+from tkinter import ttk, messagebox, filedialog
+
+MAX_POOLED_ANSWERS = 7
+FRAME_BUDGET = 1 / 60
+THEME = "flatly"
 
 class QuizView:
     def __init__(self, root):
         self.root = root
-        self.style = Style(theme="flatly")
+        self.style = None
         self.root.title("Quiz App")
         self.root.geometry("900x700")
 
-        self.style.configure("TRadiobutton", font=("Arial", 12))
-        self.style.configure("TCheckbutton", font=("Arial", 12))
-
         self.main_frame = None
+        self.question_frame = None
         self.current_screen = None
+        self.review = None
         self.start_button = None
         self.submit_button = None
         self.restart_button = None
         self.exit_button = None
-
-    def create_menu(self, restart_callback, quit_callback, about_callback):
+        self.answer_vars = []
+        self.single_choice = False
+        self.transition_times = deque(maxlen=256)
+        self.exhibits = None
+        self.exhibit_question = None
+        self.exhibit_image = None
+
+    def apply_theme(self):
+        # ttkbootstrap is only needed once the window is up: the start menu first
+        # renders with the default ttk theme ("success.TButton" falls back to "TButton")
+        if self.style is None:
+            from ttkbootstrap import Style
+            self.style = Style(theme=THEME)
+            self.style.configure("TRadiobutton", font=("Arial", 12))
+            self.style.configure("TCheckbutton", font=("Arial", 12))
+        return self.style
+
+    def create_menu(self, restart_callback, quit_callback, about_callback, export_callback, analysis_callback):
         self.menu_bar = tk.Menu(self.root)
         self.root.config(menu=self.menu_bar)
 
         self.file_menu = tk.Menu(self.menu_bar, tearoff=0)
         self.menu_bar.add_cascade(label="Fichier", menu=self.file_menu)
         self.file_menu.add_command(label="Redémarrer le quiz", command=restart_callback)
+        self.file_menu.add_command(label="Exporter les résultats...", command=export_callback)
+        self.file_menu.add_command(label="Analyse des questions", command=analysis_callback)
         self.file_menu.add_command(label="Quitter", command=quit_callback)
 
         self.help_menu = tk.Menu(self.menu_bar, tearoff=0)
@@ -34,12 +56,16 @@ class QuizView:
         self.help_menu.add_command(label="A propos", command=about_callback)
 
     def clear_widgets(self):
+        if self.question_frame is not None:
+            self.question_frame.pack_forget()
         if self.main_frame:
             self.main_frame.destroy()
+        # The review list dies with the frame; the next one is built after the results paint
+        self.review = None
         self.main_frame = ttk.Frame(self.root, padding="20")
         self.main_frame.pack(expand=True, fill="both")
 
-    def show_start_menu(self):
+    def show_start_menu(self, resume_text=None, form_count=0):
         self.clear_widgets()
         self.current_screen = "start_menu"
 
@@ -53,58 +79,189 @@ class QuizView:
         self.num_questions_entry.pack(pady=10)
         self.num_questions_entry.focus()
 
+        self.topic_label = ttk.Label(self.main_frame, text="Thème (optionnel, ex. SSH, IPv6 ET VLAN, sous-réseau):")
+        self.topic_label.pack(pady=10)
+
+        self.topic_entry = ttk.Entry(self.main_frame, width=40)
+        self.topic_entry.pack(pady=10)
+
+        self.spaced_var = tk.BooleanVar(value=False)
+        self.spaced_check = ttk.Checkbutton(self.main_frame, text="Révision espacée (questions à revoir en priorité)",
+                                            variable=self.spaced_var)
+        self.spaced_check.pack(pady=10)
+
+        self.adaptive_var = tk.BooleanVar(value=False)
+        self.adaptive_check = ttk.Checkbutton(self.main_frame,
+                                              text="Mode adaptatif (s'arrête dès que le résultat est certain)",
+                                              variable=self.adaptive_var)
+        self.adaptive_check.pack(pady=10)
+
+        self.form_entry = None
+        if form_count:
+            self.form_label = ttk.Label(self.main_frame, text=f"Formulaire (optionnel, 0 à {form_count - 1}):")
+            self.form_label.pack(pady=10)
+            self.form_entry = ttk.Entry(self.main_frame, width=10)
+            self.form_entry.pack(pady=10)
+
         self.start_button = ttk.Button(self.main_frame, text="Démarrer le quiz", style='success.TButton')
         self.start_button.pack(pady=20)
 
+        self.resume_button = None
+        if resume_text:
+            self.resume_button = ttk.Button(self.main_frame, text=resume_text, style='info.TButton')
+            self.resume_button.pack(pady=5)
+
         return self.start_button
 
-    def show_question(self, question, current_question, total_questions):
-        self.clear_widgets()
-        self.current_screen = "question"
+    def build_question_screen(self):
+        self.question_frame = ttk.Frame(self.root, padding="20")
 
-        self.question_label = ttk.Label(self.main_frame, text=question['question'], wraplength=600, font=("Helvetica", 16))
+        self.question_label = ttk.Label(self.question_frame, wraplength=600, font=("Helvetica", 16))
         self.question_label.pack(pady=20)
 
-        self.answer_vars = []
-        self.answer_widgets = []
-        
-        answers = question.get('answers', [])
-        
-        if not answers:
-            self.show_error("No answers found for this question.")
-            return
+        # Packed before answers_frame only for questions with an exhibit
+        self.exhibit_label = ttk.Label(self.question_frame)
 
-        correct_answers_count = sum(1 for answer in answers if answer.get('correct-answer', False))
+        self.answers_frame = ttk.Frame(self.question_frame)
+        self.answers_frame.pack(fill="x")
 
-        if correct_answers_count == 1:
-            var = tk.IntVar(value=-1)
-            self.answer_vars.append(var)
-            for i, answer in enumerate(answers, start=1):
-                rb = ttk.Radiobutton(self.main_frame, text=f"{i}. {answer['text']}", variable=var, value=i-1)
-                rb.pack(anchor='w', padx=20, pady=5)
-                self.answer_widgets.append(rb)
-        else:
-            for i, answer in enumerate(answers, start=1):
-                var = tk.BooleanVar()
-                self.answer_vars.append(var)
-                cb = ttk.Checkbutton(self.main_frame, text=f"{i}. {answer['text']}", variable=var)
-                cb.pack(anchor='w', padx=20, pady=5)
-                self.answer_widgets.append(cb)
-
-        self.submit_button = ttk.Button(self.main_frame, text="Soumettre", style='success.TButton')
+        # Command questions: one entry, packed in place of the answer buttons
+        self.command_var = tk.StringVar()
+        self.command_frame = ttk.Frame(self.answers_frame)
+        ttk.Label(self.command_frame, text="Commande IOS :", font=("Helvetica", 12)).pack(side="left", padx=(20, 10))
+        self.command_entry = ttk.Entry(self.command_frame, textvariable=self.command_var, width=50,
+                                       font=("Courier", 12))
+        self.command_entry.pack(side="left", fill="x", expand=True)
+
+        self.choice_var = tk.IntVar(value=-1)
+        self.radio_pool = []
+        self.check_pool = []
+        self.check_vars = []
+        self.answer_widgets = []
+        self.grow_answer_pool(MAX_POOLED_ANSWERS)
+
+        self.submit_button = ttk.Button(self.question_frame, text="Soumettre", style='success.TButton')
         self.submit_button.pack(pady=20)
 
-        self.progress_label = ttk.Label(self.main_frame, text=f"Question {current_question} sur {total_questions}")
+        self.progress_label = ttk.Label(self.question_frame)
         self.progress_label.pack(side="bottom", pady=10)
 
-        self.timer_label = ttk.Label(self.main_frame, text="Temps écoulé: 00:00")
+        self.timer_label = ttk.Label(self.question_frame, text="Temps écoulé: 00:00")
         self.timer_label.pack(side="bottom", pady=5)
 
+    def grow_answer_pool(self, size):
+        while len(self.radio_pool) < size:
+            self.radio_pool.append(ttk.Radiobutton(self.answers_frame, variable=self.choice_var,
+                                                   value=len(self.radio_pool)))
+            var = tk.BooleanVar()
+            self.check_vars.append(var)
+            self.check_pool.append(ttk.Checkbutton(self.answers_frame, variable=var))
+
+    def show_question(self, question, order, current_question, total_questions):
+        started = time.perf_counter()
+        if self.question_frame is None:
+            self.build_question_screen()
+        if self.current_screen != "question":
+            if self.main_frame:
+                self.main_frame.destroy()
+                self.main_frame = None
+            self.question_frame.pack(expand=True, fill="both")
+        self.current_screen = "question"
+
+        self.question_label.config(text=question.text)
+        self.show_exhibit_for(question)
+        for widget in self.answer_widgets:
+            widget.pack_forget()
+        self.command_frame.pack_forget()
+
+        if question.is_command:
+            self.command_var.set('')
+            self.single_choice = False
+            self.answer_vars = []
+            self.answer_widgets = []
+            self.command_frame.pack(fill="x", pady=10)
+            self.command_entry.focus_set()
+            self.progress_label.config(text=f"Question {current_question} sur {total_questions}")
+            self.root.update_idletasks()
+            self.transition_times.append(time.perf_counter() - started)
+            return
+
+        answers = [question.answers[i] for i in order]
+
+        if not answers:
+            self.answer_widgets = []
+            self.show_error("No answers found for this question.")
+            return
+
+        self.grow_answer_pool(len(answers))
+        self.single_choice = question.correct_count == 1
+        if self.single_choice:
+            self.choice_var.set(-1)
+            self.answer_vars = [self.choice_var]
+            self.answer_widgets = self.radio_pool[:len(answers)]
+        else:
+            self.answer_vars = self.check_vars[:len(answers)]
+            for var in self.answer_vars:
+                var.set(False)
+            self.answer_widgets = self.check_pool[:len(answers)]
+
+        for i, (widget, answer) in enumerate(zip(self.answer_widgets, answers), start=1):
+            widget.config(text=f"{i}. {answer}")
+            widget.pack(anchor='w', padx=20, pady=5)
+
+        self.progress_label.config(text=f"Question {current_question} sur {total_questions}")
+
+        self.root.update_idletasks()
+        self.transition_times.append(time.perf_counter() - started)
+
+    def exhibit_cache(self):
+        if self.exhibits is None:
+            from exhibits import ExhibitCache
+            self.exhibits = ExhibitCache(self.root)
+        return self.exhibits
+
+    def show_exhibit_for(self, question):
+        self.exhibit_question = question
+        if question.exhibit is None:
+            self.exhibit_label.config(image='', text='')
+            self.exhibit_label.pack_forget()
+            self.exhibit_image = None
+            return
+        self.exhibit_label.config(image='', text="Chargement de l'illustration…")
+        self.exhibit_label.pack(before=self.answers_frame, pady=10)
+        # Answered immediately when the exhibit was prefetched, otherwise once decoded
+        self.exhibit_cache().get(question.exhibit, lambda image: self.show_exhibit(question, image))
+
+    def show_exhibit(self, question, image):
+        if question is not self.exhibit_question or self.current_screen != "question":
+            return
+        # The label does not keep the Tk image alive, this reference does
+        self.exhibit_image = image
+        if image is None:
+            self.exhibit_label.config(image='', text="(illustration indisponible)")
+        else:
+            self.exhibit_label.config(image=image, text='')
+
+    def prefetch(self, question):
+        if question.exhibit is not None:
+            self.exhibit_cache().prefetch(question.exhibit)
+
+    def transition_stats(self):
+        times = list(self.transition_times)
+        if not times:
+            return None
+        return {
+            'count': len(times),
+            'mean': sum(times) / len(times),
+            'max': max(times),
+            'over_budget': sum(1 for t in times if t > FRAME_BUDGET),
+        }
+
     def update_timer(self, elapsed_time):
         minutes, seconds = divmod(elapsed_time, 60)
         self.timer_label.config(text=f"Temps écoulé: {minutes:02d}:{seconds:02d}")
 
-    def show_results(self, score, total, score_percentage, elapsed_time, user_answers, selected_questions):
+    def show_results(self, score, total, score_percentage, elapsed_time, user_answers, selected_questions, orders):
         self.clear_widgets()
         self.current_screen = "results"
 
@@ -121,78 +278,204 @@ class QuizView:
         time_label = ttk.Label(header_frame, text=f"Temps total: {minutes:02d}:{seconds:02d}", font=("Helvetica", 18))
         time_label.pack(side="right", padx=20)
 
+        from ttkbootstrap.widgets import Meter
+        self.apply_theme()
         meter = Meter(self.main_frame, amountused=score_percentage, metersize=200, padding=20,
                       subtext="Taux de Réussite", textfont=("Helvetica", 16), subtextfont=("Helvetica", 12),
                       textright="%", bootstyle="success")
         meter.pack(pady=10)
 
-        self.canvas = tk.Canvas(self.main_frame)
-        self.scrollbar_y = ttk.Scrollbar(self.main_frame, orient="vertical", command=self.canvas.yview)
-        self.scrollbar_x = ttk.Scrollbar(self.root, orient="horizontal", command=self.canvas.xview)
-
-        self.scrollable_frame = ttk.Frame(self.canvas)
-
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        )
+        button_frame = ttk.Frame(self.main_frame)
+        button_frame.pack(side="bottom", pady=20)
 
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scrollbar_y.set, xscrollcommand=self.scrollbar_x.set)
+        self.restart_button = ttk.Button(button_frame, text="Recommencer", style='success.TButton')
+        self.restart_button.pack(side="left", padx=10)
 
-        for index, answer in enumerate(user_answers):
-            question_frame = ttk.Frame(self.scrollable_frame)
-            question_frame.pack(pady=10, fill='x', expand=True)
+        self.exit_button = ttk.Button(button_frame, text="Quitter", style='danger.TButton')
+        self.exit_button.pack(side="left", padx=10)
 
-            question_number = ttk.Label(question_frame, text=f"Question {index + 1}", font=("Helvetica", 16, "bold"))
-            question_number.pack(anchor='w')
+        # Let the score and meter paint before building the review list
+        results_frame = self.main_frame
+        self.root.update_idletasks()
+        self.root.after_idle(lambda: self.show_review(results_frame, user_answers, selected_questions, orders))
 
-            question_text = ttk.Label(question_frame, text=answer['question'], wraplength=800, font=("Helvetica", 12))
-            question_text.pack(anchor='w', padx=(20, 0), pady=5)
+    def show_review(self, results_frame, user_answers, selected_questions, orders):
+        if self.main_frame is not results_frame or self.current_screen != "results":
+            return
 
-            for i, option in enumerate(selected_questions[index]['answers'], start=1):
-                text = option['text']
-                is_correct = option.get('correct-answer', False)
-                is_user_answer = text in answer['user_answers']
+        rows = []
+        for index, answer in enumerate(user_answers):
+            question = selected_questions[index]
+            chosen = set(answer['option_ids'])
+            options = []
+            if question.is_command:
+                # What was typed, then the accepted commands
+                typed = answer['user_answers'][0] or '-'
+                if answer['is_correct']:
+                    options.append((f"✓ {typed}", ("Courier", 12, "bold"), "green"))
+                else:
+                    options.append((f"✗ {typed}", ("Courier", 12, "italic"), "red"))
+                options.extend((f"• {text}", ("Courier", 12), "green") for text in question.answers)
+            for i, option_id in enumerate(orders[index], start=1):
+                text = question.answers[option_id]
+                is_correct = question.is_correct(option_id)
+                is_user_answer = option_id in chosen
 
                 if is_user_answer and is_correct:
-                    label = ttk.Label(question_frame, text=f"{i}. ✓ {text}", font=("Helvetica", 12, "bold"), foreground="green")
+                    options.append((f"{i}. ✓ {text}", ("Helvetica", 12, "bold"), "green"))
                 elif is_user_answer and not is_correct:
-                    label = ttk.Label(question_frame, text=f"{i}. ✗ {text}", font=("Helvetica", 12, "italic"), foreground="red")
+                    options.append((f"{i}. ✗ {text}", ("Helvetica", 12, "italic"), "red"))
                 elif is_correct:
-                    label = ttk.Label(question_frame, text=f"{i}. • {text}", font=("Helvetica", 12), foreground="green")
+                    options.append((f"{i}. • {text}", ("Helvetica", 12), "green"))
                 else:
-                    label = ttk.Label(question_frame, text=f"{i}. {text}", font=("Helvetica", 12))
-
-                label.pack(anchor='w', padx=(20, 0), pady=2)
+                    options.append((f"{i}. {text}", ("Helvetica", 12), ""))
+            rows.append((f"Question {index + 1}", answer['question'], options))
 
-            ttk.Separator(question_frame, orient='horizontal').pack(fill='x', pady=10)
-
-        self.canvas.pack(side="left", fill="both", expand=True)
-        self.scrollbar_y.pack(side="right", fill="y")
-        self.scrollbar_x.pack(side="bottom", fill="x")
-
-        button_frame = ttk.Frame(self.main_frame)
-        button_frame.pack(pady=20)
-
-        self.restart_button = ttk.Button(button_frame, text="Recommencer", style='success.TButton')
-        self.restart_button.pack(side="left", padx=10)
-
-        self.exit_button = ttk.Button(button_frame, text="Quitter", style='danger.TButton')
-        self.exit_button.pack(side="left", padx=10)
+        self.review = ReviewList(self.main_frame, rows)
+        self.canvas = self.review.canvas
 
         self.canvas.bind_all("<MouseWheel>", self.on_mousewheel)
         self.canvas.bind_all("<Button-4>", self.on_mousewheel)
         self.canvas.bind_all("<Button-5>", self.on_mousewheel)
 
     def on_mousewheel(self, event):
+        if self.current_screen != "results" or self.review is None:
+            return
         if event.num == 5 or event.delta == -120:
-            self.canvas.yview_scroll(1, "units")
+            self.review.scroll(1)
         if event.num == 4 or event.delta == 120:
-            self.canvas.yview_scroll(-1, "units")
+            self.review.scroll(-1)
 
     def show_error(self, message):
         messagebox.showerror("Erreur", message)
 
+    def ask_export_filename(self):
+        return filedialog.asksaveasfilename(
+            title="Exporter les résultats",
+            defaultextension=".html",
+            filetypes=[("Rapport HTML", "*.html"), ("CSV", "*.csv"), ("JSON lines", "*.jsonl")])
+
+    def show_report(self, title, lines):
+        window = tk.Toplevel(self.root)
+        window.title(title)
+        window.geometry("800x500")
+        text = tk.Text(window, wrap="word", font=("Arial", 11))
+        scrollbar = ttk.Scrollbar(window, orient="vertical", command=text.yview)
+        text.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        text.pack(side="left", expand=True, fill="both")
+        text.insert("1.0", "\n".join(lines))
+        text.configure(state="disabled")
+
     def show_about(self):
         messagebox.showinfo("À Propos", "\nVersion 1.0\n\nCréé par Jules Rachet")
+
+
+class ReviewList:
+    # Only the rows near the visible part of the canvas get widgets; they are
+    # recycled while scrolling so the widget count does not depend on the quiz length.
+    OVERSCAN = 300
+    LINE_HEIGHT = 22
+    CHARS_PER_LINE = 100
+
+    def __init__(self, parent, rows):
+        self.rows = rows
+        self.canvas = tk.Canvas(parent, highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.yview)
+        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+
+        self.heights = [self.estimate_height(row) for row in rows]
+        self.measured = [False] * len(rows)
+        self.offsets = []
+        self.update_offsets()
+
+        self.free_widgets = []
+        self.visible = {}
+        self.canvas.bind("<Configure>", self.refresh)
+
+    def estimate_height(self, row):
+        _, question, options = row
+        lines = 1 + -(-len(question) // self.CHARS_PER_LINE)
+        lines += sum(-(-len(text) // self.CHARS_PER_LINE) for text, _, _ in options)
+        return lines * self.LINE_HEIGHT + 50
+
+    def update_offsets(self):
+        self.offsets = [0]
+        for height in self.heights:
+            self.offsets.append(self.offsets[-1] + height)
+        self.canvas.configure(scrollregion=(0, 0, 0, self.offsets[-1]))
+
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self.refresh()
+
+    def scroll(self, units):
+        self.canvas.yview_scroll(units, "units")
+        self.refresh()
+
+    def create_row_widget(self):
+        frame = ttk.Frame(self.canvas)
+        number = ttk.Label(frame, font=("Helvetica", 16, "bold"))
+        number.pack(anchor='w')
+        question = ttk.Label(frame, wraplength=800, font=("Helvetica", 12))
+        question.pack(anchor='w', padx=(20, 0), pady=5)
+        options_frame = ttk.Frame(frame)
+        options_frame.pack(fill='x')
+        ttk.Separator(frame, orient='horizontal').pack(fill='x', pady=10)
+        window = self.canvas.create_window(0, 0, window=frame, anchor="nw", state="hidden")
+        return {'frame': frame, 'number': number, 'question': question,
+                'options_frame': options_frame, 'options': [], 'window': window}
+
+    def fill_row_widget(self, widget, row):
+        number, question, options = row
+        widget['number'].config(text=number)
+        widget['question'].config(text=question)
+        while len(widget['options']) < len(options):
+            widget['options'].append(ttk.Label(widget['options_frame'], wraplength=800))
+        for label in widget['options']:
+            label.pack_forget()
+        for label, (text, font, color) in zip(widget['options'], options):
+            label.config(text=text, font=font, foreground=color)
+            label.pack(anchor='w', padx=(20, 0), pady=2)
+
+    def refresh(self, event=None):
+        if not self.rows:
+            return
+        top = self.canvas.canvasy(0) - self.OVERSCAN
+        bottom = self.canvas.canvasy(0) + self.canvas.winfo_height() + self.OVERSCAN
+        first = max(bisect_right(self.offsets, top) - 1, 0)
+        last = min(bisect_left(self.offsets, bottom), len(self.rows))
+        wanted = range(first, last)
+
+        for index in [i for i in self.visible if i not in wanted]:
+            widget = self.visible.pop(index)
+            self.canvas.itemconfigure(widget['window'], state="hidden")
+            self.free_widgets.append(widget)
+
+        new_rows = [index for index in wanted if index not in self.visible]
+        for index in new_rows:
+            widget = self.free_widgets.pop() if self.free_widgets else self.create_row_widget()
+            self.fill_row_widget(widget, self.rows[index])
+            self.visible[index] = widget
+
+        if new_rows:
+            self.canvas.update_idletasks()
+            resized = False
+            for index in new_rows:
+                if not self.measured[index]:
+                    self.measured[index] = True
+                    height = self.visible[index]['frame'].winfo_reqheight() + 20
+                    if height != self.heights[index]:
+                        self.heights[index] = height
+                        resized = True
+            if resized:
+                self.update_offsets()
+                self.refresh()
+                return
+
+        width = self.canvas.winfo_width()
+        for index, widget in self.visible.items():
+            self.canvas.coords(widget['window'], 0, self.offsets[index] + 10)
+            self.canvas.itemconfigure(widget['window'], width=width, state="normal")